@@ -455,10 +455,25 @@ div[data-testid="stHorizontalBlock"] div[data-testid="column"] [data-baseweb="se
 
 import pandas as pd
 import altair as alt
-import yfinance as yf
 import re
+import time
 from supabase import create_client, Client
 from datetime import datetime, date, timedelta
+from src.fetch import fetch_keyset, fetch_parallel
+from src import analytics, caches, fingerprints, ledger_cache, marketdata, perf, schema, symbols
+from src import fx as fx_history
+from src.analytics import clean_number, normalize_columns
+from src.loader import load_dashboard_data
+from src.config import FAKE_SUPABASE_DB, FAKE_SUPABASE_LATENCY_MS, SUPABASE_BACKEND
+from src.fakedb import create_fake_client
+
+# Performance inspector (?perf=1 or Settings > Diagnostics) / telemetry spans (TELEMETRY_FILE).
+# Both off: _perf is None and nothing below is wrapped.
+_perf = perf.start()
+_timed = _perf.timed if _perf else perf.untimed
+if _perf:
+    analytics = _perf.module(analytics)
+    load_dashboard_data = _perf.timed(load_dashboard_data)
 
 def _next_friday_local(d: date) -> date:
     """Return the next Friday after date d. If d is Friday, returns the following Friday."""
@@ -471,7 +486,6 @@ def _next_friday(d: date) -> date:
     """Compatibility wrapper used by multiple pages."""
     return _next_friday_local(d)
 
-import math
 import os
 import uuid
 
@@ -491,8 +505,9 @@ def _active_user_id(u):
 def _price_refresh_controls(user, page_name: str, force_leap_mid: bool = False):
     """
     Standard price refresh behavior:
-    - Clears cached pricing when navigating to a new page
-    - Provides a Refresh Prices button at the top of the page
+    - Re-arms the LEAP mid auto-refresh when navigating to a new page
+    - Provides a Refresh Prices button at the top of the page, which clears only
+      the quote cache (plus option chains on LEAP pricing pages)
     """
     # Resolve a stable user id (works for User obj, dict, or raw uuid)
     uid = None
@@ -507,19 +522,12 @@ def _price_refresh_controls(user, page_name: str, force_leap_mid: bool = False):
 
     prev_page = st.session_state.get("_current_page_name")
     if prev_page != page_name:
-        try:
-            st.cache_data.clear()
-        except Exception:
-            pass
         if force_leap_mid:
             st.session_state[f"leap_mid_autorefresh_{uid}"] = True
         st.session_state["_current_page_name"] = page_name
 
     if st.button("🔄 Refresh Prices", key=f"refresh_prices_{page_name}_{uid}", type="primary"):
-        try:
-            st.cache_data.clear()
-        except Exception:
-            pass
+        caches.invalidate(caches.QUOTES, *((caches.CHAINS,) if force_leap_mid else ()))
         if force_leap_mid:
             st.session_state[f"leap_mid_autorefresh_{uid}"] = True
         st.rerun()
@@ -613,7 +621,7 @@ def _get_secret(key: str, default: str = "") -> str:
 SUPABASE_URL = _get_secret("SUPABASE_URL", "")
 SUPABASE_KEY = _get_secret("SUPABASE_KEY", "")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
+if SUPABASE_BACKEND != "fake" and (not SUPABASE_URL or not SUPABASE_KEY):
     st.error("Missing Database Credentials! Please configure .streamlit/secrets.toml")
     st.stop()
 
@@ -840,6 +848,9 @@ div[data-testid="stRadio"] div[role="radiogroup"] span {
     # --------------------------------------------------------------------------------
 @st.cache_resource
 def init_connection():
+    # SUPABASE_BACKEND=fake swaps in the in-process SQLite stand-in (offline runs / benchmarks).
+    if SUPABASE_BACKEND == "fake":
+        return create_fake_client(FAKE_SUPABASE_DB, FAKE_SUPABASE_LATENCY_MS)
     try:
         return create_client(SUPABASE_URL, SUPABASE_KEY)
     except Exception as e:
@@ -847,6 +858,8 @@ def init_connection():
         return None
 
 supabase = init_connection()
+if _perf:
+    supabase = _perf.client(supabase)
 
 def ensure_supabase_auth():
     """Attach the logged-in user's JWT to PostgREST so RLS-protected inserts/selects work."""
@@ -934,6 +947,7 @@ def _activate_pending_invites(user):
     except Exception:
         pass
 
+@_timed
 def _get_accessible_accounts(user):
     """Return list of dicts: {label, owner_user_id, role}. Includes My Account as first."""
     out = [{"label": "My Account", "owner_user_id": user.id, "role": "editor"}]
@@ -996,6 +1010,7 @@ def _get_accessible_accounts(user):
         pass
     return out
 
+@_timed
 def _set_active_account(user):
     """Render account selector + set active user context."""
     _ensure_user_preferences_row(user)
@@ -1089,13 +1104,22 @@ def community_page(user):
         # Fallback: join preferences + latest metrics in Python
         prefs = supabase.table("user_preferences").select("user_id, display_name").eq("share_stats", True).execute().data or []
         rows = []
+        # One keyset scan over every sharer's metrics instead of a query per user; keep the latest row each
+        share_ids = [p["user_id"] for p in prefs if p.get("user_id")]
+        latest = {}
+        if share_ids:
+            all_mets = _fetch_all(lambda: supabase.table("user_metrics")
+                                  .select("id,user_id,wtd_pct,mtd_pct,ytd_pct,w52_pct,as_of_date,updated_at")
+                                  .in_("user_id", share_ids))
+            for m in sorted(all_mets, key=lambda m: str(m.get("as_of_date") or ""), reverse=True):
+                latest.setdefault(m.get("user_id"), m)
         for p in prefs:
             uid = p.get("user_id")
             if not uid:
                 continue
-            mets = supabase.table("user_metrics").select("wtd_pct,mtd_pct,ytd_pct,w52_pct,as_of_date,updated_at").eq("user_id", uid).order("as_of_date", desc=True).limit(1).execute().data or []
-            if mets:
-                r = mets[0]
+            r = latest.get(uid)
+            if r:
+                r = {k: v for k, v in r.items() if k != "id"}
 
                 # Support both w52_pct and w_52_pct column names
                 if r.get("w52_pct") is None and r.get("w_52_pct") is not None:
@@ -1188,7 +1212,7 @@ def account_sharing_page(user):
 
     # Preferences
     try:
-        pref = supabase.table("user_preferences").select("*").eq("user_id", uid).limit(1).execute().data
+        pref = supabase.table("user_preferences").select("display_name, share_stats").eq("user_id", uid).limit(1).execute().data
         pref = pref[0] if pref else {}
     except Exception:
         pref = {}
@@ -1441,56 +1465,42 @@ def format_date_custom(d_val):
         return str(d_val)
     except: return str(d_val)
 
-def clean_number(val):
-    if val is None or pd.isna(val) or val == "":
-        return 0.0
-    if isinstance(val, (int, float)):
-        return float(val)
-    s = str(val).strip().replace('$', '').replace(',', '').replace(' ', '').replace('CAD', '').replace('USD', '')
-    try: return float(s)
-    except: return 0.0
+@_timed
+def _fetch_all(make_query, page_size: int | None = None, parallel: bool = False):
+    """Fetch all rows for a query factory using keyset pagination on id.
 
-def normalize_columns(df):
-    if not df.empty:
-        if 'ticker' in df.columns and 'symbol' not in df.columns: df['symbol'] = df['ticker']
-        if 'strike_price' in df.columns and 'strike' not in df.columns: df['strike'] = df['strike_price']
-        if 'expiration_date' in df.columns and 'expiration' not in df.columns: df['expiration'] = df['expiration_date']
-        # If both exist, prefer expiration_date (some older rows may have wrong 'expiration')
-        if 'expiration_date' in df.columns and 'expiration' in df.columns:
-            df['expiration'] = df['expiration_date'].fillna(df['expiration'])
-        if 'contracts' in df.columns:
-            if 'quantity' not in df.columns: df['quantity'] = df['contracts']
-            else: df['quantity'] = df['quantity'].fillna(df['contracts'])
-        if 'quantity' in df.columns: df['quantity'] = df['quantity'].fillna(0)
-    return df
-
-def _fetch_all(query_builder, batch_size: int = 1000):
-    """Fetch all rows from a Supabase query using range() pagination."""
-    out = []
-    start = 0
-    while True:
-        end = start + batch_size - 1
-        res = query_builder.range(start, end).execute()
-        data = getattr(res, "data", None) or []
-        if not data:
-            break
-        out.extend(data)
-        if len(data) < batch_size:
-            break
-        start += batch_size
-    return out
+    `make_query` is a zero-arg callable returning a fresh filtered select (which
+    must include `id`); rows come back in id order, callers sort as needed.
+    With parallel=True the factory must also accept `count=` and pass it to
+    select(); pages are then fetched concurrently after one counted request.
+    """
+    if parallel:
+        return fetch_parallel(make_query, page_size=page_size)
+    return fetch_keyset(make_query, page_size=page_size)
+
+def _tables_fingerprint(*tables):
+    """caches.cached(fingerprint=) probe: row count + max(updated_at) of the account's rows."""
+    return lambda user_id: fingerprints.probe(supabase, tables, user_id)
+
+@caches.cached(caches.PORTFOLIO, account="user_id", show_spinner=False, ttl=600,
+               fingerprint=_tables_fingerprint("transactions"))
+def _usd_cash_balance(user_id):
+    rows = _fetch_all(lambda: supabase.table("transactions").select("id, amount")
+                      .eq("user_id", user_id)
+                      .eq("currency", "USD"))
+    if not rows:
+        return 0.0
+    return float(pd.DataFrame(rows)["amount"].fillna(0).sum())
 
+@_timed
 def get_cash_balance(user_id):
     try:
-        qb = supabase.table("transactions").select("amount")            .eq("user_id", user_id)            .eq("currency", "USD")
-        rows = _fetch_all(qb)
-        if not rows:
-            return 0.0
-        return float(pd.DataFrame(rows)["amount"].fillna(0).sum())
+        return _usd_cash_balance(user_id)
     except Exception as e:
         st.error(f"Cash balance query failed: {e}")
         return 0.0
 
+@_timed
 def get_net_invested_cad(user_id):
     try:
         response = supabase.table("transactions").select("amount").eq("user_id", user_id).eq("currency", "CAD").in_("type", ["DEPOSIT", "WITHDRAWAL"]).execute()
@@ -1498,7 +1508,8 @@ def get_net_invested_cad(user_id):
         return df['amount'].sum() if not df.empty else 0.0
     except: return 0.0
 
-@st.cache_data(ttl=60)
+@_timed(cached=True)
+@caches.cached(caches.QUOTES, ttl=60)
 def get_live_stock_price(symbol):
     """
     Fetches the latest live price for a given symbol.
@@ -1529,38 +1540,18 @@ def get_live_stock_price(symbol):
         return 1.0
 
     try:
-        ticker = yf.Ticker(clean_sym)
-        
-        # STRATEGY 1: Check fast_info (Real-time)
-        try:
-            price = ticker.fast_info.last_price
-            if price and not pd.isna(price) and price > 0: 
-                return float(price)
-        except: pass
-
-        # STRATEGY 2: Check History (Back 5 days for weekends)
-        # We look back 5 days to ensure we hit a weekday if it's currently Sat/Sun
-        hist = ticker.history(period="5d")
-        if not hist.empty:
-            return float(hist['Close'].iloc[-1])
-        
-        # STRATEGY 3: Last Resort (Previous Close)
-        try:
-            return float(ticker.info.get('previousClose', 0.0))
-        except: pass
-
-        return 0.0
+        # fast_info -> 5d history (weekends) -> previousClose; see YFinanceProvider.last_price
+        return float(marketdata.get_provider().last_price(clean_sym) or 0.0)
     except: 
         # If it fails, return 0 so the dashboard falls back to your manual price
         return 0.0
 
 
-@st.cache_data(ttl=300)
+@_timed(cached=True)
+@caches.cached(caches.CHAINS, ttl=300)
 def _yahoo_option_chain(symbol: str, expiry: str):
     """Return (calls_df, puts_df) for a given symbol/expiry from Yahoo Finance via yfinance."""
-    t = yf.Ticker(symbol)
-    chain = t.option_chain(expiry)
-    return chain.calls, chain.puts
+    return marketdata.get_provider().option_chain(symbol, expiry)
 
 def _clean_symbol_for_yahoo(symbol: str) -> str:
     """Best-effort symbol cleaning to avoid yfinance 'delisted' issues."""
@@ -1575,21 +1566,19 @@ def _clean_symbol_for_yahoo(symbol: str) -> str:
     return s.strip().upper()
 
 
-@st.cache_data(ttl=60 * 60 * 24 * 7, show_spinner=False)
-def get_sector_industry(symbol: str):
-    """Return (sector, industry) for a ticker symbol using yfinance.
-    Cached for 7 days to avoid rate limits / slowness."""
-    sym = _clean_symbol_for_yahoo(symbol)
-    if not sym:
-        return ("Unknown", "Unknown")
-    try:
-        t = yf.Ticker(sym)
-        info = getattr(t, "info", None) or {}
-        sector = info.get("sector") or "Unknown"
-        industry = info.get("industry") or "Unknown"
-        return (sector, industry)
-    except Exception:
-        return ("Unknown", "Unknown")
+@_timed
+def get_sector_industry(tickers) -> pd.DataFrame:
+    """Sector / Industry per ticker (same order) from public.symbol_metadata in one query.
+    Symbols without a stored row are fetched from Yahoo in the background (src/symbols.py)
+    and read as "Unknown" until then; `Known` flags the ones that have a row."""
+    clean = pd.Series([_clean_symbol_for_yahoo(t) for t in tickers], dtype=object)
+    meta = symbols.lookup(supabase, clean)
+    return pd.DataFrame({
+        "Sector": clean.map(meta["sector"]).fillna("Unknown").to_numpy(),
+        "Industry": clean.map(meta["industry"]).fillna("Unknown").to_numpy(),
+        "Known": clean.isin(meta.index).to_numpy(),
+    })
+@_timed
 def get_yahoo_option_mid_price(symbol: str, expiry, strike, right: str):
     """Get Yahoo mid price ( (bid+ask)/2 ) for an option contract, with sensible fallbacks.
 
@@ -1633,33 +1622,42 @@ def get_yahoo_option_mid_price(symbol: str, expiry, strike, right: str):
         return None
 
 
-@st.cache_data(ttl=3600)
+@_timed(cached=True)
+@caches.cached(caches.FX, ttl=3600)
 def get_usd_to_cad_rate():
     try:
-        ticker = yf.Ticker("CAD=X")
-        hist = ticker.history(period="1d")
+        hist = marketdata.get_provider().history("CAD=X", "1d")
         if not hist.empty: return hist['Close'].iloc[-1]
     except: pass
     return 1.40 
 
+@_timed
+@caches.cached(caches.PORTFOLIO, account="user_id", show_spinner=False, ttl=600,
+               fingerprint=_tables_fingerprint("assets", "options"))
 def get_portfolio_data(user_id):
-    assets_res = supabase.table("assets").select("*").eq("user_id", user_id).neq("quantity", 0).execute()
-    assets_df = pd.DataFrame(assets_res.data)
-    assets_df = normalize_columns(assets_df)
-    
-    options_res = supabase.table("options").select("*").eq("user_id", user_id).eq("status", "open").execute()
-    options_df = pd.DataFrame(options_res.data)
-    options_df = normalize_columns(options_df)
+    assets_res = supabase.table("assets").select(schema.ASSET_POSITIONS.select).eq("user_id", user_id).neq("quantity", 0).execute()
+    assets_df = schema.ASSET_POSITIONS.frame(assets_res.data)
+
+    options_res = supabase.table("options").select(schema.OPEN_OPTIONS.select).eq("user_id", user_id).eq("status", "open").execute()
+    options_df = schema.OPEN_OPTIONS.frame(options_res.data)
     return assets_df, options_df
 
+@caches.cached(caches.PORTFOLIO, account="user_id", show_spinner=False, ttl=600,
+               fingerprint=_tables_fingerprint("portfolio_history"))
+def _portfolio_history(user_id):
+    res = supabase.table("portfolio_history").select(schema.SNAPSHOTS.select).eq("user_id", user_id).order("snapshot_date", desc=False).execute()
+    return schema.SNAPSHOTS.frame(res.data)
+
+@_timed
 def get_portfolio_history(user_id):
     try:
-        res = supabase.table("portfolio_history").select("*").eq("user_id", user_id).order("snapshot_date", desc=False).execute()
-        return pd.DataFrame(res.data)
+        return _portfolio_history(user_id)
     except: return pd.DataFrame()
 
 
-@st.cache_data(show_spinner=False, ttl=600)
+@_timed
+@caches.cached(caches.PORTFOLIO, account="user_id", show_spinner=False, ttl=600,
+               fingerprint=_tables_fingerprint("portfolio_history", "transactions"))
 def compute_52w_pct_from_history(user_id: str):
     """Compute trailing 52W % on-the-fly from portfolio_history weekly snapshots.
 
@@ -1668,91 +1666,39 @@ def compute_52w_pct_from_history(user_id: str):
     Returns a decimal (e.g., 0.1234 for 12.34%).
     """
     try:
-        hist_df = get_portfolio_history(user_id)
-        if hist_df is None or hist_df.empty:
-            return None
-
-        hist_df = normalize_columns(hist_df)
-        if "snapshot_date" not in hist_df.columns or "total_equity" not in hist_df.columns:
+        hist_df = analytics.snapshot_frame(get_portfolio_history(user_id))
+        if hist_df is None:
             return None
-
-        hist_df = hist_df[["snapshot_date", "total_equity"]].copy()
-        hist_df["snapshot_date"] = pd.to_datetime(hist_df["snapshot_date"], errors="coerce")
-        hist_df["total_equity"] = pd.to_numeric(hist_df["total_equity"], errors="coerce")
-        hist_df = hist_df.dropna(subset=["snapshot_date", "total_equity"]).sort_values("snapshot_date", ascending=True)
         if len(hist_df) < 2:
             return 0.0
 
         # Deposits/withdrawals in USD to flow-normalize returns
         tx_res = supabase.table("transactions").select("transaction_date, amount, type, currency")\
             .eq("user_id", user_id).in_("type", ["DEPOSIT", "WITHDRAWAL"]).execute()
-        tx_df = pd.DataFrame(tx_res.data)
-        if not tx_df.empty:
-            tx_df = normalize_columns(tx_df)
-            tx_df["transaction_date"] = pd.to_datetime(tx_df["transaction_date"], errors="coerce")
-            tx_df["amount"] = pd.to_numeric(tx_df["amount"], errors="coerce")
-            tx_df = tx_df.dropna(subset=["transaction_date", "amount"])
-            if "currency" in tx_df.columns:
-                tx_df = tx_df[tx_df["currency"].astype(str).str.upper() == "USD"]
-        else:
-            tx_df = pd.DataFrame(columns=["transaction_date", "amount", "type", "currency"])
-
-        weekly_rets = []
-        for i in range(len(hist_df)):
-            curr_date = hist_df.iloc[i]["snapshot_date"]
-            curr_eq = float(hist_df.iloc[i]["total_equity"])
-
-            if i == 0:
-                prev_date = pd.Timestamp.min
-                prev_eq = 0.0
-            else:
-                prev_date = hist_df.iloc[i-1]["snapshot_date"]
-                prev_eq = float(hist_df.iloc[i-1]["total_equity"])
-
-            net_flow = 0.0
-            if not tx_df.empty:
-                mask = (tx_df["transaction_date"] > prev_date) & (tx_df["transaction_date"] <= curr_date)
-                net_flow = float(tx_df.loc[mask, "amount"].sum())
-
-            base_capital = prev_eq + net_flow
-            weekly_profit = curr_eq - base_capital
-
-            if base_capital == 0:
-                weekly_ret = 0.0
-            else:
-                weekly_ret = weekly_profit / base_capital
-
-            weekly_rets.append(float(weekly_ret))
+        tx_df = analytics.usd_flows(pd.DataFrame(tx_res.data))
+        weekly = analytics.weekly_flow_returns(hist_df, tx_df)
 
         # Trailing 52 snapshot weeks (include i=0)
-        end_i = len(hist_df) - 1
-        start_k = max(0, end_i - 51)
-        window_rets = [float(weekly_rets[k]) for k in range(start_k, end_i + 1)]
-
-        prod = 1.0
-        for r in window_rets:
-            if r is None or (isinstance(r, float) and (math.isinf(r) or math.isnan(r))):
-                r = 0.0
-            prod *= (1.0 + float(r))
-
-        return float(prod - 1.0) if window_rets else 0.0
+        return analytics.compound(weekly["ret"].iloc[-52:])
 
     except Exception:
         return None
 
 
 
+@_timed
 def get_baseline_snapshot(user_id):
     try:
         current_year = date.today().year
         prev_year_end = f"{current_year - 1}-12-31"
-        res = supabase.table("portfolio_history").select("*").eq("user_id", user_id).eq("snapshot_date", prev_year_end).execute()
+        res = supabase.table("portfolio_history").select(schema.SNAPSHOTS.select).eq("user_id", user_id).eq("snapshot_date", prev_year_end).execute()
         if res.data: return res.data[0] 
-        res = supabase.table("portfolio_history").select("*").eq("user_id", user_id).gte("snapshot_date", f"{current_year}-01-01").order("snapshot_date", desc=False).limit(1).execute()
+        res = supabase.table("portfolio_history").select(schema.SNAPSHOTS.select).eq("user_id", user_id).gte("snapshot_date", f"{current_year}-01-01").order("snapshot_date", desc=False).limit(1).execute()
         if res.data: return res.data[0]
         return None
     except: return None
 
+@caches.invalidates(account="user_id")
 def log_transaction(user_id, description, amount, trade_type, symbol, date_obj, currency="USD", txg: str | None = None):
     if st.session_state.get("read_only"):
         st.error("Read-only access: you don't have permission to modify this account.")
@@ -1797,6 +1743,7 @@ def log_transaction(user_id, description, amount, trade_type, symbol, date_obj,
 # 5. CORE LOGIC
 
     # --------------------------------------------------------------------------------
+@caches.invalidates(account="user_id")
 def update_asset_position(user_id, symbol, quantity, price, action, date_obj, asset_type="STOCK", expiration=None, strike=None, fees=0.0, txg: str | None = None):
     if st.session_state.get("read_only"):
         st.error("Read-only access: you don't have permission to modify this account.")
@@ -1820,7 +1767,7 @@ def update_asset_position(user_id, symbol, quantity, price, action, date_obj, as
     
     log_transaction(user_id, desc_label, cash_impact, "TRADE_" + asset_type, symbol, date_obj, currency="USD", txg=txg)
     
-    query = supabase.table("assets").select("*").eq("user_id", user_id).eq("ticker", symbol)
+    query = supabase.table("assets").select("id, quantity, cost_basis").eq("user_id", user_id).eq("ticker", symbol)
     if "LEAP" in asset_type: query = query.like("type", "LEAP%").eq("strike_price", strike).eq("expiration", str(expiration))
     else: query = query.eq("type", "STOCK")
     existing = query.execute()
@@ -1847,6 +1794,7 @@ def update_asset_position(user_id, symbol, quantity, price, action, date_obj, as
         if expiration: data["expiration"] = str(expiration)
         supabase.table("assets").insert(data).execute()
 
+@caches.invalidates(account="user_id")
 def update_short_option_position(user_id, symbol, quantity, price, action, date_obj, opt_type, expiration, strike, fees=0.0, linked_asset_id_override=None, txg: str | None = None):
     if st.session_state.get("read_only"):
         st.error("Read-only access: you don't have permission to modify this account.")
@@ -1871,10 +1819,10 @@ def update_short_option_position(user_id, symbol, quantity, price, action, date_
     if action == "Sell":
         linked_asset_id = None
         if opt_type == "CALL":
-            stocks = supabase.table("assets").select("*").eq("user_id", user_id).eq("ticker", symbol).eq("type", "STOCK").neq("quantity", 0).execute()
+            stocks = supabase.table("assets").select("id").eq("user_id", user_id).eq("ticker", symbol).eq("type", "STOCK").neq("quantity", 0).execute()
             if stocks.data: linked_asset_id = stocks.data[0]['id']
             else:
-                leaps = supabase.table("assets").select("*").eq("user_id", user_id).eq("ticker", symbol).neq("type", "STOCK").neq("quantity", 0).execute()
+                leaps = supabase.table("assets").select("id").eq("user_id", user_id).eq("ticker", symbol).neq("type", "STOCK").neq("quantity", 0).execute()
                 if leaps.data: linked_asset_id = leaps.data[0]['id']
         if linked_asset_id_override is not None:
             linked_asset_id = linked_asset_id_override
@@ -1885,7 +1833,7 @@ def update_short_option_position(user_id, symbol, quantity, price, action, date_
         }
         supabase.table("options").insert(payload).execute()
     else:
-        res = supabase.table("options").select("*").eq("user_id", user_id).eq("symbol", symbol).eq("strike_price", strike).eq("expiration_date", exp_iso).eq("type", opt_type).eq("status", "open").execute()
+        res = supabase.table("options").select(schema.OPTION_LOTS.select).eq("user_id", user_id).eq("symbol", symbol).eq("strike_price", strike).eq("expiration_date", exp_iso).eq("type", opt_type).eq("status", "open").execute()
         remaining_to_close = int(quantity)
         if res.data:
             for row in res.data:
@@ -1894,17 +1842,20 @@ def update_short_option_position(user_id, symbol, quantity, price, action, date_
                 if avail <= remaining_to_close: supabase.table("options").update({"status": "closed"}).eq("id", row['id']).execute(); remaining_to_close -= avail
                 else: left = avail - remaining_to_close; supabase.table("options").update({"contracts": left}).eq("id", row['id']).execute(); remaining_to_close = 0
 
+@caches.invalidates(account="user_id")
 def handle_assignment(user_id, option_id, symbol, strike, type_, quantity):
     supabase.table("options").update({"status": "assigned"}).eq("id", option_id).execute()
     trade_date = datetime.now().date()
     if type_ == "PUT": update_asset_position(user_id, symbol, quantity * 100, strike, "Buy", trade_date, "STOCK"); st.success(f"Assigned on PUT. Bought {quantity*100} shares.")
     elif type_ == "CALL": update_asset_position(user_id, symbol, quantity * 100, strike, "Sell", trade_date, "STOCK"); st.success(f"Assigned on CALL. Sold {quantity*100} shares.")
 
+@caches.invalidates(account="user_id")
 def capture_snapshot(user_id, total_eq_usd, ex_rate, snap_date):
     existing = supabase.table("portfolio_history").select("id").eq("user_id", user_id).eq("snapshot_date", snap_date.isoformat()).execute()
     if existing.data: supabase.table("portfolio_history").update({ "total_equity": total_eq_usd, "exchange_rate": ex_rate, "currency": "USD" }).eq("id", existing.data[0]['id']).execute()
     else: supabase.table("portfolio_history").insert({ "user_id": user_id, "snapshot_date": snap_date.strftime("%Y-%m-%d"), "total_equity": total_eq_usd, "exchange_rate": ex_rate, "cash_balance": 0, "stock_value": 0, "long_option_value": 0, "short_liability_estimate": 0, "currency": "USD" }).execute()
 
+@_timed
 def get_net_liquidation_usd(user_id):
     # NET LIQUIDATION VALUE (Ignoring ITM Puts)
     cash_usd = get_cash_balance(user_id)
@@ -1937,6 +1888,7 @@ def get_net_liquidation_usd(user_id):
                 
     return cash_usd + asset_val - liability_val
 
+@_timed
 def get_distinct_holdings(user_id):
     try:
         res = supabase.table("assets").select("ticker").eq("user_id", user_id).neq("quantity", 0).execute()
@@ -1944,12 +1896,14 @@ def get_distinct_holdings(user_id):
         return []
     except: return []
 
+@_timed
 def get_holdings_for_symbol(user_id, symbol):
     try:
-        res = supabase.table("assets").select("*").eq("user_id", user_id).eq("ticker", symbol).neq("quantity", 0).execute()
+        res = supabase.table("assets").select(schema.ASSET_LOTS.select).eq("user_id", user_id).eq("ticker", symbol).neq("quantity", 0).execute()
         return res.data
     except: return []
 
+@_timed
 def get_locked_collateral(user_id):
     """Returns {asset_id: contracts_used} for open options with linked collateral.
 
@@ -1976,6 +1930,7 @@ def get_locked_collateral(user_id):
         return {}
 
 
+@caches.invalidates(account="user_id")
 def detach_collateral_links_for_asset(user_id, asset_id):
     """
     When a collateral asset (LEAP) is sold/closed, any open short options linked to it become uncovered.
@@ -1986,6 +1941,7 @@ def detach_collateral_links_for_asset(user_id, asset_id):
     except Exception:
         pass
 
+@_timed
 def get_open_short_call_contracts(user_id, symbol):
     """Total open short CALL contracts for a ticker (used to infer collateral usage when linked_asset_id is missing)."""
     try:
@@ -2015,14 +1971,30 @@ def dashboard_page(active_user, view: str = "summary"):
     else:
         st.header("Executive Dashboard")
 
+    # --- Data Loading ---
+    # All independent reads (plus quotes for last render's symbols) go out concurrently.
+    logged_in_uid = getattr(st.session_state.get("user"), "id", None)
+    delegated = bool(logged_in_uid) and str(uid) != str(logged_in_uid)
+    known_key = f"_known_symbols_{uid}"
+    page_data = load_dashboard_data(
+        supabase, uid,
+        token=st.session_state.get("access_token") or "",
+        known_symbols=st.session_state.get(known_key, ()),
+        quote_fn=get_live_stock_price,
+        check_delegation=delegated,
+        viewer_id=str(logged_in_uid or ""),
+    )
+    st.session_state[known_key] = page_data.symbols
+    if "cash_usd" in page_data.errors:
+        st.error(f"Cash balance query failed: {page_data.errors['cash_usd']}")
+
+    # Flows (DEPOSIT/WITHDRAWAL, all currencies) are loaded once and reused by every period calc below.
+    flows_all = page_data.flows
+
     # Delegated mode diagnostics: if key tables are unreadable, the dashboard will show zeros.
     try:
-        logged_in = st.session_state.get("user")
-        logged_in_uid = getattr(logged_in, "id", None)
-        if logged_in_uid and str(uid) != str(logged_in_uid):
-            ph = supabase.table("portfolio_history").select("id").eq("user_id", uid).limit(1).execute().data or []
-            tx = supabase.table("transactions").select("id").eq("user_id", uid).limit(1).execute().data or []
-            if (not ph) and (not tx):
+        if delegated:
+            if not page_data.readable:
                 if view != "holdings":
                     st.warning("Delegated access is active, but portfolio_history / transactions are not readable. This is a Supabase Row Level Security (RLS) policy issue, so calculations fall back to 0. To make delegated mode behave exactly like the owner, allow delegates to SELECT the owner's rows in these tables.")
     except Exception:
@@ -2035,117 +2007,16 @@ def dashboard_page(active_user, view: str = "summary"):
     if view != "holdings":
         st.caption(f"Exchange Rate (live): 1 USD = {fx:.4f} CAD")
 
-    # --- Data Loading ---
-    cash_usd = float(get_cash_balance(uid) or 0.0)
+    cash_usd = float(page_data.cash_usd or 0.0)
     cash_usd_v = float(cash_usd or 0.0)
     cash_cad_v = float(cash_usd_v * fx)
-    assets, options = get_portfolio_data(uid)
-
-    # Normalize asset types
-    try:
-        if not assets.empty and 'type' in assets.columns:
-            assets['type_norm'] = assets['type'].astype(str).str.upper().str.strip()
-        else:
-            assets['type_norm'] = 'STOCK'
-    except Exception:
-        assets['type_norm'] = 'STOCK'
+    assets, options = page_data.assets, page_data.options
 
     # --- Calculations (USD) ---
-    stock_value_usd = 0.0
-    leap_value_usd = 0.0
-    itm_liability_usd = 0.0
-
-    # 1. Assets Calculation (same logic as option details)
-    if not assets.empty:
-        for idx_row, row in assets.iterrows():
-            qty = clean_number(row.get('quantity', 0))
-            r_type_raw = str(row.get('type', '')).upper().strip()
-            assets.at[idx_row, 'type_norm'] = r_type_raw
-            r_type_disp = r_type_raw.replace('LONG_', 'LEAP ').replace('LEAP_', 'LEAP ')
-            assets.at[idx_row, 'type_disp'] = r_type_disp
-
-            if r_type_raw == 'STOCK':
-                sym = str(row.get('symbol', row.get('ticker', ''))).strip().upper()
-                live_price = get_live_stock_price(sym)
-                if live_price == 0:
-                    live_price = clean_number(row.get('last_price', 0))
-                assets.at[idx_row, 'current_price'] = live_price
-                assets.at[idx_row, 'market_value'] = qty * live_price
-                stock_value_usd += (qty * live_price)
-            else:
-                # LEAP/LONG options: use manual last_price as current_price
-                manual_price = clean_number(row.get('last_price', 0))
-                assets.at[idx_row, 'current_price'] = manual_price
-                assets.at[idx_row, 'market_value'] = qty * 100 * manual_price
-                # We'll recompute leap_value_usd after loop to guarantee consistency
-
-    # Ensure LEAP Equity matches table formula exactly: qty * 100 * current_price
-    try:
-        leap_value_usd = 0.0
-        if not assets.empty and 'type_norm' in assets.columns:
-            non_stock = assets[assets['type_norm'] != 'STOCK'].copy()
-            if not non_stock.empty:
-                non_stock['qty_num'] = pd.to_numeric(non_stock.get('quantity', 0), errors='coerce').fillna(0)
-                non_stock['px_num'] = pd.to_numeric(non_stock.get('current_price', non_stock.get('last_price', 0)), errors='coerce').fillna(0)
-                leap_value_usd = float((non_stock['qty_num'] * 100.0 * non_stock['px_num']).sum())
-    except Exception:
-        leap_value_usd = 0.0
-
-    # 2. Options Liability (ITM CALL intrinsic only)
-    grouped_options = {}
-    if not options.empty:
-        for _, row in options.iterrows():
-            qty = abs(clean_number(row.get('quantity') or row.get('contracts') or 0))
-            strike = float(clean_number(row.get('strike_price') or row.get('strike') or 0))
-            sym = str(row.get('symbol', row.get('ticker', ''))).strip().upper()
-            opt_type = str(row.get('type', '')).strip().upper()
-
-            raw_exp = row.get('expiration')
-            if raw_exp is None or pd.isna(raw_exp):
-                raw_exp = row.get('expiration_date')
-            exp_str = str(raw_exp) if raw_exp else ""
-
-            underlying_price = get_live_stock_price(sym)
-
-            intrinsic_val = 0.0
-            if underlying_price > 0 and "CALL" in opt_type and underlying_price > strike:
-                intrinsic_val = (underlying_price - strike) * qty * 100
-
-            itm_liability_usd += intrinsic_val
-
-            key = (sym, opt_type, exp_str, strike)
-            if key not in grouped_options:
-                grouped_options[key] = {
-                    'symbol': sym,
-                    'type': opt_type,
-                    'expiration': exp_str,
-                    'strike': strike,
-                    'qty': 0.0,
-                    'price': underlying_price,
-                    'liability': 0.0,
-                    'constituents': [],
-                    'linked_assets': []
-                }
-
-            grouped_options[key]['qty'] += qty
-            grouped_options[key]['liability'] += intrinsic_val
-
-            old_premium = row.get('premium_received')
-            if old_premium is None:
-                old_premium = row.get('cost_basis', 0)
-
-            lid = row.get('linked_asset_id')
-            if lid and not pd.isna(lid):
-                grouped_options[key]['linked_assets'].append(str(lid))
-
-            grouped_options[key]['constituents'].append({
-                'id': row['id'],
-                'qty': qty,
-                'cost_basis': row.get('cost_basis', 0),
-                'premium_received': old_premium,
-                'open_date': row.get('open_date'),
-                'linked_asset_id': lid
-            })
+    nav = analytics.value_positions(assets, options, get_live_stock_price)
+    stock_value_usd, leap_value_usd = nav.stock_value, nav.leap_value
+    itm_liability_usd = nav.itm_liability
+    grouped_options = nav.grouped_options
 
     net_liq_usd = cash_usd + stock_value_usd + leap_value_usd - itm_liability_usd
     net_liq_cad = net_liq_usd * fx
@@ -2163,9 +2034,7 @@ def dashboard_page(active_user, view: str = "summary"):
     def _net_flows_usd(d0, d1):
         """Net DEPOSIT/WITHDRAWAL flows in USD between (d0, d1], using transaction_date."""
         try:
-            tx_res = supabase.table("transactions").select("transaction_date, amount, type, currency")\
-                .eq("user_id", uid).in_("type", ["DEPOSIT", "WITHDRAWAL"]).execute()
-            tx = pd.DataFrame(tx_res.data)
+            tx = flows_all
             if tx.empty:
                 return 0.0
             tx = tx[tx["currency"] == "USD"].copy()
@@ -2177,7 +2046,7 @@ def dashboard_page(active_user, view: str = "summary"):
             return 0.0
 
     # Pull snapshots once
-    hist = get_portfolio_history(uid)
+    hist = page_data.history
     if not hist.empty:
         hist = hist.copy()
         hist["snapshot_date"] = pd.to_datetime(hist["snapshot_date"], errors="coerce")
@@ -2254,91 +2123,22 @@ def dashboard_page(active_user, view: str = "summary"):
     # This compounds week-over-week and therefore ignores deposits/withdrawals (they are normalized out in Weekly %).
     def _lifetime_compound_from_weekly_snapshot_pct():
         try:
-            hist_df = get_portfolio_history(uid)
+            hist_df = analytics.snapshot_frame(page_data.history)
             if hist_df is None or hist_df.empty:
                 return None
 
-            hist_df = normalize_columns(hist_df)
-            if "snapshot_date" not in hist_df.columns or "total_equity" not in hist_df.columns:
-                return None
-
-            hist_df = hist_df[["snapshot_date", "total_equity"]].copy()
-            hist_df["snapshot_date"] = pd.to_datetime(hist_df["snapshot_date"], errors="coerce")
-            hist_df["total_equity"] = pd.to_numeric(hist_df["total_equity"], errors="coerce")
-            hist_df = hist_df.dropna(subset=["snapshot_date", "total_equity"]).sort_values("snapshot_date", ascending=True)
-            if hist_df.empty:
-                return None
-
-            # Transactions needed to compute Weekly % (flow-normalized)
-            tx_res = supabase.table("transactions").select("transaction_date, amount, type, currency")                .eq("user_id", uid).in_("type", ["DEPOSIT", "WITHDRAWAL"]).execute()
-            tx_df = pd.DataFrame(tx_res.data)
-            if not tx_df.empty:
-                tx_df = normalize_columns(tx_df)
-                tx_df["transaction_date"] = pd.to_datetime(tx_df["transaction_date"], errors="coerce")
-                tx_df["amount"] = pd.to_numeric(tx_df["amount"], errors="coerce")
-                tx_df = tx_df.dropna(subset=["transaction_date", "amount"])
-                # Keep USD flows only for USD equity snapshots
-                if "currency" in tx_df.columns:
-                    tx_df = tx_df[tx_df["currency"].astype(str).str.upper() == "USD"]
-            else:
-                tx_df = pd.DataFrame(columns=["transaction_date", "amount", "type", "currency"])
-
-            weekly_rets = []
-            weekly_profits = []
-            for i in range(len(hist_df)):
-                curr_date = hist_df.iloc[i]["snapshot_date"]
-                curr_eq = float(hist_df.iloc[i]["total_equity"])
-
-                if i == 0:
-                    prev_date = pd.Timestamp.min
-                    prev_eq = 0.0
-                else:
-                    prev_date = hist_df.iloc[i-1]["snapshot_date"]
-                    prev_eq = float(hist_df.iloc[i-1]["total_equity"])
-
-                net_flow = 0.0
-                if not tx_df.empty:
-                    mask = (tx_df["transaction_date"] > prev_date) & (tx_df["transaction_date"] <= curr_date)
-                    net_flow = float(tx_df.loc[mask, "amount"].sum())
-
-                base_capital = prev_eq + net_flow
-                weekly_profit = curr_eq - base_capital
-
-                if base_capital == 0:
-                    weekly_ret = 0.0
-                else:
-                    weekly_ret = weekly_profit / base_capital
-
-                weekly_rets.append(float(weekly_ret))
-                weekly_profits.append(float(weekly_profit))
+            # Transactions needed to compute Weekly % (flow-normalized); USD flows only for USD equity snapshots
+            tx_df = analytics.usd_flows(flows_all)
+            weekly = analytics.weekly_flow_returns(hist_df, tx_df)
 
             # Include the current (unfrozen) week from the last snapshot to today
-            last_date = hist_df.iloc[-1]["snapshot_date"]
-            last_eq = float(hist_df.iloc[-1]["total_equity"])
-            cur_flow = 0.0
-            if not tx_df.empty:
-                mask_cur = tx_df["transaction_date"] > last_date
-                cur_flow = float(tx_df.loc[mask_cur, "amount"].sum())
-            cur_base = last_eq + cur_flow
-            cur_profit = float(net_liq_usd) - float(cur_base)
-            cur_ret = (cur_profit / cur_base) if cur_base not in (0, 0.0, None) else 0.0
-
-            # Compound Weekly % week-over-week (skip first row which is always 0)
-            prod = 1.0
-            for r in weekly_rets:
-                if r is None or (isinstance(r, float) and (math.isinf(r) or math.isnan(r))):
-                    r = 0.0
-                prod *= (1.0 + float(r))
-
-            # Include current week
-            if cur_ret is None or (isinstance(cur_ret, float) and (math.isinf(cur_ret) or math.isnan(cur_ret))):
-                cur_ret = 0.0
-            prod *= (1.0 + float(cur_ret))
-            life_pct_local = float(prod - 1.0)
+            cur_profit, cur_ret = analytics.current_week(hist_df, tx_df, net_liq_usd)
+
+            # Compound Weekly % week-over-week, then the current week
+            life_pct_local = analytics.compound(list(weekly["ret"]) + [cur_ret])
 
             # Lifetime profit dollars: sum of flow-normalized weekly P/L values + current week P/L.
-            life_profit_local = float(sum(weekly_profits)) if len(weekly_profits) > 0 else 0.0
-            life_profit_local += float(cur_profit)
+            life_profit_local = float(weekly["profit"].sum()) + float(cur_profit)
 
             return life_profit_local, life_pct_local
 
@@ -2350,95 +2150,26 @@ def dashboard_page(active_user, view: str = "summary"):
         Uses portfolio_history weekly snapshots and flow-normalizes weekly returns using DEPOSIT/WITHDRAWAL transactions.
         """
         try:
-            hist_df = get_portfolio_history(uid)
-            if hist_df is None or hist_df.empty:
-                return None
-
-            hist_df = normalize_columns(hist_df)
-            if "snapshot_date" not in hist_df.columns or "total_equity" not in hist_df.columns:
+            hist_df = analytics.snapshot_frame(page_data.history)
+            if hist_df is None:
                 return None
-
-            hist_df = hist_df[["snapshot_date", "total_equity"]].copy()
-            hist_df["snapshot_date"] = pd.to_datetime(hist_df["snapshot_date"], errors="coerce")
-            hist_df["total_equity"] = pd.to_numeric(hist_df["total_equity"], errors="coerce")
-            hist_df = hist_df.dropna(subset=["snapshot_date", "total_equity"]).sort_values("snapshot_date", ascending=True)
             if len(hist_df) < 2:
                 return 0.0, 0.0
 
-            # Transactions needed to compute Weekly % (flow-normalized)
-            tx_res = supabase.table("transactions").select("transaction_date, amount, type, currency")                .eq("user_id", uid).in_("type", ["DEPOSIT", "WITHDRAWAL"]).execute()
-            tx_df = pd.DataFrame(tx_res.data)
-            if not tx_df.empty:
-                tx_df = normalize_columns(tx_df)
-                tx_df["transaction_date"] = pd.to_datetime(tx_df["transaction_date"], errors="coerce")
-                tx_df["amount"] = pd.to_numeric(tx_df["amount"], errors="coerce")
-                tx_df = tx_df.dropna(subset=["transaction_date", "amount"])
-                if "currency" in tx_df.columns:
-                    tx_df = tx_df[tx_df["currency"].astype(str).str.upper() == "USD"]
-            else:
-                tx_df = pd.DataFrame(columns=["transaction_date", "amount", "type", "currency"])
-
-            weekly_rets = []
-            weekly_profits = []
-            weekly_flows = []
-            for i in range(len(hist_df)):
-                curr_date = hist_df.iloc[i]["snapshot_date"]
-                curr_eq = float(hist_df.iloc[i]["total_equity"])
-
-                if i == 0:
-                    prev_date = pd.Timestamp.min
-                    prev_eq = 0.0
-                else:
-                    prev_date = hist_df.iloc[i-1]["snapshot_date"]
-                    prev_eq = float(hist_df.iloc[i-1]["total_equity"])
-
-                net_flow = 0.0
-                if not tx_df.empty:
-                    mask = (tx_df["transaction_date"] > prev_date) & (tx_df["transaction_date"] <= curr_date)
-                    net_flow = float(tx_df.loc[mask, "amount"].sum())
-
-                base_capital = prev_eq + net_flow
-                weekly_profit = curr_eq - base_capital
-
-                if base_capital == 0:
-                    weekly_ret = 0.0
-                else:
-                    weekly_ret = weekly_profit / base_capital
-
-                weekly_rets.append(float(weekly_ret))
-                weekly_profits.append(float(weekly_profit))
-                weekly_flows.append(float(net_flow))
-
-            # Include the current (unfrozen) week from the last snapshot to today
-            last_date = hist_df.iloc[-1]["snapshot_date"]
-            last_eq = float(hist_df.iloc[-1]["total_equity"])
-            cur_flow = 0.0
-            if not tx_df.empty:
-                mask_cur = tx_df["transaction_date"] > last_date
-                cur_flow = float(tx_df.loc[mask_cur, "amount"].sum())
-            cur_base = last_eq + cur_flow
-            cur_profit = float(net_liq_usd) - float(cur_base)
-            cur_ret = (cur_profit / cur_base) if cur_base not in (0, 0.0, None) else 0.0
+            tx_df = analytics.usd_flows(flows_all)
+            weekly = analytics.weekly_flow_returns(hist_df, tx_df)
+            cur_profit, cur_ret = analytics.current_week(hist_df, tx_df, net_liq_usd)
 
             # Trailing 52 weeks INCLUDING current week:
             # take up to the last 51 snapshot weekly returns + current week = 52 periods
             end_i = len(hist_df) - 1
             start_k = max(0, end_i - 50)
+            window = weekly.iloc[start_k:end_i + 1]
 
-            window_rets = [float(weekly_rets[k]) for k in range(start_k, end_i + 1)]
-            # append current week
-            window_rets.append(float(cur_ret))
-
-            prod = 1.0
-            for r in window_rets:
-                if r is None or (isinstance(r, float) and (math.isinf(r) or math.isnan(r))):
-                    r = 0.0
-                prod *= (1.0 + float(r))
-            pct_52w = float(prod - 1.0) if window_rets else 0.0
+            pct_52w = analytics.compound(list(window["ret"]) + [cur_ret])
 
             # Dollar profit over same window: sum of weekly P/L values in window + current week P/L
-            profit_52w = float(sum(weekly_profits[start_k:end_i + 1])) if (end_i >= start_k) else 0.0
-            profit_52w += float(cur_profit)
+            profit_52w = float(window["profit"].sum()) + float(cur_profit)
 
             return profit_52w, pct_52w
 
@@ -2452,9 +2183,7 @@ def dashboard_page(active_user, view: str = "summary"):
     else:
         # Fallback: previous behavior (vs total net deposits)
         try:
-            tx_res = supabase.table("transactions").select("amount,type,currency")\
-                .eq("user_id", uid).in_("type", ["DEPOSIT", "WITHDRAWAL"]).execute()
-            tx = pd.DataFrame(tx_res.data)
+            tx = flows_all
             life_flow = float(tx[tx["currency"] == "USD"]["amount"].sum()) if not tx.empty else 0.0
         except Exception:
             life_flow = 0.0
@@ -2485,11 +2214,7 @@ def dashboard_page(active_user, view: str = "summary"):
     ]
 
     # If user opted-in to sharing, publish today's WTD/MTD/YTD metrics
-    try:
-        pref = supabase.table("user_preferences").select("share_stats").eq("user_id", uid).limit(1).execute().data
-        share_stats = bool(pref[0].get("share_stats")) if pref else False
-    except Exception:
-        share_stats = False
+    share_stats = page_data.share_stats
     if share_stats:
         _upsert_user_metrics(uid, wtd_pct, mtd_pct, ytd_pct, w52_pct)
 
@@ -2506,8 +2231,7 @@ def dashboard_page(active_user, view: str = "summary"):
         latest_pl_usd = None
         latest_pl_pct = None
         try:
-            _hist = get_portfolio_history(uid)
-            _hist = normalize_columns(_hist)
+            _hist = page_data.history
             if _hist is not None and not _hist.empty and "snapshot_date" in _hist.columns and "total_equity" in _hist.columns:
                 _hist = _hist[["snapshot_date", "total_equity"]].copy()
                 _hist["snapshot_date"] = pd.to_datetime(_hist["snapshot_date"], errors="coerce")
@@ -2697,51 +2421,22 @@ def dashboard_page(active_user, view: str = "summary"):
         _wk_stats_note = None
 
         try:
-            hist_df = get_portfolio_history(uid)
-            hist_df = normalize_columns(hist_df)
+            hist_df = page_data.history
 
             if hist_df is None or hist_df.empty:
                 _wk_stats_note = "No weekly snapshot history found yet. Create Weekly Snapshots to populate this section."
             elif "snapshot_date" not in hist_df.columns or "total_equity" not in hist_df.columns:
                 _wk_stats_note = "Weekly snapshot data is missing required fields."
             else:
-                hist_df = hist_df[["snapshot_date", "total_equity"]].copy()
-                hist_df["snapshot_date"] = pd.to_datetime(hist_df["snapshot_date"], errors="coerce")
-                hist_df["total_equity"] = pd.to_numeric(hist_df["total_equity"], errors="coerce")
-                hist_df = hist_df.dropna(subset=["snapshot_date", "total_equity"]).sort_values("snapshot_date", ascending=True)
+                hist_df = analytics.snapshot_frame(hist_df)
 
                 if len(hist_df) < 2:
                     _wk_stats_note = "Need at least 2 Weekly Snapshots to calculate win/loss weeks."
                 else:
                     # Deposits/Withdrawals in USD for flow-normalized weekly returns (same logic as Weekly Snapshot page)
-                    tx_res = supabase.table("transactions").select("transaction_date, amount, type, currency")\
-                        .eq("user_id", uid).in_("type", ["DEPOSIT", "WITHDRAWAL"]).execute()
-                    tx_df = pd.DataFrame(tx_res.data)
-                    if not tx_df.empty:
-                        tx_df = normalize_columns(tx_df)
-                        tx_df["transaction_date"] = pd.to_datetime(tx_df["transaction_date"], errors="coerce")
-                        tx_df["amount"] = pd.to_numeric(tx_df["amount"], errors="coerce").fillna(0.0)
-                        if "currency" in tx_df.columns:
-                            tx_df = tx_df[tx_df["currency"].astype(str).str.upper() == "USD"]
-                    else:
-                        tx_df = pd.DataFrame(columns=["transaction_date", "amount", "type", "currency"])
-
-                    weekly_rows = []
-                    for i in range(1, len(hist_df)):
-                        prev_date = hist_df.iloc[i-1]["snapshot_date"]
-                        prev_eq = float(hist_df.iloc[i-1]["total_equity"] or 0.0)
-                        curr_date = hist_df.iloc[i]["snapshot_date"]
-                        curr_eq = float(hist_df.iloc[i]["total_equity"] or 0.0)
-
-                        net_flow = 0.0
-                        if not tx_df.empty:
-                            mask = (tx_df["transaction_date"] > prev_date) & (tx_df["transaction_date"] <= curr_date)
-                            net_flow = float(tx_df.loc[mask, "amount"].sum())
-
-                        base_capital = prev_eq + net_flow
-                        weekly_profit = curr_eq - base_capital
-                        weekly_ret = (weekly_profit / base_capital) if base_capital else 0.0
-                        weekly_rows.append({"date": curr_date, "profit": weekly_profit, "ret": weekly_ret})
+                    tx_df = analytics.usd_flows(flows_all)
+                    # The first snapshot has no prior week to compare against
+                    weekly_rows = analytics.weekly_flow_returns(hist_df, tx_df).iloc[1:].to_dict("records")
 
                     if not weekly_rows:
                         _wk_stats_note = "No weekly snapshot rows found to compute win/loss."
@@ -2822,7 +2517,7 @@ def dashboard_page(active_user, view: str = "summary"):
         # --- Total Profit & Analysis (moved from Option Details) ---
         st.subheader("Total Profit & Analysis")
         try:
-            net_invested_cad = float(get_net_invested_cad(uid) or 0.0)
+            net_invested_cad = float(pd.to_numeric(flows_all.loc[flows_all["currency"] == "CAD", "amount"], errors="coerce").sum())
             current_val_cad = float(net_liq_cad or 0.0)
 
             lifetime_pl_cad = current_val_cad - net_invested_cad
@@ -2840,7 +2535,11 @@ def dashboard_page(active_user, view: str = "summary"):
                 start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date() if start_date_str else None
 
                 base_equity_usd = float(baseline.get("total_equity") or 0.0)
-                base_rate = float(baseline.get("exchange_rate", 1.0) or 1.0)
+                base_rate = float(baseline.get("exchange_rate") or 0.0)
+                if not base_rate and start_date:
+                    base_rate = fx_history.rate(start_date)
+                if not base_rate or pd.isna(base_rate):
+                    base_rate = float(fx or 1.0)
 
                 # Baseline value in CAD (baseline snapshot stores USD equity + an exchange_rate at snapshot time)
                 start_val_cad = base_equity_usd * base_rate
@@ -2848,9 +2547,7 @@ def dashboard_page(active_user, view: str = "summary"):
                 def _net_flows_cad(d0, d1):
                     """Net DEPOSIT/WITHDRAWAL flows between (d0, d1], expressed in CAD."""
                     try:
-                        tx_res = supabase.table("transactions").select("transaction_date, amount, type, currency")\
-                            .eq("user_id", uid).in_("type", ["DEPOSIT", "WITHDRAWAL"]).execute()
-                        tx = pd.DataFrame(tx_res.data)
+                        tx = flows_all.copy()
                         if tx.empty or d0 is None:
                             return 0.0
 
@@ -2870,10 +2567,10 @@ def dashboard_page(active_user, view: str = "summary"):
                         if cad_sum != 0.0:
                             return cad_sum
 
-                        # Fallback: convert USD flows to CAD using current fx
-                        usd_sum = float(pd.to_numeric(tx.loc[tx["currency"].astype(str).str.upper() == "USD", "amount"], errors="coerce").fillna(0).sum())
-                        fx_now = float(fx or get_usd_to_cad_rate() or 1.0)
-                        return usd_sum * fx_now
+                        # Fallback: convert USD flows to CAD at each flow's daily close
+                        usd = tx.loc[tx["currency"].astype(str).str.upper() == "USD"]
+                        usd_cad = fx_history.convert(usd["amount"], usd["transaction_date"], "USD", "CAD")
+                        return float(usd_cad.fillna(pd.to_numeric(usd["amount"], errors="coerce") * float(fx or 1.0)).sum())
                     except Exception:
                         return 0.0
 
@@ -3271,9 +2968,13 @@ def dashboard_page(active_user, view: str = "summary"):
             else:
                 df2["% of Portfolio"] = 0.0
 
-            # Attach sector/industry (cached)
-            df2["Sector"] = df2["Ticker"].apply(lambda t: get_sector_industry(t)[0])
-            df2["Industry"] = df2["Ticker"].apply(lambda t: get_sector_industry(t)[1])
+            # Attach sector/industry (one symbol_metadata lookup)
+            meta = get_sector_industry(df2["Ticker"])
+            df2["Sector"] = meta["Sector"].to_numpy()
+            df2["Industry"] = meta["Industry"].to_numpy()
+            if not meta["Known"].all():
+                st.caption(f"Fetching sector data for {int((~meta['Known']).sum())} symbol(s) in the background; "
+                           "they show as Unknown until the next refresh.")
 
             # Sort by Sector, then by Market Value desc
             df2 = df2.sort_values(["Sector", "Total Market Value"], ascending=[True, False]).reset_index(drop=True)
@@ -3559,138 +3260,15 @@ def dashboard_page(active_user, view: str = "summary"):
         # Stocks/LEAPs: running average cost (sequential)
         # Shorts: OPTION_PREMIUM cashflows
         # --------------------------
-        def _parse_trade_desc(desc: str):
-            """Parse trade descriptions into (Buy/Sell, qty, symbol, price).
-
-            Supports variants like:
-              - Buy 100 AAPL @ $100.00
-              - SELL 50 TSLA @ 210.15
-              - Buy 100 AAPL at 100
-              - Sell 10 MSFT price 402.12
-            """
-            d = (desc or "").strip()
-
-            # Normalize spacing
-            dn = re.sub(r"\s+", " ", d).strip()
-
-            # Common patterns: action qty sym @|at|price $price
-            m = re.search(
-                r"^(Buy|Sell)\s+([0-9]*\.?[0-9]+)\s+([A-Za-z0-9\.\-]+)\b.*?(?:@|\bat\b|\bprice\b|\bpx\b)\s*\$?\s*([0-9,]*\.?[0-9]+)",
-                dn,
-                flags=re.IGNORECASE,
-            )
-            if not m:
-                return None
-
-            action = m.group(1).capitalize()
-            qty = float(m.group(2))
-            sym = m.group(3).upper().strip()
-            price = float(m.group(4).replace(",", ""))
-
-            if qty <= 0 or price <= 0:
-                return None
-            return action, qty, sym, price
-
         tx_rows = []
         try:
-            qb = supabase.table("transactions").select(
-                "transaction_date,type,amount,description,related_symbol"
-            ).eq("user_id", uid)
-            tx_rows = _fetch_all(qb) or []
+            tx_rows = ledger_cache.transactions(supabase, uid)[
+                ["id", "transaction_date", "type", "amount", "description", "related_symbol"]
+            ].to_dict("records")
         except Exception:
             tx_rows = []
 
-        # Sort by date
-        try:
-            tx_rows = sorted(tx_rows, key=lambda r: str(r.get("transaction_date") or ""))
-        except Exception:
-            pass
-
-        # Running state (lifetime)
-        stock_qty = {}
-        stock_cost = {}
-        leap_qty = {}
-        leap_cost = {}
-
-        stock_real = {}
-        leap_real = {}
-        short_real = {}
-
-        for r in tx_rows:
-            # Parse date
-            try:
-                tdate = date.fromisoformat(str(r.get("transaction_date") or "")[:10])
-            except Exception:
-                tdate = None
-
-            ttype = str(r.get("type", "") or "").upper().strip()
-            sym = str(r.get("related_symbol", "") or "").upper().strip()
-            amt = float(clean_number(r.get("amount", 0) or 0))
-            desc = str(r.get("description", "") or "")
-
-            if not sym or sym == "CASH":
-                continue
-
-            # Shorts: premium cashflows
-            if ttype in ("OPTION_PREMIUM", "OPTION_FEES"):
-                if pl_start_date is None or (tdate is not None and tdate >= pl_start_date):
-                    short_real[sym] = short_real.get(sym, 0.0) + amt
-                continue
-
-            # Allocate dividends/interest/fees to the underlying ticker P/L (these affect portfolio performance)
-            if ttype in ("DIVIDEND", "INTEREST", "FEES"):
-                if sym and sym != "UNK":
-                    if pl_start_date is None or (tdate is not None and tdate >= pl_start_date):
-                        stock_real[sym] = stock_real.get(sym, 0.0) + amt
-                continue
-
-            parsed = _parse_trade_desc(desc)
-            if not parsed:
-                continue
-            action, qty, psym, price = parsed
-
-            is_leap = ("LEAP" in ttype) or ("LEAP" in desc.upper())
-
-            if not is_leap:
-                q = float(stock_qty.get(psym, 0.0) or 0.0)
-                c = float(stock_cost.get(psym, 0.0) or 0.0)
-
-                if action == "Buy":
-                    stock_qty[psym] = q + qty
-                    stock_cost[psym] = c + (qty * price)
-                else:  # Sell
-                    if q <= 0:
-                        continue
-                    avg = c / q if q != 0 else 0.0
-                    pl = (price - avg) * qty
-                    # Only count realized P/L if within selected period
-                    if pl_start_date is None or (tdate is not None and tdate >= pl_start_date):
-                        stock_real[psym] = stock_real.get(psym, 0.0) + pl
-                    q_new = q - qty
-                    stock_qty[psym] = q_new
-                    stock_cost[psym] = avg * q_new
-            else:
-                q = float(leap_qty.get(psym, 0.0) or 0.0)
-                c = float(leap_cost.get(psym, 0.0) or 0.0)
-
-                if action == "Buy":
-                    leap_qty[psym] = q + qty
-                    leap_cost[psym] = c + (qty * price)
-                else:
-                    if q <= 0:
-                        continue
-                    avg = c / q if q != 0 else 0.0
-                    pl = (price - avg) * qty * 100.0
-                    if pl_start_date is None or (tdate is not None and tdate >= pl_start_date):
-                        leap_real[psym] = leap_real.get(psym, 0.0) + pl
-                    q_new = q - qty
-                    leap_qty[psym] = q_new
-                    leap_cost[psym] = avg * q_new
-
-        # Remove near-zero noise
-        stock_real = {k:v for k,v in stock_real.items() if abs(v) >= 0.005}
-        leap_real  = {k:v for k,v in leap_real.items() if abs(v) >= 0.005}
-        short_real = {k:v for k,v in short_real.items() if abs(v) >= 0.005}
+        stock_real, leap_real, short_real = analytics.realized_pl(tx_rows, pl_start_date)
 
         # Only show tickers that have activity/holdings relevant to this view
         tickers = sorted(set(
@@ -3794,113 +3372,12 @@ def option_details_page(active_user):
 
     cash_usd = get_cash_balance(uid)
     assets, options = get_portfolio_data(uid)
-    # Normalize asset types to avoid case mismatches (e.g., 'stock' vs 'STOCK')
-    try:
-        if not assets.empty and 'type' in assets.columns:
-            assets['type_norm'] = assets['type'].astype(str).str.upper().str.strip()
-        else:
-            assets['type_norm'] = 'STOCK'
-    except Exception:
-        assets['type_norm'] = 'STOCK'
-    
     # --- Calculations ---
-    stock_value_usd = 0.0
-    leap_value_usd = 0.0
-    itm_liability_usd = 0.0
-    
-    # 1. Assets Calculation
-    if not assets.empty:
-        for idx, row in assets.iterrows():
-            qty = clean_number(row['quantity'])
-            r_type_raw = str(row.get('type', '')).upper().strip()
-            assets.at[idx, 'type_norm'] = r_type_raw
-            r_type_disp = r_type_raw.replace('LONG_', 'LEAP ').replace('LEAP_', 'LEAP ')
-            assets.at[idx, 'type_disp'] = r_type_disp
-            
-            if r_type_raw == 'STOCK':
-                sym = str(row.get('symbol', '')).strip().upper()
-                live_price = get_live_stock_price(sym)
-                if live_price == 0: live_price = clean_number(row.get('last_price', 0))
-                assets.at[idx, 'current_price'] = live_price
-                assets.at[idx, 'market_value'] = qty * live_price
-                stock_value_usd += (qty * live_price)
-            else: 
-                manual_price = clean_number(row.get('last_price', 0))
-                assets.at[idx, 'current_price'] = manual_price
-                assets.at[idx, 'market_value'] = qty * 100 * manual_price
-
-    # Ensure LEAP Equity matches exactly what is shown in the LEAP table below
-    # (sum of qty * 100 * current_price for all non-stock assets after pricing logic)
-    try:
-        leap_value_usd = 0.0
-        if not assets.empty and 'type_norm' in assets.columns:
-            non_stock = assets[assets['type_norm'] != 'STOCK'].copy()
-            if not non_stock.empty:
-                non_stock['qty_num'] = pd.to_numeric(non_stock.get('quantity', 0), errors='coerce').fillna(0)
-                non_stock['px_num'] = pd.to_numeric(non_stock.get('current_price', non_stock.get('last_price', 0)), errors='coerce').fillna(0)
-                leap_value_usd = float((non_stock['qty_num'] * 100.0 * non_stock['px_num']).sum())
-    except Exception:
-        leap_value_usd = 0.0
-
-    # 2. Options Liability Calculation & Aggregation
-    grouped_options = {}
-    
-    if not options.empty:
-        for idx, row in options.iterrows():
-            qty = abs(clean_number(row.get('quantity') or row.get('contracts') or 0))
-            strike = float(clean_number(row.get('strike_price') or row.get('strike') or 0))
-            sym = str(row.get('symbol', '')).strip().upper()
-            opt_type = str(row.get('type', '')).strip().upper()
-            
-            # Robust Expiration Parsing (Prefer expiration_date; some rows may have incorrect 'expiration')
-            raw_exp = row.get('expiration_date')
-            if raw_exp is None or pd.isna(raw_exp) or str(raw_exp).strip() == "":
-                raw_exp = row.get('expiration')
-            exp_str = str(raw_exp) if raw_exp else ""
-            
-            underlying_price = get_live_stock_price(sym)
-            
-            intrinsic_val = 0.0
-            if underlying_price > 0 and "CALL" in opt_type and underlying_price > strike:
-                intrinsic_val = (underlying_price - strike) * qty * 100
-            
-            itm_liability_usd += intrinsic_val
-            
-            # --- Aggregation Logic ---
-            key = (sym, opt_type, exp_str, strike)
-            
-            if key not in grouped_options:
-                grouped_options[key] = {
-                    'symbol': sym,
-                    'type': opt_type,
-                    'expiration': exp_str,
-                    'strike': strike,
-                    'qty': 0.0,
-                    'price': underlying_price,
-                    'liability': 0.0,
-                    'constituents': [],
-                    'linked_assets': []
-                }
-            
-            grouped_options[key]['qty'] += qty
-            grouped_options[key]['liability'] += intrinsic_val
-            
-            # Store full details for splitting logic
-            old_premium = row.get('premium_received')
-            if old_premium is None: old_premium = row.get('cost_basis', 0)
-            
-            lid = row.get('linked_asset_id')
-            if lid and not pd.isna(lid):
-                 grouped_options[key]['linked_assets'].append(str(lid))
-
-            grouped_options[key]['constituents'].append({
-                'id': row['id'],
-                'qty': qty,
-                'cost_basis': row.get('cost_basis', 0),
-                'premium_received': old_premium,
-                'open_date': row.get('open_date'),
-                'linked_asset_id': lid
-            })
+    # Same valuation as the dashboard; OPEN_OPTIONS already prefers expiration_date over expiration.
+    nav = analytics.value_positions(assets, options, get_live_stock_price)
+    stock_value_usd, leap_value_usd = nav.stock_value, nav.leap_value
+    itm_liability_usd = nav.itm_liability
+    grouped_options = nav.grouped_options
 
     net_liq_usd = cash_usd + stock_value_usd + leap_value_usd - itm_liability_usd
     # --- Assets Display ---
@@ -4190,7 +3667,7 @@ def option_details_page(active_user):
                                 update_asset_position(uid, sel_row['symbol'], total_shares, sel_row['strike'], "Sell", trade_date, "STOCK", txg=txg)
                                 st.success(f"Assigned on CALL. Sold {total_shares} shares.")
 
-                            st.cache_data.clear()
+                            caches.invalidate_account(uid)
                             st.rerun()
                                 
                         # 2. EXPIRE
@@ -4223,7 +3700,7 @@ def option_details_page(active_user):
                                     remaining_needed = 0
 
                             st.success(f"Contracts expired/cancelled at $0.00.")
-                            st.cache_data.clear()
+                            caches.invalidate_account(uid)
                             st.rerun()
 
                         # 3. BUY-TO-CLOSE (BTC only; writes to ledger via update_short_option_position)
@@ -4246,7 +3723,7 @@ def option_details_page(active_user):
                             )
 
                             st.success("Buy-To-Close recorded.")
-                            st.cache_data.clear()
+                            caches.invalidate_account(uid)
                             st.rerun()
 
                         # 3. ROLL (BTC then STO; both write to ledger via update_short_option_position)
@@ -4298,7 +3775,7 @@ def option_details_page(active_user):
 
                             net_cash = (float(new_premium) * qty_safe * 100) - (float(btc_price) * qty_safe * 100) - float(roll_btc_fees) - float(new_fees)
                             st.success(f"Rolled {qty_safe} contracts. Net Cash: ${net_cash:+,.2f}")
-                            st.cache_data.clear()
+                            caches.invalidate_account(uid)
                             st.rerun()
     else:
         st.info("No Active Short Options.")
@@ -4577,88 +4054,10 @@ def snapshot_page(user):
 
             # 2. Fetch Transactions for Calculations
             tx_res = supabase.table("transactions").select("transaction_date, amount, type, currency").eq("user_id", user.id).in_("type", ["DEPOSIT", "WITHDRAWAL"]).execute()
-            tx_df = pd.DataFrame(tx_res.data)
-            if not tx_df.empty:
-                tx_df['transaction_date'] = pd.to_datetime(tx_df['transaction_date'])
-                tx_df = tx_df[tx_df['currency'] == 'USD']
-            
-            # 3. Calculate Table Metrics
-            table_data = []
-            for i in range(len(hist_df)):
-                row = hist_df.iloc[i]
-                curr_date = row['snapshot_date']
-                curr_eq = float(row['total_equity'])
-
-                # --- A. Previous Snapshot ---
-                if i == 0:
-                    prev_date = pd.Timestamp.min
-                    prev_eq = 0.0
-                else:
-                    prev_row = hist_df.iloc[i-1]
-                    prev_date = prev_row['snapshot_date']
-                    prev_eq = float(prev_row['total_equity'])
-
-                # --- B. Net Deposits/Withdrawals during the week (normalize returns) ---
-                net_flow = 0.0
-                if not tx_df.empty:
-                    mask = (tx_df['transaction_date'] > prev_date) & (tx_df['transaction_date'] <= curr_date)
-                    net_flow = float(tx_df.loc[mask, 'amount'].sum())  # deposits positive, withdrawals negative
-
-                # --- C. Weekly Profit $ and Weekly Return % (normalized for flows) ---
-                base_capital = prev_eq + net_flow
-                weekly_profit = curr_eq - base_capital
-
-                if base_capital == 0:
-                    weekly_ret = 0.0
-                else:
-                    weekly_ret = weekly_profit / base_capital  # decimal (0.0123 = 1.23%)
-
-                table_data.append({
-                    "Date": curr_date.strftime('%Y-%m-%d'),
-                    "Equity": curr_eq,
-                    "Net Dep": net_flow,
-                    "P/L $": weekly_profit,
-                    "Weekly %": weekly_ret,
-                })
-
-            # --- D. Compute YTD compound return, weekly compound average (YTD), and 52W rolling compound ---
-            calc_df = pd.DataFrame(table_data)
-
-            ytd_vals = []
-            wkly_avg_vals = []
-            roll_52_vals = []
-
-            for i in range(len(calc_df)):
-                d = pd.to_datetime(calc_df.loc[i, "Date"]).date()
-                yr = d.year
-
-                # YTD weekly returns: include weekly returns for rows in same year up to i (excluding row 0)
-                year_idx = [k for k in range(len(calc_df)) if pd.to_datetime(calc_df.loc[k, "Date"]).date().year == yr and k <= i]
-                year_rets = [float(calc_df.loc[k, "Weekly %"]) for k in year_idx]
-
-                ytd_prod = 1.0
-                for r in year_rets:
-                    ytd_prod *= (1.0 + r)
-                ytd_ret = (ytd_prod - 1.0) if year_rets else 0.0
-                ytd_vals.append(ytd_ret)
-
-                n_weeks = len(year_rets)
-                wkly_avg = (1.0 + ytd_ret) ** (1.0 / n_weeks) - 1.0 if n_weeks > 0 else 0.0
-                wkly_avg_vals.append(wkly_avg)
+            tx_df = analytics.usd_flows(pd.DataFrame(tx_res.data))
 
-                # 52W rolling window: last 52 weekly returns ending at i (or since inception)
-                start_k = max(0, i - 51)
-                window_rets = [float(calc_df.loc[k, "Weekly %"]) for k in range(start_k, i + 1)]
-
-                roll_prod = 1.0
-                for r in window_rets:
-                    roll_prod *= (1.0 + r)
-                roll_ret = (roll_prod - 1.0) if window_rets else 0.0
-                roll_52_vals.append(roll_ret)
-
-            calc_df["YTD %"] = ytd_vals
-            calc_df["Wkly Avg %"] = wkly_avg_vals
-            calc_df["52W %"] = roll_52_vals
+            # 3. Calculate Table Metrics (weekly P/L and %, YTD, weekly average, rolling 52W)
+            calc_df = analytics.snapshot_history_table(hist_df, tx_df)
 
             final_df = calc_df.iloc[::-1].copy()
 
@@ -4705,13 +4104,14 @@ def snapshot_page(user):
             chart_df['snapshot_date'] = pd.to_datetime(chart_df['snapshot_date'])
             chart_df = chart_df.sort_values('snapshot_date', ascending=True)
 
+            # Snapshots without a stored rate use that day's close from the FX history, not today's spot
+            rate_then = fx_history.convert(pd.Series(1.0, index=chart_df.index), chart_df['snapshot_date'], "USD", "CAD")
             if 'exchange_rate' in chart_df.columns:
-                chart_df['value_cad'] = chart_df['total_equity'] * chart_df['exchange_rate'].fillna(1.0)
-            else:
-                chart_df['value_cad'] = chart_df['total_equity'] * get_usd_to_cad_rate()
+                rate_then = pd.to_numeric(chart_df['exchange_rate'], errors="coerce").fillna(rate_then)
+            chart_df['value_cad'] = chart_df['total_equity'] * rate_then.fillna(float(get_usd_to_cad_rate()))
 
             # Mark deposit weeks (net deposits between snapshots > 0)
-            dep_marks = pd.DataFrame(table_data)
+            dep_marks = calc_df[["Date", "Net Dep"]].copy()
             if not dep_marks.empty:
                 dep_marks['snapshot_date'] = pd.to_datetime(dep_marks['Date'])
                 dep_marks = dep_marks[dep_marks['Net Dep'] > 0][['snapshot_date', 'Net Dep']]
@@ -4756,72 +4156,12 @@ def import_page(user):
     ])
     
     # --- Helpers ---
-    def get_fees(row):
-        for k in ['commission', 'comm', 'fee', 'fees']:
-            if k in row: return abs(clean_number(row[k]))
-        return 0.0
+    get_fees = analytics.get_fees
 
     def clean_action_input(val):
         if pd.isna(val) or val == "": return "Buy"
         return str(val).strip().title()
 
-    def normalize_trade_action(val, default="Buy"):
-        """Map messy broker actions to 'Buy' or 'Sell'.
-        Handles: BUY/SELL, BTO/BTC/STO/STC, 'BUY TO OPEN/CLOSE', 'SELL TO OPEN/CLOSE'.
-        """
-        if val is None or (isinstance(val, float) and pd.isna(val)):
-            return default
-        s = str(val).strip().upper()
-
-        # Common option abbreviations
-        if "STO" in s or "SELL TO OPEN" in s:
-            return "Sell"
-        if "BTC" in s or "BUY TO CLOSE" in s:
-            return "Buy"
-        if "BTO" in s or "BUY TO OPEN" in s:
-            return "Buy"
-        if "STC" in s or "SELL TO CLOSE" in s:
-            return "Sell"
-
-        # Generic
-        if "SELL" in s:
-            return "Sell"
-        if "BUY" in s:
-            return "Buy"
-        return default
-        s = str(val).strip().upper()
-        if "SELL" in s:
-            return "Sell"
-        if "BUY" in s:
-            return "Buy"
-        return default
-
-    def normalize_symbol(val):
-        """Normalize symbols like 'SPDR Gold (ARCX:GLD)' or 'ARCX:GLD' to 'GLD'."""
-        if val is None:
-            return ""
-        s = str(val).strip()
-        # If 'Name (ARCX:GLD)' take inside parentheses
-        m = re.search(r"\((.*?)\)", s)
-        if m:
-            s = m.group(1)
-        # If 'ARCX:GLD' take part after ':'
-        if ":" in s:
-            s = s.split(":")[-1]
-        return s.strip().upper()
-
-    def normalize_expiration(val):
-        """Normalize expiration input to YYYY-MM-DD string."""
-        if val is None or (isinstance(val, float) and pd.isna(val)) or str(val).strip() == "":
-            return ""
-        try:
-            dt = pd.to_datetime(val, errors="coerce")
-            if pd.isna(dt):
-                return str(val).split("T")[0]
-            return dt.date().isoformat()
-        except Exception:
-            return str(val).split("T")[0]
-
     # --- 1. STOCKS ---
     with tab_st:
         st.markdown("**Required:** `Date`, `Ticker`, `Qty`, `Price`, `Action`. **Optional:** `Fees`")
@@ -4947,6 +4287,7 @@ def import_page(user):
                             amt = abs(clean_number(row.get(col_cad, 0)))
                             if amt > 0: supabase.table("transactions").insert({"user_id": user.id, "transaction_date": t_date.isoformat(), "type": db_type, "amount": amt * multiplier, "currency": "CAD", "related_symbol": "CASH", "description": f"{description} ({raw_type})"}).execute(); success_count += 1
                     except: pass
+                caches.invalidate_account(user.id)
                 st.success(f"Processing Complete! Imported {success_count} transactions.")
 
     # --- 5. HISTORY ---
@@ -4985,107 +4326,51 @@ def import_page(user):
         if f_uni and st.button("Process Unified File", type="primary"):
             try:
                 df = pd.read_csv(f_uni)
-                df.columns = [c.strip().lower() for c in df.columns]
-                
-                # 1. Normalize Columns
-                rename_map = {
-                    'quantity': 'qty', 'shares': 'qty', 'contracts': 'qty',
-                    'symbol': 'ticker', 'stock': 'ticker',
-                    'cost': 'price', 'premium': 'price', 'amount': 'price',
-                    'commission': 'fees', 'comm': 'fees',
-                    'expiration_date': 'expiration', 'expiry': 'expiration', 'exp': 'expiration',
-                    'strike_price': 'strike',
-                    'type': 'category', 'class': 'category',  # Map 'Type' to Category
-                    'option_type': 'opt_type', 'option type': 'opt_type', 'opt_type': 'opt_type',
-                    'right': 'opt_type', 'put/call': 'opt_type', 'call/put': 'opt_type'  # Call/Put
-                }
-                # Be careful not to overwrite 'type' if it refers to Call/Put vs Asset Class
-                # Heuristic: If 'category' column exists, use it. If not, look for 'class'.
-                df.rename(columns=rename_map, inplace=True)
-                
-                # 2. Date Parsing & Sorting (CRITICAL STEP)
-                # Preserve file row order for same-day trades (prevents Buy being processed before Sell)
-                df['_row_order'] = range(len(df))
-                df['date_parsed'] = pd.to_datetime(df['date'], errors='coerce')
-                df.sort_values(by=['date_parsed', '_row_order'], ascending=[True, True], inplace=True)
-                
+
+                # Column normalization, chronological sort and per-row routing live in analytics.plan_unified_import
                 count = 0
                 errors = []
                 bar = st.progress(0)
-                
-                for i, row in enumerate(df.iterrows()):
-                    idx, r = row
-                    if pd.isna(r['date_parsed']): continue
-                    
+
+                for i, (idx, step, parse_err) in enumerate(analytics.plan_unified_import(df)):
+                    if step is None and parse_err is None: continue
+
                     try:
-                        # Extract Common Fields
-                        cat = str(r.get('category', '')).upper().strip()
-                        # Fallback if user put "Call" in the Category column for a LEAP
-                        if 'LEAP' in cat: cat_mode = 'LEAP'
-                        elif 'SHORT' in cat or 'OPTION' in cat: cat_mode = 'SHORT'
-                        elif 'STOCK' in cat: cat_mode = 'STOCK'
-                        elif 'CASH' in cat or 'FUND' in cat: cat_mode = 'CASH'
-                        else: cat_mode = 'STOCK' # Default
-                        
-                        sym = normalize_symbol(r.get('ticker',''))
-                        qty = int(abs(clean_number(r.get('qty', 0))))
-                        
-                        # Price cleaning
-                        try: raw_p = str(r.get('price', 0)).replace('$','').replace(',','').strip(); price = abs(float(raw_p)) 
-                        except: price = 0.0
-                        
-                        fees = get_fees(r)
-                        act = normalize_trade_action(r.get('action', 'Buy'), default='Buy')
-                        
-                        # Specific Fields
-                        opt_type = str(r.get('opt_type', 'CALL')).strip().upper()  # Call/Put
-                        strike = float(abs(clean_number(r.get('strike', 0))))
-                        exp = normalize_expiration(r.get('expiration'))
-                        
+                        if parse_err is not None:
+                            raise parse_err
+                        mode, sym, qty, price, act = step["mode"], step["symbol"], step["qty"], step["price"], step["action"]
+                        fees, trade_date = step["fees"], step["date"]
+
                         # --- ROUTING LOGIC ---
-                        if cat_mode == 'STOCK':
-                            update_asset_position(user.id, sym, qty, price, act, r['date_parsed'].date(), "STOCK", fees=fees)
-                            
-                        elif cat_mode == 'LEAP':
-                            # Asset Logic
-                            a_type = f"LEAP_{opt_type}" # LEAP_CALL or LEAP_PUT
-                            update_asset_position(user.id, sym, qty, price, act, r['date_parsed'].date(), a_type, exp, strike, fees=fees)
-                            
-                        elif cat_mode == 'SHORT':
-                            # Liability Logic
-                            # Default short options to PUT if undefined, but user should specify
-                            if opt_type not in ['CALL', 'PUT']: opt_type = 'PUT'
-                            update_short_option_position(user.id, sym, qty, price, act, r['date_parsed'].date(), opt_type, exp, strike, fees=fees)
-                            
-                        elif cat_mode == 'CASH':
+                        if mode == 'STOCK':
+                            update_asset_position(user.id, sym, qty, price, act, trade_date, "STOCK", fees=fees)
+
+                        elif mode == 'LEAP':
+                            update_asset_position(user.id, sym, qty, price, act, trade_date, step["asset_type"], step["expiration"], step["strike"], fees=fees)
+
+                        elif mode == 'SHORT':
+                            update_short_option_position(user.id, sym, qty, price, act, trade_date, step["opt_type"], step["expiration"], step["strike"], fees=fees)
+
+                        elif mode == 'CASH':
                             # Direct Transaction Insert
-                            # Determine Type
-                            raw_act = str(r.get('action','')).upper()
-                            db_type = "DEPOSIT"
-                            mult = 1
-                            
-                            if any(x in raw_act for x in ["WITHDRAW", "DEBIT"]): db_type = "WITHDRAWAL"; mult = -1
-                            elif "DIVIDEND" in raw_act: db_type = "DIVIDEND"; mult = 1
-                            elif "INTEREST" in raw_act: db_type = "INTEREST"; mult = 1
-                            elif "FEE" in raw_act: db_type = "FEES"; mult = -1
-                            
                             supabase.table("transactions").insert({
                                 "user_id": user.id,
-                                "transaction_date": r['date_parsed'].isoformat(),
-                                "type": db_type,
-                                "amount": price * mult, # Assuming 'Price' column holds the cash amount
+                                "transaction_date": step["timestamp"],
+                                "type": step["db_type"],
+                                "amount": step["amount"], # Assuming 'Price' column holds the cash amount
                                 "currency": "USD", # Default to USD for unified
                                 "related_symbol": "CASH",
-                                "description": f"Unified Import: {raw_act}"
+                                "description": f"Unified Import: {step['raw_action']}"
                             }).execute()
-                            
+
                         count += 1
-                        
+
                     except Exception as inner_e:
                         errors.append(f"Row {idx}: {inner_e}")
-                    
+
                     bar.progress((i + 1) / len(df))
 
+                caches.invalidate_account(user.id)
                 st.success(f"✅ Successfully processed {count} records in chronological order.")
                 if errors:
                     with st.expander(f"⚠️ {len(errors)} Errors Occurred"):
@@ -5208,6 +4493,7 @@ def pricing_page(active_user):
                 if abs(new_p - old_p) > 1e-9:
                     supabase.table("assets").update({"last_price": new_p}).eq("id", row["id"]).execute()
                     changed += 1
+            caches.invalidate_account(uid)
 
             st.success(f"✅ Saved {changed} updated LEAP prices to the database.")
         return df
@@ -5410,6 +4696,7 @@ def pricing_page(active_user):
                         _require_editor()
                         try:
                             supabase.table("assets").update({"last_price": float(manual_price)}).eq("id", row["id"]).execute()
+                            caches.invalidate_account(uid)
                             st.success("✅ Manual price saved to the database.")
                             # Force reload next run so the table reflects the new DB value
                             st.session_state["leap_prices_out_df"] = df_src
@@ -5422,21 +4709,25 @@ def pricing_page(active_user):
 
 
 def safe_reverse_ledger_transaction(transaction_id):
-    res = supabase.table("transactions").select("*").eq("id", transaction_id).execute()
+    res = supabase.table("transactions").select("id, user_id, type, description, related_symbol").eq("id", transaction_id).execute()
     if not res.data: return False, "Transaction not found."
     t = res.data[0]; user_id = t['user_id']
     if "TRADE" in t['type'] and "STOCK" in t['type']: 
         try:
             parts = t['description'].split(); action = parts[0]; qty = float(parts[1])
-            assets = supabase.table("assets").select("*").eq("user_id", user_id).eq("ticker", t['related_symbol']).eq("type", "STOCK").execute()
+            assets = supabase.table("assets").select("id, quantity").eq("user_id", user_id).eq("ticker", t['related_symbol']).eq("type", "STOCK").execute()
             if assets.data:
                 aid = assets.data[0]['id']; curr_q = assets.data[0]['quantity']
                 new_q = curr_q - qty if action == "Buy" else curr_q + qty
                 supabase.table("assets").update({"quantity": new_q}).eq("id", aid).execute()
         except: return False, "Auto-reverse failed."
     supabase.table("transactions").delete().eq("id", transaction_id).execute()
+    caches.invalidate_account(user_id)
     return True, "Deleted."
 
+# Group-list page sizes on the ledger page (the first is the default)
+LEDGER_PAGE_SIZES = (25, 50, 100, 250)
+
 def ledger_page(active_user):
     uid = _active_user_id(active_user)
     st.header("📜 Transaction Ledger")
@@ -5449,29 +4740,8 @@ def ledger_page(active_user):
         end_date = st.date_input("To Date", value=date.today())
 
     # -------- Helpers --------
-    _txg_re = re.compile(r"\bTXG:([A-Za-z0-9_\-]+)\b")
     _oid_re = re.compile(r"\bOID:([A-Za-z0-9_,\-]+)\b")
 
-    def _to_date(v):
-        if isinstance(v, datetime):
-            return v.date()
-        if isinstance(v, date):
-            return v
-        s = str(v or "").strip()
-        if not s:
-            return None
-        s = s.split("T")[0].split(" ")[0]
-        for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y"):
-            try:
-                return datetime.strptime(s, fmt).date()
-            except Exception:
-                pass
-        return None
-
-    def _extract_txg(desc: str):
-        m = _txg_re.search(str(desc or ""))
-        return m.group(1) if m else None
-
     def _extract_oids(desc: str):
         m = _oid_re.search(str(desc or ""))
         if not m:
@@ -5479,65 +4749,6 @@ def ledger_page(active_user):
         raw = m.group(1)
         return [x.strip() for x in raw.split(",") if x.strip()]
 
-    def _friendly_action_group(gdf: pd.DataFrame) -> str:
-        types = set([str(x).upper() for x in gdf.get("type", [])])
-        descs = " ".join([str(x or "") for x in gdf.get("description", [])]).upper()
-
-        if "ROLL" in descs:
-            return "Roll"
-        # Roll heuristic: OPTION_PREMIUM group with both Buy and Sell
-        if any("OPTION_PREMIUM" in t for t in types):
-            d = descs
-            if (" BUY " in d or d.startswith("BUY")) and (" SELL " in d or d.startswith("SELL")):
-                return "Roll"
-
-        if "ASSIGN" in descs or "ASSIGNED" in descs:
-            return "Assignment"
-        if any("OPTION_EXPIRE" in t for t in types) and any(t.startswith("TRADE_STOCK") or t.startswith("TRADE_") for t in types):
-            return "Assignment"
-
-        if any("DEPOSIT" in t for t in types):
-            return "Deposit"
-        if any("WITHDRAWAL" in t for t in types):
-            return "Withdrawal"
-        if any("DIVIDEND" in t for t in types):
-            return "Dividend"
-        if any("INTEREST" in t for t in types):
-            return "Interest"
-
-        # single-row fallback
-        if len(gdf) == 1:
-            t0 = str(gdf.iloc[0].get("type", "")).upper()
-            d0 = str(gdf.iloc[0].get("description", ""))
-            if t0.startswith("TRADE_"):
-                return "Trade"
-            if "OPTION_PREMIUM" in t0:
-                return "Option Trade"
-            if "OPTION_EXPIRE" in t0:
-                return "Expire Option"
-            return d0.split(" ")[0] if d0 else "Transaction"
-
-        return "Transaction"
-
-    def _friendly_action_step(row: dict) -> str:
-        t = str(row.get("type", "")).upper()
-        d = str(row.get("description", "")).upper()
-        if "OPTION_EXPIRE" in t or "EXPIRE" in d:
-            return "Expire Option"
-        if "OPTION_PREMIUM" in t:
-            if d.startswith("BUY"):
-                return "Buy to Close"
-            if d.startswith("SELL"):
-                return "Sell to Open"
-            return "Option Premium"
-        if t.startswith("TRADE_"):
-            if d.startswith("BUY"):
-                return "Buy Shares" if "STOCK" in t else "Buy Asset"
-            if d.startswith("SELL"):
-                return "Sell Shares" if "STOCK" in t else "Sell Asset"
-            return "Asset Trade"
-        return row.get("type") or "Step"
-
     def _reverse_transaction_row(row: dict):
         """Best-effort rollback of portfolio state for a transaction row.
 
@@ -5578,12 +4789,12 @@ def ledger_page(active_user):
                 def _asset_candidates_for_ticker(_uid, _tk):
                     cands = []
                     try:
-                        r1 = supabase.table('assets').select('*').eq('user_id', _uid).eq('ticker', _tk).execute()
+                        r1 = supabase.table('assets').select(schema.ASSET_LOTS.select).eq('user_id', _uid).eq('ticker', _tk).execute()
                         cands.extend(list(r1.data or []))
                     except Exception:
                         pass
                     try:
-                        r2 = supabase.table('assets').select('*').eq('user_id', _uid).eq('symbol', _tk).execute()
+                        r2 = supabase.table('assets').select(schema.ASSET_LOTS.select).eq('user_id', _uid).eq('symbol', _tk).execute()
                         for rr in (r2.data or []):
                             if not any(str(x.get('id')) == str(rr.get('id')) for x in cands):
                                 cands.append(rr)
@@ -5619,7 +4830,7 @@ def ledger_page(active_user):
                     # Filter strict_rows in Python to avoid numeric/date typing mismatches
                     candidates = list(strict_rows or [])
                     if exp_iso:
-                        candidates = [r for r in candidates if str(r.get("expiration") or "")[:10] == exp_iso]
+                        candidates = [r for r in candidates if str(r.get("expiration_date") or r.get("expiration") or "")[:10] == exp_iso]
                     if strike is not None:
                         def _strike_ok(r):
                             try:
@@ -5638,7 +4849,7 @@ def ledger_page(active_user):
                             if str(r.get("type", "")).upper() != asset_type:
                                 return False
                             if exp_iso:
-                                exp_db = str(r.get("expiration") or "")
+                                exp_db = str(r.get("expiration_date") or r.get("expiration") or "")
                                 if exp_db[:10] != exp_iso:
                                     return False
                             if strike is not None:
@@ -5769,7 +4980,7 @@ def ledger_page(active_user):
                 if side == "SELL":
                     # Reverse an open: remove contracts from open options
                     # Pull candidate open options and filter strike in Python (tolerant to numeric typing/scale)
-                    res = supabase.table("options").select("*")\
+                    res = supabase.table("options").select(schema.OPTION_LOTS.select)\
                         .eq("user_id", user_id).eq("symbol", ticker)\
                         .eq("expiration_date", exp).eq("type", right).eq("status", "open")\
                         .order("open_date", desc=True).execute()
@@ -5851,68 +5062,33 @@ def ledger_page(active_user):
             except Exception:
                 pass
         st.success(f"Deleted transaction ({group_label}) and rolled back portfolio changes.")
-        st.cache_data.clear()
+        caches.invalidate_account(uid)
         st.rerun()
 
     # -------- Fetch + Group --------
-    qb = supabase.table("transactions")\
-        .select("*")\
-        .eq("user_id", uid)\
-        .order("transaction_date", desc=False)
-
-    rows = _fetch_all(qb)
-    if not rows:
-        st.info("No transactions yet.")
-        return
-
-    df = pd.DataFrame(rows)
+    # Only the date range (plus the rest of its TXG groups); earlier rows arrive as
+    # the opening balance (src/ledger_cache.py)
+    df, opening = ledger_cache.window(supabase, uid, start_date, end_date)
     if df.empty:
-        st.info("No transactions yet.")
+        st.info("No transactions in this date range.")
         return
 
-    df["_d"] = df["transaction_date"].apply(_to_date)
-    df["id_str"] = df["id"].astype(str)
-    df["txg"] = df["description"].apply(_extract_txg)
-    df["gkey"] = df["txg"].fillna(df["id_str"])
-
-    # sort
-    df = df.sort_values(["_d", "id_str"], ascending=[True, True])
-
-    # Build grouped list preserving order
-    groups = []
-    for gkey, gdf in df.groupby("gkey", sort=False):
-        gdf = gdf.copy()
-        gdate = gdf["_d"].dropna().min()
-        # Choose a symbol safely (avoid pandas Series truth-value ambiguity)
-        symbol = ""
-        if "related_symbol" in gdf.columns:
-            rs = gdf["related_symbol"].dropna()
-            if not rs.empty:
-                symbol = str(rs.iloc[0])
-        if (not symbol) and "symbol" in gdf.columns:
-            ss = gdf["symbol"].dropna()
-            if not ss.empty:
-                symbol = str(ss.iloc[0])
-        action = _friendly_action_group(gdf)
-        amount = float(pd.to_numeric(gdf.get("amount"), errors="coerce").fillna(0).sum())
-        groups.append({"gkey": gkey, "date": gdate, "symbol": symbol, "action": action, "amount": amount, "gdf": gdf})
-
-    # Running balance on groups (full history)
-    running = 0.0
-    for g in groups:
-        running += float(g["amount"] or 0.0)
-        g["running"] = running
+    # TXG-tagged rows collapse into one group; running balance continues from `opening`.
+    # One summary row per group, computed once; a group's rows are only touched when shown.
+    summary, grouped = analytics.ledger_summary(df, opening=opening)
 
     # Filter display groups by date range (inclusive)
-    disp = [g for g in groups if (g["date"] is not None and start_date <= g["date"] <= end_date)]
-    if not disp:
+    gdates = pd.to_datetime(summary["date"], errors="coerce")
+    disp = summary[gdates.notna() & (gdates >= pd.Timestamp(start_date)) & (gdates <= pd.Timestamp(end_date))]
+    if disp.empty:
         st.info("No transactions in this date range.")
         return
 
     # --- Search / Filters ---
     f1, f2 = st.columns(2)
-    sym_options = sorted({str(g.get("symbol") or "").upper() for g in disp if str(g.get("symbol") or "").strip()})
-    act_options = sorted({str(g.get("action") or "") for g in disp if str(g.get("action") or "").strip()})
+    sym_upper = disp["symbol"].str.upper().str.strip()
+    sym_options = sorted(set(sym_upper[sym_upper != ""]))
+    act_options = sorted(set(disp["action"][disp["action"].str.strip() != ""]))
 
     with f1:
         sym_sel = st.multiselect("Filter Symbol", options=sym_options, default=[])
@@ -5920,14 +5096,29 @@ def ledger_page(active_user):
         act_sel = st.multiselect("Filter Action", options=act_options, default=[])
 
     if sym_sel:
-        sym_set = {s.upper() for s in sym_sel}
-        disp = [g for g in disp if str(g.get("symbol") or "").upper() in sym_set]
+        disp = disp[sym_upper.isin({s.upper() for s in sym_sel})]
     if act_sel:
-        act_set = set(act_sel)
-        disp = [g for g in disp if str(g.get("action") or "") in act_set]
+        disp = disp[disp["action"].isin(set(act_sel))]
+    if disp.empty:
+        st.info("No transactions match these filters.")
+        return
 
     # Sort newest first
-    disp = sorted(disp, key=lambda g: (g.get("date") or date.min, str(g.get("gkey") or "")), reverse=True)
+    disp = disp.sort_values(["date", "gkey"], ascending=False, key=lambda c: c.astype(str))
+
+    # -------- Paging --------
+    p1, p2, p3 = st.columns([1, 1, 2])
+    with p1:
+        page_size = st.selectbox("Groups per page", LEDGER_PAGE_SIZES, index=0, key="ledger_page_size")
+    n_pages = max(1, -(-len(disp) // int(page_size)))
+    if st.session_state.get("ledger_page_no", 1) > n_pages:
+        st.session_state["ledger_page_no"] = 1
+    with p2:
+        page_no = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key="ledger_page_no")
+    first = (int(page_no) - 1) * int(page_size)
+    page = disp.iloc[first:first + int(page_size)]
+    with p3:
+        st.caption(f"Groups {first + 1}-{first + len(page)} of {len(disp)} · page {int(page_no)} of {n_pages}")
 
     # -------- Render --------
     hdr = st.columns([1.1, 1.0, 2.3, 1.2, 1.3, 0.8])
@@ -5938,7 +5129,7 @@ def ledger_page(active_user):
     hdr[4].markdown("**Balance**")
     hdr[5].markdown("")
 
-    for i, g in enumerate(disp):
+    for i, g in enumerate(page.to_dict("records"), start=first):
         rowc = st.columns([1.1, 1.0, 2.3, 1.2, 1.3, 0.8])
         rowc[0].write(str(g["date"]))
         rowc[1].write(str(g["symbol"] or "").upper())
@@ -5947,19 +5138,18 @@ def ledger_page(active_user):
         rowc[4].write(f"{g['running']:,.2f}")
 
         if rowc[5].button("Delete", key=f"txg_del_{g['gkey']}_{i}"):
-            _delete_group(g["gdf"], g["action"])
-
-        with st.expander("Show details", expanded=False):
-            sub = []
-            for _, rr in g["gdf"].iterrows():
-                sub.append({
-                    "Date": str(rr.get("_d") or ""),
-                    "Symbol": str(rr.get("related_symbol") or ""),
-                    "Action": _friendly_action_step(rr.to_dict()),
-                    "Amount": float(rr.get("amount") or 0.0),
-                    "Details": str(rr.get("description") or "")
-                })
-            st.dataframe(pd.DataFrame(sub), use_container_width=True)
+            _delete_group(grouped[grouped["gkey"] == g["gkey"]], g["action"])
+
+        # Details are built only for the groups the user opens
+        if st.toggle(f"Show details ({g['rows']} rows)", key=f"txg_det_{g['gkey']}"):
+            gdf = grouped[grouped["gkey"] == g["gkey"]]
+            st.dataframe(pd.DataFrame({
+                "Date": gdf["_d"].fillna("").astype(str),
+                "Symbol": gdf["related_symbol"].fillna("").astype(str),
+                "Action": [analytics.friendly_action_step(r) for r in gdf[["type", "description"]].to_dict("records")],
+                "Amount": pd.to_numeric(gdf["amount"], errors="coerce").fillna(0.0),
+                "Details": gdf["description"].fillna("").astype(str),
+            }), use_container_width=True, hide_index=True)
 
 def trade_entry_page(active_user):
     uid = _active_user_id(active_user)
@@ -6051,7 +5241,7 @@ def trade_entry_page(active_user):
                 try:
                     res = (
                         supabase.table("options")
-                        .select("*")
+                        .select(schema.OPEN_OPTIONS.select)
                         .eq("user_id", uid)
                         .eq("symbol", symbol)
                         .eq("status", "open")
@@ -6092,7 +5282,7 @@ def trade_entry_page(active_user):
                 try:
                     ares = (
                         supabase.table("assets")
-                        .select("*")
+                        .select(schema.ASSET_POSITIONS.select)
                         .eq("user_id", uid)
                         .eq("ticker", symbol)
                         .execute()
@@ -6165,56 +5355,7 @@ def trade_entry_page(active_user):
 
                 # If some open short calls were imported without a linked_asset_id, infer collateral already consumed
                 total_open_calls = get_open_short_call_contracts(uid, symbol)
-                linked_total = sum(int(locked_map.get(str(h.get('id')), 0) or 0) for h in holdings_data)
-                unlinked_calls = max(0, int(total_open_calls) - int(linked_total))
-
-                # Allocate unlinked short calls to shares first, then LEAPs (conservative availability)
-                stock_holdings = [h for h in holdings_data if "STOCK" in str(h.get('type','')).upper()]
-                leap_holdings  = [h for h in holdings_data if ("LONG_" in str(h.get('type','')).upper()) or ("LEAP_" in str(h.get('type','')).upper())]
-                unlinked_used = {}
-
-                remaining = unlinked_calls
-                for h in stock_holdings:
-                    hid = str(h.get('id'))
-                    qty_h = float(h.get('quantity', 0) or 0)
-                    max_contracts = int(qty_h // 100)
-                    take = min(remaining, max_contracts)
-                    if take > 0:
-                        unlinked_used[hid] = unlinked_used.get(hid, 0) + take
-                        remaining -= take
-                    if remaining <= 0:
-                        break
-
-                for h in leap_holdings:
-                    if remaining <= 0:
-                        break
-                    hid = str(h.get('id'))
-                    qty_h = int(float(h.get('quantity', 0) or 0))
-                    take = min(remaining, qty_h)
-                    if take > 0:
-                        unlinked_used[hid] = unlinked_used.get(hid, 0) + take
-                        remaining -= take
-
-                valid_opts = {"None (Unsecured)": {"id": None, "limit": float('inf')}}
-                coll_found = False
-                for h in holdings_data:
-                    h_type = str(h.get('type', '')).upper()
-                    h_qty = float(h.get('quantity', 0) or 0)
-                    h_id = h.get('id')
-                    linked_used = int(locked_map.get(str(h_id), 0) or 0)
-                    inferred_used = int(unlinked_used.get(str(h_id), 0) or 0)
-                    used_total = linked_used + inferred_used
-                    if "STOCK" in h_type:
-                        avail_shares = int(max(0, int(h_qty) - (used_total * 100)))
-                        poss = int(avail_shares // 100)
-                        if poss > 0:
-                            coll_found = True
-                            valid_opts[f"Shares: {avail_shares} avail"] = {"id": h_id, "limit": poss}
-                    elif "LONG_" in h_type or "LEAP_" in h_type:
-                        avail = int(max(0, int(h_qty) - used_total))
-                        if avail > 0:
-                            coll_found = True
-                            valid_opts[f"LEAP ${float(h.get('strike_price',0)):.2f}: {avail} avail"] = {"id": h_id, "limit": avail}
+                valid_opts, coll_found = analytics.collateral_options(holdings_data, locked_map, total_open_calls)
                 if coll_found:
                     sel_lbl = st.selectbox("Link Collateral", list(valid_opts.keys()))
                     linked_id = valid_opts[sel_lbl]["id"]
@@ -6299,7 +5440,7 @@ def _third_friday_next_december(d: date) -> date:
 
 
 def _fetch_open_shorts(user, symbol: str | None = None):
-    q = supabase.table("options").select("*").eq("user_id", user.id).eq("status", "open")
+    q = supabase.table("options").select(schema.OPEN_OPTIONS.select).eq("user_id", user.id).eq("status", "open")
     if symbol:
         q = q.eq("symbol", symbol)
     try:
@@ -6311,7 +5452,7 @@ def _fetch_open_shorts(user, symbol: str | None = None):
 
 def _fetch_long_leaps(user, symbol: str | None = None):
     # Long LEAPs are stored in assets table with type like LEAP_CALL / LEAP_PUT
-    q = supabase.table("assets").select("*").eq("user_id", user.id)
+    q = supabase.table("assets").select(schema.ASSET_POSITIONS.select).eq("user_id", user.id)
     if symbol:
         q = q.eq("symbol", symbol) if "symbol" in (symbol or "") else q.eq("ticker", symbol)
     try:
@@ -6355,14 +5496,14 @@ def _bulk_expire_option(option_id: int):
 
 def settings_page(user):
     st.header("⚙️ Settings")
-    tab1, tab2 = st.tabs(["Assets", "Danger Zone"])
+    tab1, tab2, tab3 = st.tabs(["Assets", "Danger Zone", "Diagnostics"])
     with tab1:
         try:
-            assets = supabase.table("assets").select("*").eq("user_id", user.id).execute().data
+            assets = supabase.table("assets").select(schema.ASSET_LABELS.select).eq("user_id", user.id).execute().data
             if assets:
                 a_map = {f"{a.get('ticker','UNK')} ({a['quantity']})": a['id'] for a in assets}
                 sel_a = st.selectbox("Select Asset to Delete", list(a_map.keys()))
-                if st.button("Delete Asset"): supabase.table("assets").delete().eq("id", a_map[sel_a]).execute(); st.rerun()
+                if st.button("Delete Asset"): supabase.table("assets").delete().eq("id", a_map[sel_a]).execute(); caches.invalidate_account(user.id); st.rerun()
         except: pass
     with tab2:
         st.subheader("🔥 Reset Account")
@@ -6374,8 +5515,21 @@ def settings_page(user):
             c1, c2 = st.columns(2)
             if c1.button("Yes, Delete Everything"):
                 for t in ["options", "assets", "transactions", "portfolio_history"]: supabase.table(t).delete().eq("user_id", user.id).execute()
+                caches.invalidate_account(user.id)
                 st.session_state.confirm_reset = False; st.success("Account reset."); st.rerun()
             if c2.button("Cancel"): st.session_state.confirm_reset = False; st.rerun()
+    with tab3:
+        # Widget state is dropped on other pages, so the preference lives under its own key (set before the rerun).
+        st.toggle("Show performance inspector", value=bool(st.session_state.get(perf.PREF_KEY)), key="_perf_toggle",
+                  on_change=lambda: st.session_state.update({perf.PREF_KEY: st.session_state["_perf_toggle"]}),
+                  help="Sidebar panel with render time, Supabase queries, Yahoo calls and slow helpers for each rerun. "
+                       "Also available with ?perf=1 in the URL.")
+        if perf.PERF_PROFILING:
+            st.toggle("Profile page renders (cProfile + tracemalloc)", value=bool(st.session_state.get(perf.PROFILE_KEY)),
+                      key="_perf_profile_toggle",
+                      on_change=lambda: st.session_state.update({perf.PROFILE_KEY: st.session_state["_perf_profile_toggle"]}),
+                      help="Runs each page under the profiler and shows the hottest functions and allocation sites "
+                           "below it, with a .pstats download. Slows renders noticeably. Also ?profile=1.")
 
 def main():
     apply_global_ui_theme()
@@ -6455,6 +5609,15 @@ def main():
                         del st.session_state[_k]
                 st.rerun()
 
+    # Yahoo circuit breaker (src/marketdata.py): say so when prices are last-known rather than live
+    md_status = marketdata.status()
+    if md_status["state"] != "closed":
+        retry = md_status["retry_at"].strftime("%H:%M:%S") if md_status["retry_at"] else "shortly"
+        st.warning(
+            f"⚠️ Market data degraded: Yahoo Finance is failing ({md_status['last_error'] or 'repeated errors'}). "
+            f"Showing last-known prices; live quotes resume after {retry}."
+        )
+
     # Navigation (horizontal)
     default_page = st.session_state.get("_selected_page", "Dashboard")
     if default_page not in pages:
@@ -6463,19 +5626,43 @@ def main():
     st.session_state["_selected_page"] = page
 
     user = st.session_state.user
-    active_user = _set_active_account(user)
-    if page == "Dashboard": dashboard_page(active_user, view="summary")
-    elif page == "Holdings": dashboard_page(active_user, view="holdings")
-    elif page == "Option Details": option_details_page(active_user)
-    elif page == "Update LEAP Prices": pricing_page(active_user)
-    elif page == "Weekly Snapshot": snapshot_page(active_user)
-    elif page == "Cash Management": cash_management_page(active_user)
-    elif page == "Enter Trade": trade_entry_page(active_user)
-    elif page == "Ledger": ledger_page(active_user)
-    elif page == "Import Data": import_page(active_user)
-    elif page == "Profile": account_sharing_page(active_user)
-    elif page == "Community": community_page(user)
-    elif page == "Settings": settings_page(user)
+
+    def _render_page():
+        active_user = _set_active_account(user)
+        if _perf:
+            _perf.account = getattr(active_user, "id", None)
+        if page == "Dashboard": dashboard_page(active_user, view="summary")
+        elif page == "Holdings": dashboard_page(active_user, view="holdings")
+        elif page == "Option Details": option_details_page(active_user)
+        elif page == "Update LEAP Prices": pricing_page(active_user)
+        elif page == "Weekly Snapshot": snapshot_page(active_user)
+        elif page == "Cash Management": cash_management_page(active_user)
+        elif page == "Enter Trade": trade_entry_page(active_user)
+        elif page == "Ledger": ledger_page(active_user)
+        elif page == "Import Data": import_page(active_user)
+        elif page == "Profile": account_sharing_page(active_user)
+        elif page == "Community": community_page(user)
+        elif page == "Settings": settings_page(user)
+
+    profiled = perf.profiling()
+    if _perf:
+        _perf.page = page
+    _t0 = time.perf_counter()
+    _err = None
+    try:
+        if profiled:
+            perf.profile_call(page, _render_page)
+        else:
+            _render_page()
+    except Exception as e:
+        _err = type(e).__name__  # includes st.stop()/st.rerun() control flow
+        raise
+    finally:
+        if _perf:
+            _perf.page_done(time.perf_counter() - _t0, _err)
+        if profiled:
+            perf.render_profile()
+        perf.render_panel(_perf)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,221 @@
+"""Time the analytics hot paths on synthetic accounts of several sizes.
+
+Runs each function in src/analytics.py that backs a heavy page section
+(dashboard NAV, flow-normalized weekly returns, the Weekly Snapshot table,
+realized P/L replay, ledger grouping, unified-import planning and collateral
+availability) against src/synthetic portfolios, without Streamlit or a
+database, and writes the timings as JSON.
+
+    python benchmarks/bench_analytics.py --sizes small,medium,huge \
+        --output benchmarks/results/$(git rev-parse --short HEAD).json
+
+    # flag anything >25% slower than an earlier run (exit 1)
+    python benchmarks/bench_analytics.py --compare benchmarks/results/abc1234.json
+
+    # ledger grouping on a ~100k-transaction ledger
+    python benchmarks/bench_analytics.py --sizes xl --only ledger_grouping
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src import analytics, schema, synthetic  # noqa: E402
+
+AS_OF = date(2026, 10, 16)  # fixed so runs on different days see the same data
+
+
+def _with_ids(rows: list[dict]) -> list[dict]:
+    return [{**r, "id": i} for i, r in enumerate(rows, start=1)]
+
+
+def build_inputs(p: synthetic.Portfolio) -> dict:
+    """Frames / rows shaped like what each page hands to analytics."""
+    assets = _with_ids([synthetic._clean(a) for a in p.assets])
+    options, _ = synthetic._link(p, [a["id"] for a in assets])
+    options = _with_ids(options)
+    txs = _with_ids([synthetic._clean(t) for t in p.transactions])
+    history = _with_ids(p.portfolio_history)
+
+    open_assets = [a for a in assets if a["quantity"]]
+    open_options = [o for o in options if o["status"] == "open"]
+    prices = {a["ticker"]: a["last_price"] for a in assets if a["type"] == "STOCK"}
+    flows = [t for t in txs if t["type"] in ("DEPOSIT", "WITHDRAWAL")]
+
+    # Unified-import CSV covering every stock / LEAP / option trade and cash flow in the ledger
+    csv_rows = []
+    for t in txs:
+        parsed = analytics.parse_trade_desc(t["description"])
+        if t["type"] in ("DEPOSIT", "WITHDRAWAL", "DIVIDEND"):
+            csv_rows.append({"Date": t["transaction_date"], "Category": "CASH", "Action": t["type"],
+                             "Symbol": "", "Qty": "", "Price": abs(t["amount"])})
+        elif parsed:
+            cat = "LEAP" if "LEAP" in t["type"] else "STOCK"
+            csv_rows.append({"Date": t["transaction_date"], "Category": cat, "Action": parsed[0],
+                             "Symbol": parsed[2], "Qty": parsed[1], "Price": f"${parsed[3]:,.2f}", "Fees": "0"})
+    for o in options:
+        csv_rows.append({"Date": o["open_date"], "Category": "SHORT OPTION", "Action": "STO", "Symbol": o["symbol"],
+                         "Qty": o["contracts"], "Price": o["premium_received"], "Strike": o["strike_price"],
+                         "Expiration": o["expiration_date"], "Option Type": o["type"], "Fees": 0.65})
+
+    locked = {}
+    open_calls = {}
+    for o in open_options:
+        if o["type"] == "CALL":
+            open_calls[o["symbol"]] = open_calls.get(o["symbol"], 0) + o["contracts"]
+            if o.get("linked_asset_id") is not None:
+                key = str(o["linked_asset_id"])
+                locked[key] = locked.get(key, 0) + o["contracts"]
+    holdings = {}
+    for a in open_assets:
+        holdings.setdefault(a["ticker"], []).append(a)
+
+    return {
+        "open_assets": open_assets, "open_options": open_options, "prices": prices,
+        "history": history, "flows": flows, "txs": txs, "csv": pd.DataFrame(csv_rows),
+        "holdings": holdings, "locked": locked, "open_calls": open_calls,
+        "net_liq": p.portfolio_history[-1]["total_equity"] if p.portfolio_history else 0.0,
+    }
+
+
+# ---- hot paths: each takes the inputs dict and does what the page does -------
+
+def nav_valuation(d):
+    assets = schema.ASSET_POSITIONS.frame(d["open_assets"])
+    options = schema.OPEN_OPTIONS.frame(d["open_options"])
+    return analytics.value_positions(assets, options, lambda s: d["prices"].get(s, 0.0))
+
+
+def weekly_returns(d):
+    hist = analytics.snapshot_frame(schema.SNAPSHOTS.frame(d["history"]))
+    tx = analytics.usd_flows(pd.DataFrame(d["flows"]))
+    weekly = analytics.weekly_flow_returns(hist, tx)
+    cur_profit, cur_ret = analytics.current_week(hist, tx, d["net_liq"])
+    return analytics.compound(list(weekly["ret"]) + [cur_ret]), float(weekly["profit"].sum()) + cur_profit
+
+
+def snapshot_table(d):
+    hist = schema.SNAPSHOTS.frame(d["history"])
+    hist["snapshot_date"] = pd.to_datetime(hist["snapshot_date"])
+    return analytics.snapshot_history_table(hist, analytics.usd_flows(pd.DataFrame(d["flows"])))
+
+
+def realized_pl(d):
+    return analytics.realized_pl(d["txs"], date(AS_OF.year, 1, 1))
+
+
+def ledger_grouping(d):
+    return analytics.ledger_summary(schema.LEDGER_ROWS.frame(d["txs"]))
+
+
+def unified_import(d):
+    return list(analytics.plan_unified_import(d["csv"]))
+
+
+def collateral(d):
+    return [analytics.collateral_options(h, d["locked"], d["open_calls"].get(sym, 0))
+            for sym, h in d["holdings"].items()]
+
+
+BENCHMARKS = {
+    "nav_valuation": (nav_valuation, lambda d: len(d["open_assets"]) + len(d["open_options"])),
+    "weekly_returns": (weekly_returns, lambda d: len(d["history"])),
+    "snapshot_table": (snapshot_table, lambda d: len(d["history"])),
+    "realized_pl": (realized_pl, lambda d: len(d["txs"])),
+    "ledger_grouping": (ledger_grouping, lambda d: len(d["txs"])),
+    "unified_import": (unified_import, lambda d: len(d["csv"])),
+    "collateral": (collateral, lambda d: sum(len(h) for h in d["holdings"].values())),
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run(sizes, names, repeat: int, seed: int):
+    results = []
+    for size in sizes:
+        t0 = time.perf_counter()
+        inputs = build_inputs(synthetic.generate(size=size, seed=seed, end=AS_OF))
+        print(f"# {size}: inputs built in {time.perf_counter() - t0:.1f}s")
+        for name in names:
+            fn, rows = BENCHMARKS[name]
+            timings = []
+            for _ in range(repeat):
+                t = time.perf_counter()
+                fn(inputs)
+                timings.append(time.perf_counter() - t)
+            r = {"bench": name, "size": size, "rows": rows(inputs), "repeat": repeat,
+                 "min_s": min(timings), "median_s": statistics.median(timings), "mean_s": statistics.fmean(timings)}
+            results.append(r)
+            print(f"{name:<16} {size:<7} rows={r['rows']:>6}  min={r['min_s'] * 1000:10.2f} ms  "
+                  f"median={r['median_s'] * 1000:10.2f} ms")
+    return results
+
+
+def compare(results, baseline_path: Path, tolerance: float) -> int:
+    base = {(r["bench"], r["size"]): r for r in json.loads(baseline_path.read_text())["results"]}
+    regressions = 0
+    print(f"# vs {baseline_path} (tolerance {tolerance:.0%})")
+    for r in results:
+        b = base.get((r["bench"], r["size"]))
+        if not b:
+            continue
+        ratio = r["min_s"] / b["min_s"] if b["min_s"] else float("inf")
+        flag = "REGRESSED" if ratio > 1 + tolerance else "ok"
+        regressions += flag != "ok"
+        print(f"{r['bench']:<16} {r['size']:<7} {b['min_s'] * 1000:10.2f} -> {r['min_s'] * 1000:10.2f} ms  x{ratio:5.2f}  {flag}")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="small,medium", help=f"Comma list of {sorted(synthetic.SIZES)}")
+    ap.add_argument("--only", help=f"Comma list of {list(BENCHMARKS)}")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--output", help="JSON results file (default: benchmarks/results/<commit>.json)")
+    ap.add_argument("--compare", help="Earlier results JSON to check for regressions")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs --compare")
+    args = ap.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [s for s in sizes if s not in synthetic.SIZES] + [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        ap.error(f"unknown size/benchmark: {', '.join(unknown)}")
+
+    results = run(sizes, names, args.repeat, args.seed)
+    commit = _git_commit()
+    out = Path(args.output) if args.output else ROOT / "benchmarks" / "results" / f"{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "seed": args.seed,
+        "results": results,
+    }, indent=2))
+    print(f"# wrote {out}")
+
+    if args.compare:
+        return 1 if compare(results, Path(args.compare), args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
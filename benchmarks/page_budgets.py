@@ -0,0 +1,190 @@
+"""Render each page through Streamlit AppTest and check query / quote / time budgets.
+
+Seeds a synthetic account (plus opted-in community peers) into the in-process
+fake Supabase backend, writes replay quotes for its symbols, then renders every
+page with cold caches and counts Supabase round trips (src/fakedb call
+counter) and Yahoo calls (ReplayProvider.calls). Any page over budget is
+reported and the script exits 1, so N+1 query patterns and chatty pricing
+show up before they ship.
+
+    python benchmarks/page_budgets.py                 # small account, default budgets
+    python benchmarks/page_budgets.py --pages Ledger,Community --latency-ms 20
+    python benchmarks/page_budgets.py --size medium --report-only --output /tmp/pages.json
+
+Budgets are calibrated on --size small with --latency-ms 0; bigger accounts
+legitimately need more keyset pages, so use --report-only there.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+EMAIL = "budget@example.com"
+
+
+@dataclass(frozen=True)
+class Budget:
+    db_calls: int
+    yahoo_calls: int
+    seconds: float
+
+
+# Pages routed from main(); Cash Management / Import Data / Profile / Settings are forms with no heavy reads.
+# Renders are measured cold, so db_calls include the fingerprint probe in front of each cached
+# portfolio read (src/fingerprints.py); warm reruns only pay the probes.
+# Budgets are the worst count measured on --size small (trailing comments, db / yahoo) plus
+# headroom of at least 2 db calls and 2 Yahoo calls where the page prices anything: background
+# work such as the symbol-metadata fill can add a call to a render, while an N+1 loop over
+# positions or lots adds far more than that. Re-measure and keep the headroom when a page
+# legitimately gains a read.
+BUDGETS = {
+    "Dashboard": Budget(db_calls=16, yahoo_calls=8, seconds=6.0),  # 14 / 5
+    "Holdings": Budget(db_calls=18, yahoo_calls=12, seconds=6.0),  # 16 / 9
+    "Option Details": Budget(db_calls=13, yahoo_calls=6, seconds=5.0),  # 11 / 4
+    "Update LEAP Prices": Budget(db_calls=10, yahoo_calls=6, seconds=5.0),  # 7 / 2
+    "Weekly Snapshot": Budget(db_calls=10, yahoo_calls=4, seconds=15.0),  # 8 / 2
+    "Ledger": Budget(db_calls=9, yahoo_calls=0, seconds=6.0),  # 7 / 0
+    "Enter Trade": Budget(db_calls=8, yahoo_calls=2, seconds=4.0),  # 5 / 0
+    "Community": Budget(db_calls=10, yahoo_calls=2, seconds=4.0),  # 8 / 0
+}
+
+
+def seed(client, size: str, seed_: int, peers: int, quotes_dir: Path):
+    """Load the synthetic account, `peers` opted-in community users and replay quotes."""
+    import pandas as pd
+
+    from src import marketdata, synthetic
+    from src.fakedb import fake_user_id
+
+    uid = fake_user_id(EMAIL)
+    synthetic.clear_user(client, uid)
+    p = synthetic.generate(uid, size, seed=seed_)
+    synthetic.write_client(p, client)
+
+    client.table("user_preferences").delete().neq("id", -1).execute()
+    client.table("user_metrics").delete().neq("id", -1).execute()
+    client.table("user_preferences").insert(
+        [{"user_id": uid, "display_name": "Budget", "share_stats": True}]
+        + [{"user_id": f"peer-{i}", "display_name": f"Peer {i}", "share_stats": True} for i in range(peers)]
+    ).execute()
+    today = date.today()
+    client.table("user_metrics").insert([
+        {"user_id": f"peer-{i}", "as_of_date": (today - timedelta(days=d)).isoformat(),
+         "wtd_pct": 0.001 * i, "mtd_pct": 0.002 * i, "ytd_pct": 0.01 * i, "w52_pct": 0.02 * i}
+        for i in range(peers) for d in range(5)
+    ]).execute()
+
+    for a in p.assets:
+        marketdata.save_fixture(quotes_dir, "last_price", (a["ticker"],), float(a["last_price"]))
+        marketdata.save_fixture(quotes_dir, "info", (a["ticker"],), {"sector": "Technology", "industry": "Software"})
+    marketdata.save_fixture(quotes_dir, "history", ("CAD=X", "1d"), pd.DataFrame({"Close": [1.37]}))
+    # src/fx daily history: first fill, then the incremental top-up
+    days = pd.bdate_range(end=today, periods=260 * 3)
+    for period, idx in (("10y", days), ("5d", days[-5:])):
+        marketdata.save_fixture(quotes_dir, "history", ("CAD=X", period),
+                                pd.DataFrame({"Close": [1.37] * len(idx)}, index=idx))
+    return uid, p
+
+
+def render(page: str, uid: str, client, provider, timeout: float) -> dict:
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    st.cache_data.clear()  # every page is measured cold
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=timeout)
+    at.session_state["user"] = SimpleNamespace(id=uid, email=EMAIL)
+    at.session_state["_selected_page"] = page
+    client.reset_calls()
+    provider.calls = 0
+    t0 = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - t0
+    by_table = {}
+    for (table, op), n in client.calls.items():
+        by_table[f"{table}.{op}"] = n
+    return {
+        "page": page,
+        "db_calls": sum(client.calls.values()),
+        "yahoo_calls": provider.calls,
+        "seconds": round(elapsed, 3),
+        "db_by_table": by_table,
+        "exceptions": [str(e.value)[:300] for e in at.exception],
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--pages", help=f"Comma list of {list(BUDGETS)} (default: all)")
+    ap.add_argument("--size", default="small", help="src/synthetic size of the seeded account")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--peers", type=int, default=25, help="Opted-in community users to seed")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Fake Supabase and replay latency per call")
+    ap.add_argument("--timeout", type=float, default=300.0, help="AppTest per-render timeout (s)")
+    ap.add_argument("--report-only", action="store_true", help="Print results without failing on budgets")
+    ap.add_argument("--output", help="Write results as JSON")
+    args = ap.parse_args(argv)
+
+    pages = [p.strip() for p in args.pages.split(",")] if args.pages else list(BUDGETS)
+    unknown = [p for p in pages if p not in BUDGETS]
+    if unknown:
+        ap.error(f"unknown page: {', '.join(unknown)}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="page-budgets-"))
+    db_path = str(workdir / "fake.sqlite")
+    quotes_dir = workdir / "marketdata"
+    # src.config reads these at import, so set them before anything from src is loaded
+    os.environ.update({
+        "SUPABASE_BACKEND": "fake",
+        "FAKE_SUPABASE_DB": db_path,
+        "FAKE_SUPABASE_LATENCY_MS": str(args.latency_ms),
+        "MARKETDATA_MODE": "replay",
+        "MARKETDATA_DIR": str(quotes_dir),
+        "MARKETDATA_LATENCY_MS": str(args.latency_ms),
+    })
+    os.chdir(ROOT)  # app.py loads logo.png relative to the cwd
+
+    from src import marketdata
+    from src.fakedb import create_fake_client
+
+    client = create_fake_client(db_path, args.latency_ms)
+    uid, p = seed(client, args.size, args.seed, args.peers, quotes_dir)
+    provider = marketdata.ReplayProvider(quotes_dir, args.latency_ms)
+    marketdata.set_provider(provider)
+    print(f"# {args.size} account {p.counts()}, {args.peers} community peers, latency {args.latency_ms:g} ms")
+
+    results, failures = [], 0
+    for page in pages:
+        r = render(page, uid, client, provider, args.timeout)
+        b = BUDGETS[page]
+        over = [k for k in ("db_calls", "yahoo_calls", "seconds") if r[k] > getattr(b, k)]
+        if r["exceptions"]:
+            over.append("exception")
+        r["budget"] = asdict(b)
+        r["over"] = over
+        results.append(r)
+        failures += bool(over)
+        print(f"{page:<20} db={r['db_calls']:>4}/{b.db_calls:<4} yahoo={r['yahoo_calls']:>3}/{b.yahoo_calls:<3} "
+              f"{r['seconds']:7.2f}s/{b.seconds:<5g} {'OVER: ' + ', '.join(over) if over else 'ok'}")
+        for e in r["exceptions"]:
+            print(f"    exception: {e}")
+        if "db_calls" in over:
+            print(f"    by table: {r['db_by_table']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"size": args.size, "peers": args.peers,
+                                                 "latency_ms": args.latency_ms, "results": results}, indent=2))
+        print(f"# wrote {args.output}")
+    return 0 if args.report_only or not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
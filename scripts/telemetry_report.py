@@ -0,0 +1,88 @@
+"""Summarize telemetry spans: p50/p95/p99 latency per page, query, Yahoo call or helper.
+
+    python scripts/telemetry_report.py                       # pages + queries, all files
+    python scripts/telemetry_report.py --group query --since 7d
+    python scripts/telemetry_report.py --group page --by-account --file /var/log/options/telemetry.jsonl
+    python scripts/telemetry_report.py --group yahoo --csv > yahoo.csv
+
+Reads TELEMETRY_FILE (or --file, needed when telemetry is off) together with
+its rotated backups.
+"""
+import argparse
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src import telemetry  # noqa: E402
+from src.config import TELEMETRY_FILE  # noqa: E402
+
+# group -> (span kind, columns to group by)
+GROUPS = {
+    "page": ("page", ["name"]),
+    "query": ("db", ["name"]),
+    "page-query": ("db", ["page", "name"]),
+    "yahoo": ("yahoo", ["name"]),
+    "helper": ("helper", ["name", "cache"]),
+}
+
+
+def _since(value: str | None):
+    """'7d', '12h', '30m' or an ISO date/time."""
+    if not value:
+        return None
+    m = re.fullmatch(r"(\d+)([dhm])", value.strip())
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        delta = {"d": timedelta(days=n), "h": timedelta(hours=n), "m": timedelta(minutes=n)}[unit]
+        return datetime.now(timezone.utc) - delta
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--file", default=TELEMETRY_FILE if telemetry.enabled() else None,
+                    help="Span file (rotated .1 … .N siblings are included; default: TELEMETRY_FILE)")
+    ap.add_argument("--group", action="append", choices=sorted(GROUPS),
+                    help="Table(s) to print (default: page and query)")
+    ap.add_argument("--since", help="Only spans newer than e.g. 7d, 12h or 2026-10-01")
+    ap.add_argument("--by-account", action="store_true", help="Split every table per account")
+    ap.add_argument("--top", type=int, default=25, help="Rows per table (slowest p95 first)")
+    ap.add_argument("--csv", action="store_true", help="Emit CSV instead of aligned text")
+    args = ap.parse_args(argv)
+
+    if not args.file:
+        sys.exit("telemetry is off: set TELEMETRY_FILE or pass --file")
+    files = telemetry.span_files(args.file)
+    if not files:
+        sys.exit(f"no telemetry at {args.file}")
+    df = telemetry.read_spans(files, since=_since(args.since))
+    if df.empty:
+        sys.exit("no spans in range")
+
+    for group in args.group or ["page", "query"]:
+        kind, by = GROUPS[group]
+        spans = df[df["kind"] == kind]
+        if "cache" in spans.columns:
+            spans = spans.assign(cache=spans["cache"].fillna("-"))
+        if args.by_account:
+            by = ["account", *by]
+        table = telemetry.summarize(spans, [c for c in by if c in spans.columns]).head(args.top)
+        if args.csv:
+            table.insert(0, "group", group)
+            sys.stdout.write(table.to_csv(index=False))
+            continue
+        print(f"\n== {group} ({len(spans)} spans, {spans['ts'].min():%Y-%m-%d %H:%M} .. {spans['ts'].max():%Y-%m-%d %H:%M} UTC)"
+              if len(spans) else f"\n== {group} (no spans)")
+        if not table.empty:
+            with pd.option_context("display.width", 200, "display.max_colwidth", 60):
+                print(table.to_string(index=False, float_format=lambda v: f"{v:,.1f}"))
+
+
+if __name__ == "__main__":
+    main()
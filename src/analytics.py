@@ -0,0 +1,799 @@
+"""Pure calculations behind the heavier pages.
+
+Nothing in here touches Streamlit or Supabase: pages fetch rows, pass them in
+and render what comes back. That keeps the hot paths callable from
+benchmarks/ on synthetic data (see benchmarks/bench_analytics.py).
+"""
+import math
+import re
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+
+def clean_number(val):
+    if val is None or pd.isna(val) or val == "":
+        return 0.0
+    if isinstance(val, (int, float)):
+        return float(val)
+    s = str(val).strip().replace('$', '').replace(',', '').replace(' ', '').replace('CAD', '').replace('USD', '')
+    try: return float(s)
+    except: return 0.0
+
+def normalize_columns(df):
+    if not df.empty:
+        if 'ticker' in df.columns and 'symbol' not in df.columns: df['symbol'] = df['ticker']
+        if 'strike_price' in df.columns and 'strike' not in df.columns: df['strike'] = df['strike_price']
+        if 'expiration_date' in df.columns and 'expiration' not in df.columns: df['expiration'] = df['expiration_date']
+        # If both exist, prefer expiration_date (some older rows may have wrong 'expiration')
+        if 'expiration_date' in df.columns and 'expiration' in df.columns:
+            df['expiration'] = df['expiration_date'].fillna(df['expiration'])
+        if 'contracts' in df.columns:
+            if 'quantity' not in df.columns: df['quantity'] = df['contracts']
+            else: df['quantity'] = df['quantity'].fillna(df['contracts'])
+        if 'quantity' in df.columns: df['quantity'] = df['quantity'].fillna(0)
+    return df
+
+
+# ---- NAV valuation (dashboard_page) ------------------------------------------
+
+def value_positions(assets: pd.DataFrame, options: pd.DataFrame, price_fn: Callable[[str], float]):
+    """Mark open positions to market.
+
+    Stocks use price_fn (live quote, falling back to last_price), LEAPs their
+    manual last_price; short options count ITM CALL intrinsic as liability.
+    `assets` gains type_norm / type_disp / current_price / market_value.
+    """
+    # Normalize asset types
+    try:
+        if not assets.empty and 'type' in assets.columns:
+            assets['type_norm'] = assets['type'].astype(str).str.upper().str.strip()
+        else:
+            assets['type_norm'] = 'STOCK'
+    except Exception:
+        assets['type_norm'] = 'STOCK'
+
+    stock_value_usd = 0.0
+    itm_liability_usd = 0.0
+
+    # 1. Assets Calculation (same logic as option details)
+    if not assets.empty:
+        for idx_row, row in assets.iterrows():
+            qty = clean_number(row.get('quantity', 0))
+            r_type_raw = str(row.get('type', '')).upper().strip()
+            assets.at[idx_row, 'type_norm'] = r_type_raw
+            r_type_disp = r_type_raw.replace('LONG_', 'LEAP ').replace('LEAP_', 'LEAP ')
+            assets.at[idx_row, 'type_disp'] = r_type_disp
+
+            if r_type_raw == 'STOCK':
+                sym = str(row.get('symbol', row.get('ticker', ''))).strip().upper()
+                live_price = price_fn(sym)
+                if live_price == 0:
+                    live_price = clean_number(row.get('last_price', 0))
+                assets.at[idx_row, 'current_price'] = live_price
+                assets.at[idx_row, 'market_value'] = qty * live_price
+                stock_value_usd += (qty * live_price)
+            else:
+                # LEAP/LONG options: use manual last_price as current_price
+                manual_price = clean_number(row.get('last_price', 0))
+                assets.at[idx_row, 'current_price'] = manual_price
+                assets.at[idx_row, 'market_value'] = qty * 100 * manual_price
+
+    # Ensure LEAP Equity matches table formula exactly: qty * 100 * current_price
+    try:
+        leap_value_usd = 0.0
+        if not assets.empty and 'type_norm' in assets.columns:
+            non_stock = assets[assets['type_norm'] != 'STOCK'].copy()
+            if not non_stock.empty:
+                non_stock['qty_num'] = pd.to_numeric(non_stock.get('quantity', 0), errors='coerce').fillna(0)
+                non_stock['px_num'] = pd.to_numeric(non_stock.get('current_price', non_stock.get('last_price', 0)), errors='coerce').fillna(0)
+                leap_value_usd = float((non_stock['qty_num'] * 100.0 * non_stock['px_num']).sum())
+    except Exception:
+        leap_value_usd = 0.0
+
+    # 2. Options Liability (ITM CALL intrinsic only)
+    grouped_options = {}
+    if not options.empty:
+        for _, row in options.iterrows():
+            qty = abs(clean_number(row.get('quantity') or row.get('contracts') or 0))
+            strike = float(clean_number(row.get('strike_price') or row.get('strike') or 0))
+            sym = str(row.get('symbol', row.get('ticker', ''))).strip().upper()
+            opt_type = str(row.get('type', '')).strip().upper()
+
+            raw_exp = row.get('expiration')
+            if raw_exp is None or pd.isna(raw_exp):
+                raw_exp = row.get('expiration_date')
+            exp_str = str(raw_exp) if raw_exp else ""
+
+            underlying_price = price_fn(sym)
+
+            intrinsic_val = 0.0
+            if underlying_price > 0 and "CALL" in opt_type and underlying_price > strike:
+                intrinsic_val = (underlying_price - strike) * qty * 100
+
+            itm_liability_usd += intrinsic_val
+
+            key = (sym, opt_type, exp_str, strike)
+            if key not in grouped_options:
+                grouped_options[key] = {
+                    'symbol': sym,
+                    'type': opt_type,
+                    'expiration': exp_str,
+                    'strike': strike,
+                    'qty': 0.0,
+                    'price': underlying_price,
+                    'liability': 0.0,
+                    'constituents': [],
+                    'linked_assets': []
+                }
+
+            grouped_options[key]['qty'] += qty
+            grouped_options[key]['liability'] += intrinsic_val
+
+            old_premium = row.get('premium_received')
+            if old_premium is None:
+                old_premium = row.get('cost_basis', 0)
+
+            lid = row.get('linked_asset_id')
+            if lid and not pd.isna(lid):
+                grouped_options[key]['linked_assets'].append(str(lid))
+
+            grouped_options[key]['constituents'].append({
+                'id': row['id'],
+                'qty': qty,
+                'cost_basis': row.get('cost_basis', 0),
+                'premium_received': old_premium,
+                'open_date': row.get('open_date'),
+                'linked_asset_id': lid
+            })
+
+    return SimpleNamespace(
+        assets=assets,
+        stock_value=stock_value_usd,
+        leap_value=leap_value_usd,
+        itm_liability=itm_liability_usd,
+        grouped_options=grouped_options,
+    )
+
+
+# ---- Flow-normalized weekly returns ------------------------------------------
+
+def snapshot_frame(hist_df: pd.DataFrame | None):
+    """Snapshots as (snapshot_date, total_equity), parsed, cleaned and date-sorted.
+
+    None when there is no history or the required columns are missing.
+    """
+    if hist_df is None or hist_df.empty:
+        return None
+    hist_df = normalize_columns(hist_df)
+    if "snapshot_date" not in hist_df.columns or "total_equity" not in hist_df.columns:
+        return None
+    hist_df = hist_df[["snapshot_date", "total_equity"]].copy()
+    hist_df["snapshot_date"] = pd.to_datetime(hist_df["snapshot_date"], errors="coerce")
+    hist_df["total_equity"] = pd.to_numeric(hist_df["total_equity"], errors="coerce")
+    return hist_df.dropna(subset=["snapshot_date", "total_equity"]).sort_values("snapshot_date", ascending=True)
+
+def usd_flows(tx_df: pd.DataFrame | None) -> pd.DataFrame:
+    """USD deposit/withdrawal rows with parsed dates and numeric amounts."""
+    if tx_df is None or tx_df.empty:
+        return pd.DataFrame(columns=["transaction_date", "amount", "type", "currency"])
+    tx_df = normalize_columns(tx_df.copy())
+    tx_df["transaction_date"] = pd.to_datetime(tx_df["transaction_date"], errors="coerce")
+    tx_df["amount"] = pd.to_numeric(tx_df["amount"], errors="coerce")
+    tx_df = tx_df.dropna(subset=["transaction_date", "amount"])
+    if "currency" in tx_df.columns:
+        tx_df = tx_df[tx_df["currency"].astype(str).str.upper() == "USD"]
+    return tx_df
+
+def weekly_flow_returns(hist_df: pd.DataFrame, tx_df: pd.DataFrame) -> pd.DataFrame:
+    """One row per snapshot: equity, net flows since the previous snapshot, profit and return.
+
+    Weekly % = (equity - (prev equity + net flows)) / (prev equity + net flows);
+    the first snapshot is measured against zero prior equity.
+    """
+    dates = pd.to_datetime(hist_df["snapshot_date"]).to_numpy()
+    equity = hist_df["total_equity"].astype(float).to_numpy()
+    prev_dates = np.concatenate([[np.datetime64("NaT")], dates[:-1]]) if len(dates) else dates
+    prev_eq = np.concatenate([[0.0], equity[:-1]]) if len(equity) else equity
+
+    # flows in (prev snapshot, snapshot] = cumulative flow up to the snapshot minus up to
+    # the previous one; the first snapshot takes everything up to its date
+    net_flow = np.zeros(len(dates))
+    if not tx_df.empty and len(dates):
+        tx = tx_df[["transaction_date", "amount"]].sort_values("transaction_date", kind="stable")
+        tx_dates = pd.to_datetime(tx["transaction_date"]).to_numpy()
+        cum = np.concatenate([[0.0], np.cumsum(tx["amount"].fillna(0.0).to_numpy(dtype=float))])
+        upto = np.searchsorted(tx_dates, dates, side="right")
+        upto_prev = np.where(np.isnat(prev_dates), 0, np.searchsorted(tx_dates, prev_dates, side="right"))
+        net_flow = np.where(upto > upto_prev, cum[upto] - cum[np.minimum(upto_prev, upto)], 0.0)
+
+    base_capital = prev_eq + net_flow
+    profit = equity - base_capital
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.where(base_capital == 0, 0.0, profit / np.where(base_capital == 0, 1.0, base_capital))
+    return pd.DataFrame({"date": hist_df["snapshot_date"].to_numpy(), "equity": equity, "net_flow": net_flow,
+                         "profit": profit, "ret": ret}, columns=["date", "equity", "net_flow", "profit", "ret"])
+
+def current_week(hist_df: pd.DataFrame, tx_df: pd.DataFrame, net_liq_usd: float):
+    """(profit, return) of the current, unfrozen week: last snapshot -> live net liquidation."""
+    last_date = hist_df.iloc[-1]["snapshot_date"]
+    last_eq = float(hist_df.iloc[-1]["total_equity"])
+    cur_flow = 0.0
+    if not tx_df.empty:
+        mask_cur = tx_df["transaction_date"] > last_date
+        cur_flow = float(tx_df.loc[mask_cur, "amount"].sum())
+    cur_base = last_eq + cur_flow
+    cur_profit = float(net_liq_usd) - float(cur_base)
+    cur_ret = (cur_profit / cur_base) if cur_base not in (0, 0.0, None) else 0.0
+    return cur_profit, cur_ret
+
+def compound(rets) -> float:
+    """Chain weekly returns; NaN/inf weeks count as flat."""
+    prod = 1.0
+    for r in rets:
+        if r is None or (isinstance(r, float) and (math.isinf(r) or math.isnan(r))):
+            r = 0.0
+        prod *= (1.0 + float(r))
+    return float(prod - 1.0)
+
+def snapshot_history_table(hist_df: pd.DataFrame, tx_df: pd.DataFrame) -> pd.DataFrame:
+    """Weekly Snapshot history: weekly P/L and %, plus YTD, weekly-average and rolling 52W compounds."""
+    wk = weekly_flow_returns(hist_df, tx_df)
+    calc_df = pd.DataFrame({
+        "Date": pd.to_datetime(wk["date"]).dt.strftime('%Y-%m-%d'),
+        "Equity": wk["equity"],
+        "Net Dep": wk["net_flow"],
+        "P/L $": wk["profit"],
+        "Weekly %": wk["ret"],
+    })
+
+    # YTD: compound of the year's weekly returns up to each row; Wkly Avg: its per-week geometric mean
+    growth = 1.0 + calc_df["Weekly %"].astype(float)
+    year = pd.to_datetime(calc_df["Date"]).dt.year
+    ytd_vals = growth.groupby(year).cumprod() - 1.0
+    n_weeks = year.groupby(year).cumcount() + 1
+    with np.errstate(invalid="ignore"):
+        wkly_avg_vals = (1.0 + ytd_vals) ** (1.0 / n_weeks) - 1.0
+
+    # 52W rolling window: last 52 weekly returns ending at each row (or since inception)
+    padded = np.concatenate([np.ones(51), growth.to_numpy()])
+    roll_52_vals = np.lib.stride_tricks.sliding_window_view(padded, 52).prod(axis=1) - 1.0 if len(growth) else []
+
+    calc_df["YTD %"] = ytd_vals
+    calc_df["Wkly Avg %"] = wkly_avg_vals
+    calc_df["52W %"] = roll_52_vals
+    return calc_df
+
+
+# ---- Realized P/L replay (option_details_page) -------------------------------
+
+def parse_trade_desc(desc: str):
+    """Parse trade descriptions into (Buy/Sell, qty, symbol, price).
+
+    Supports variants like:
+      - Buy 100 AAPL @ $100.00
+      - SELL 50 TSLA @ 210.15
+      - Buy 100 AAPL at 100
+      - Sell 10 MSFT price 402.12
+    """
+    d = (desc or "").strip()
+
+    # Normalize spacing
+    dn = re.sub(r"\s+", " ", d).strip()
+
+    # Common patterns: action qty sym @|at|price $price
+    m = re.search(
+        r"^(Buy|Sell)\s+([0-9]*\.?[0-9]+)\s+([A-Za-z0-9\.\-]+)\b.*?(?:@|\bat\b|\bprice\b|\bpx\b)\s*\$?\s*([0-9,]*\.?[0-9]+)",
+        dn,
+        flags=re.IGNORECASE,
+    )
+    if not m:
+        return None
+
+    action = m.group(1).capitalize()
+    qty = float(m.group(2))
+    sym = m.group(3).upper().strip()
+    price = float(m.group(4).replace(",", ""))
+
+    if qty <= 0 or price <= 0:
+        return None
+    return action, qty, sym, price
+
+def realized_pl(tx_rows: list[dict], pl_start_date: date | None = None):
+    """Replay the ledger in date order and return realized P/L per ticker.
+
+    Stocks/LEAPs use a running average cost; shorts are OPTION_PREMIUM cash
+    flows; dividends/interest/fees go to the underlying. Only events on or
+    after pl_start_date count (the running cost always uses full history).
+    Returns (stock_real, leap_real, short_real) dicts.
+    """
+    # Sort by date
+    try:
+        tx_rows = sorted(tx_rows, key=lambda r: str(r.get("transaction_date") or ""))
+    except Exception:
+        pass
+
+    # Running state (lifetime)
+    stock_qty = {}
+    stock_cost = {}
+    leap_qty = {}
+    leap_cost = {}
+
+    stock_real = {}
+    leap_real = {}
+    short_real = {}
+
+    for r in tx_rows:
+        # Parse date
+        try:
+            tdate = date.fromisoformat(str(r.get("transaction_date") or "")[:10])
+        except Exception:
+            tdate = None
+
+        ttype = str(r.get("type", "") or "").upper().strip()
+        sym = str(r.get("related_symbol", "") or "").upper().strip()
+        amt = float(clean_number(r.get("amount", 0) or 0))
+        desc = str(r.get("description", "") or "")
+
+        if not sym or sym == "CASH":
+            continue
+
+        # Shorts: premium cashflows
+        if ttype in ("OPTION_PREMIUM", "OPTION_FEES"):
+            if pl_start_date is None or (tdate is not None and tdate >= pl_start_date):
+                short_real[sym] = short_real.get(sym, 0.0) + amt
+            continue
+
+        # Allocate dividends/interest/fees to the underlying ticker P/L (these affect portfolio performance)
+        if ttype in ("DIVIDEND", "INTEREST", "FEES"):
+            if sym and sym != "UNK":
+                if pl_start_date is None or (tdate is not None and tdate >= pl_start_date):
+                    stock_real[sym] = stock_real.get(sym, 0.0) + amt
+            continue
+
+        parsed = parse_trade_desc(desc)
+        if not parsed:
+            continue
+        action, qty, psym, price = parsed
+
+        is_leap = ("LEAP" in ttype) or ("LEAP" in desc.upper())
+
+        if not is_leap:
+            q = float(stock_qty.get(psym, 0.0) or 0.0)
+            c = float(stock_cost.get(psym, 0.0) or 0.0)
+
+            if action == "Buy":
+                stock_qty[psym] = q + qty
+                stock_cost[psym] = c + (qty * price)
+            else:  # Sell
+                if q <= 0:
+                    continue
+                avg = c / q if q != 0 else 0.0
+                pl = (price - avg) * qty
+                # Only count realized P/L if within selected period
+                if pl_start_date is None or (tdate is not None and tdate >= pl_start_date):
+                    stock_real[psym] = stock_real.get(psym, 0.0) + pl
+                q_new = q - qty
+                stock_qty[psym] = q_new
+                stock_cost[psym] = avg * q_new
+        else:
+            q = float(leap_qty.get(psym, 0.0) or 0.0)
+            c = float(leap_cost.get(psym, 0.0) or 0.0)
+
+            if action == "Buy":
+                leap_qty[psym] = q + qty
+                leap_cost[psym] = c + (qty * price)
+            else:
+                if q <= 0:
+                    continue
+                avg = c / q if q != 0 else 0.0
+                pl = (price - avg) * qty * 100.0
+                if pl_start_date is None or (tdate is not None and tdate >= pl_start_date):
+                    leap_real[psym] = leap_real.get(psym, 0.0) + pl
+                q_new = q - qty
+                leap_qty[psym] = q_new
+                leap_cost[psym] = avg * q_new
+
+    # Remove near-zero noise
+    stock_real = {k:v for k,v in stock_real.items() if abs(v) >= 0.005}
+    leap_real  = {k:v for k,v in leap_real.items() if abs(v) >= 0.005}
+    short_real = {k:v for k,v in short_real.items() if abs(v) >= 0.005}
+    return stock_real, leap_real, short_real
+
+
+# ---- Ledger grouping (ledger_page) --------------------------------------------
+
+_txg_re = re.compile(r"\bTXG:([A-Za-z0-9_\-]+)\b")
+
+def to_date(v):
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    s = str(v or "").strip()
+    if not s:
+        return None
+    s = s.split("T")[0].split(" ")[0]
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except Exception:
+            pass
+    return None
+
+def extract_txg(desc: str):
+    m = _txg_re.search(str(desc or ""))
+    return m.group(1) if m else None
+
+def txg_tags(descriptions: pd.Series) -> pd.Series:
+    """extract_txg over a column (NaN where a row has no TXG tag)."""
+    return descriptions.astype("string").str.extract(_txg_re, expand=False)
+
+def friendly_action_group(gdf: pd.DataFrame) -> str:
+    types = set([str(x).upper() for x in gdf.get("type", [])])
+    descs = " ".join([str(x or "") for x in gdf.get("description", [])]).upper()
+
+    if "ROLL" in descs:
+        return "Roll"
+    # Roll heuristic: OPTION_PREMIUM group with both Buy and Sell
+    if any("OPTION_PREMIUM" in t for t in types):
+        d = descs
+        if (" BUY " in d or d.startswith("BUY")) and (" SELL " in d or d.startswith("SELL")):
+            return "Roll"
+
+    if "ASSIGN" in descs or "ASSIGNED" in descs:
+        return "Assignment"
+    if any("OPTION_EXPIRE" in t for t in types) and any(t.startswith("TRADE_STOCK") or t.startswith("TRADE_") for t in types):
+        return "Assignment"
+
+    if any("DEPOSIT" in t for t in types):
+        return "Deposit"
+    if any("WITHDRAWAL" in t for t in types):
+        return "Withdrawal"
+    if any("DIVIDEND" in t for t in types):
+        return "Dividend"
+    if any("INTEREST" in t for t in types):
+        return "Interest"
+
+    # single-row fallback
+    if len(gdf) == 1:
+        t0 = str(gdf.iloc[0].get("type", "")).upper()
+        d0 = str(gdf.iloc[0].get("description", ""))
+        if t0.startswith("TRADE_"):
+            return "Trade"
+        if "OPTION_PREMIUM" in t0:
+            return "Option Trade"
+        if "OPTION_EXPIRE" in t0:
+            return "Expire Option"
+        return d0.split(" ")[0] if d0 else "Transaction"
+
+    return "Transaction"
+
+def friendly_action_step(row: dict) -> str:
+    t = str(row.get("type", "")).upper()
+    d = str(row.get("description", "")).upper()
+    if "OPTION_EXPIRE" in t or "EXPIRE" in d:
+        return "Expire Option"
+    if "OPTION_PREMIUM" in t:
+        if d.startswith("BUY"):
+            return "Buy to Close"
+        if d.startswith("SELL"):
+            return "Sell to Open"
+        return "Option Premium"
+    if t.startswith("TRADE_"):
+        if d.startswith("BUY"):
+            return "Buy Shares" if "STOCK" in t else "Buy Asset"
+        if d.startswith("SELL"):
+            return "Sell Shares" if "STOCK" in t else "Sell Asset"
+        return "Asset Trade"
+    return row.get("type") or "Step"
+
+def ledger_dates(values: pd.Series) -> pd.Series:
+    """to_date over a column, as datetime64 (NaT where to_date gives None)."""
+    s = values.astype("string").str.strip().str.split("T").str[0].str.split(" ").str[0]
+    out = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y"):
+        missing = out.isna()
+        if not missing.any():
+            break
+        out[missing] = pd.to_datetime(s[missing], format=fmt, errors="coerce")
+    return out
+
+def ledger_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` plus _d / id_str / txg / gkey columns, oldest first (TXG tag, else row id, is the group key)."""
+    df = df.copy()
+    df["_dt"] = ledger_dates(df["transaction_date"])
+    df["_d"] = pd.Series(df["_dt"].dt.date.to_numpy(dtype=object), index=df.index).where(df["_dt"].notna(), None)
+    df["id_str"] = df["id"].astype(str)
+    df["txg"] = txg_tags(df["description"]).astype(object).where(lambda t: t.notna(), None)
+    df["gkey"] = df["txg"].fillna(df["id_str"])
+    return df.sort_values(["_dt", "id_str"], ascending=[True, True]).drop(columns="_dt")
+
+def _group_actions(g: pd.DataFrame) -> np.ndarray:
+    """friendly_action_group for every group, from the per-group aggregates of ledger_summary()."""
+    single = g["rows"] == 1
+    first_word = g["desc0"].str.split(" ").str[0].where(g["desc0"] != "", "Transaction")
+    return np.select(
+        [g["roll"], g["premium"] & g["buy"] & g["sell"],
+         g["assign"], g["expire"] & g["trade"],
+         g["deposit"], g["withdrawal"], g["dividend"], g["interest"],
+         single & g["type0"].str.startswith("TRADE_"),
+         single & g["type0"].str.contains("OPTION_PREMIUM", regex=False),
+         single & g["type0"].str.contains("OPTION_EXPIRE", regex=False),
+         single],
+        ["Roll", "Roll", "Assignment", "Assignment", "Deposit", "Withdrawal", "Dividend", "Interest",
+         "Trade", "Option Trade", "Expire Option", first_word],
+        default="Transaction",
+    ).astype(object)
+
+def ledger_summary(df: pd.DataFrame, opening: float = 0.0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """One row per ledger group, oldest first, and the grouped rows (ledger_rows(df)).
+
+    Summary columns: gkey, date, symbol, action, amount, running, rows.
+    `opening` is the balance of the rows that aren't in `df` and come before
+    it (see ledger_cache.window); the running balance starts from it. Dates,
+    TXG tags and the per-row inputs of the action label are column
+    operations, and everything per group comes out of one groupby.
+    """
+    rows = ledger_rows(df)
+    types = rows["type"].astype(object).map(str).str.upper()
+    descs = rows["description"].fillna("").astype(str).str.upper()
+    first = ~rows["gkey"].duplicated().to_numpy()
+    last = ~rows["gkey"].duplicated(keep="last").to_numpy()
+
+    def word(w):
+        # `w` as a word of the group's descriptions joined with " " (as friendly_action_group sees them)
+        return (descs.str.contains(f" {w} ", regex=False)
+                | (first & descs.str.startswith(w))
+                | (~first & descs.str.startswith(f"{w} "))
+                | (~first & ~last & descs.eq(w))
+                | (~last & descs.str.endswith(f" {w}")))
+
+    parts = pd.DataFrame({
+        "gkey": rows["gkey"],
+        "_dt": pd.to_datetime(rows["_d"]),
+        "symbol": rows["related_symbol"] if "related_symbol" in rows else None,
+        "amount": pd.to_numeric(rows["amount"], errors="coerce").fillna(0.0),
+        "premium": types.str.contains("OPTION_PREMIUM", regex=False),
+        "expire": types.str.contains("OPTION_EXPIRE", regex=False),
+        "trade": types.str.startswith("TRADE_"),
+        "deposit": types.str.contains("DEPOSIT", regex=False),
+        "withdrawal": types.str.contains("WITHDRAWAL", regex=False),
+        "dividend": types.str.contains("DIVIDEND", regex=False),
+        "interest": types.str.contains("INTEREST", regex=False),
+        "roll": descs.str.contains("ROLL", regex=False),
+        "assign": descs.str.contains("ASSIGN", regex=False),
+        "buy": word("BUY"),
+        "sell": word("SELL"),
+        "desc0": rows["description"].astype(object).map(str),
+        "type0": types,
+    })
+    g = parts.groupby("gkey", sort=False).agg(
+        _dt=("_dt", "min"), symbol=("symbol", "first"), amount=("amount", "sum"), rows=("gkey", "size"),
+        premium=("premium", "any"), expire=("expire", "any"), trade=("trade", "any"),
+        deposit=("deposit", "any"), withdrawal=("withdrawal", "any"), dividend=("dividend", "any"),
+        interest=("interest", "any"), roll=("roll", "any"), assign=("assign", "any"), buy=("buy", "any"),
+        sell=("sell", "any"), desc0=("desc0", "first"), type0=("type0", "first"),
+    )
+    summary = pd.DataFrame({
+        "date": pd.Series(g["_dt"].dt.date.to_numpy(dtype=object), index=g.index).where(g["_dt"].notna(), None),
+        "symbol": g["symbol"].fillna("").astype(str),
+        "action": _group_actions(g),
+        "amount": g["amount"],
+        "running": float(opening or 0.0) + g["amount"].cumsum(),
+        "rows": g["rows"],
+    })
+    return summary.rename_axis("gkey").reset_index(), rows
+
+def ledger_groups(df: pd.DataFrame, opening: float = 0.0) -> list[dict]:
+    """ledger_summary() as a list of dicts, each with its rows as gdf."""
+    summary, rows = ledger_summary(df, opening)
+    gdfs = dict(tuple(rows.groupby("gkey", sort=False)))
+    return [{**g, "gdf": gdfs[g["gkey"]]} for g in summary.to_dict("records")]
+
+
+# ---- Unified import (import_page) ---------------------------------------------
+
+UNIFIED_RENAME_MAP = {
+    'quantity': 'qty', 'shares': 'qty', 'contracts': 'qty',
+    'symbol': 'ticker', 'stock': 'ticker',
+    'cost': 'price', 'premium': 'price', 'amount': 'price',
+    'commission': 'fees', 'comm': 'fees',
+    'expiration_date': 'expiration', 'expiry': 'expiration', 'exp': 'expiration',
+    'strike_price': 'strike',
+    'type': 'category', 'class': 'category',  # Map 'Type' to Category
+    'option_type': 'opt_type', 'option type': 'opt_type', 'opt_type': 'opt_type',
+    'right': 'opt_type', 'put/call': 'opt_type', 'call/put': 'opt_type'  # Call/Put
+}
+
+def get_fees(row):
+    for k in ['commission', 'comm', 'fee', 'fees']:
+        if k in row: return abs(clean_number(row[k]))
+    return 0.0
+
+def normalize_trade_action(val, default="Buy"):
+    """Map messy broker actions to 'Buy' or 'Sell'.
+    Handles: BUY/SELL, BTO/BTC/STO/STC, 'BUY TO OPEN/CLOSE', 'SELL TO OPEN/CLOSE'.
+    """
+    if val is None or (isinstance(val, float) and pd.isna(val)):
+        return default
+    s = str(val).strip().upper()
+
+    # Common option abbreviations
+    if "STO" in s or "SELL TO OPEN" in s:
+        return "Sell"
+    if "BTC" in s or "BUY TO CLOSE" in s:
+        return "Buy"
+    if "BTO" in s or "BUY TO OPEN" in s:
+        return "Buy"
+    if "STC" in s or "SELL TO CLOSE" in s:
+        return "Sell"
+
+    # Generic
+    if "SELL" in s:
+        return "Sell"
+    if "BUY" in s:
+        return "Buy"
+    return default
+
+def normalize_symbol(val):
+    """Normalize symbols like 'SPDR Gold (ARCX:GLD)' or 'ARCX:GLD' to 'GLD'."""
+    if val is None:
+        return ""
+    s = str(val).strip()
+    # If 'Name (ARCX:GLD)' take inside parentheses
+    m = re.search(r"\((.*?)\)", s)
+    if m:
+        s = m.group(1)
+    # If 'ARCX:GLD' take part after ':'
+    if ":" in s:
+        s = s.split(":")[-1]
+    return s.strip().upper()
+
+def normalize_expiration(val):
+    """Normalize expiration input to YYYY-MM-DD string."""
+    if val is None or (isinstance(val, float) and pd.isna(val)) or str(val).strip() == "":
+        return ""
+    try:
+        dt = pd.to_datetime(val, errors="coerce")
+        if pd.isna(dt):
+            return str(val).split("T")[0]
+        return dt.date().isoformat()
+    except Exception:
+        return str(val).split("T")[0]
+
+def plan_unified_import(df: pd.DataFrame):
+    """Normalize a Unified Import CSV into ordered write steps.
+
+    Columns are renamed to the canonical set, rows sorted by date (file order
+    breaks ties so same-day Buy/Sell keep their order) and each row routed to
+    STOCK / LEAP / SHORT / CASH. Yields (row_index, step, error) where step is
+    a dict for the page to execute, or None with the parse error.
+    """
+    df = df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+    # Be careful not to overwrite 'type' if it refers to Call/Put vs Asset Class
+    # Heuristic: If 'category' column exists, use it. If not, look for 'class'.
+    df.rename(columns=UNIFIED_RENAME_MAP, inplace=True)
+
+    # Preserve file row order for same-day trades (prevents Buy being processed before Sell)
+    df['_row_order'] = range(len(df))
+    df['date_parsed'] = pd.to_datetime(df['date'], errors='coerce')
+    df.sort_values(by=['date_parsed', '_row_order'], ascending=[True, True], inplace=True)
+
+    for idx, r in df.iterrows():
+        if pd.isna(r['date_parsed']):
+            yield idx, None, None
+            continue
+        try:
+            # Extract Common Fields
+            cat = str(r.get('category', '')).upper().strip()
+            # Fallback if user put "Call" in the Category column for a LEAP
+            if 'LEAP' in cat: cat_mode = 'LEAP'
+            elif 'SHORT' in cat or 'OPTION' in cat: cat_mode = 'SHORT'
+            elif 'STOCK' in cat: cat_mode = 'STOCK'
+            elif 'CASH' in cat or 'FUND' in cat: cat_mode = 'CASH'
+            else: cat_mode = 'STOCK' # Default
+
+            sym = normalize_symbol(r.get('ticker',''))
+            qty = int(abs(clean_number(r.get('qty', 0))))
+
+            # Price cleaning
+            try: raw_p = str(r.get('price', 0)).replace('$','').replace(',','').strip(); price = abs(float(raw_p))
+            except: price = 0.0
+
+            fees = get_fees(r)
+            act = normalize_trade_action(r.get('action', 'Buy'), default='Buy')
+
+            # Specific Fields
+            opt_type = str(r.get('opt_type', 'CALL')).strip().upper()  # Call/Put
+            strike = float(abs(clean_number(r.get('strike', 0))))
+            exp = normalize_expiration(r.get('expiration'))
+
+            step = {"mode": cat_mode, "symbol": sym, "qty": qty, "price": price, "fees": fees, "action": act,
+                    "date": r['date_parsed'].date(), "timestamp": r['date_parsed'].isoformat(),
+                    "strike": strike, "expiration": exp, "opt_type": opt_type}
+            if cat_mode == 'LEAP':
+                step["asset_type"] = f"LEAP_{opt_type}" # LEAP_CALL or LEAP_PUT
+            elif cat_mode == 'SHORT':
+                # Default short options to PUT if undefined, but user should specify
+                if opt_type not in ['CALL', 'PUT']: step["opt_type"] = 'PUT'
+            elif cat_mode == 'CASH':
+                # Determine Type
+                raw_act = str(r.get('action','')).upper()
+                db_type = "DEPOSIT"
+                mult = 1
+
+                if any(x in raw_act for x in ["WITHDRAW", "DEBIT"]): db_type = "WITHDRAWAL"; mult = -1
+                elif "DIVIDEND" in raw_act: db_type = "DIVIDEND"; mult = 1
+                elif "INTEREST" in raw_act: db_type = "INTEREST"; mult = 1
+                elif "FEE" in raw_act: db_type = "FEES"; mult = -1
+                step.update(db_type=db_type, amount=price * mult, raw_action=raw_act)  # 'Price' holds the cash amount
+            yield idx, step, None
+        except Exception as e:
+            yield idx, None, e
+
+
+# ---- Collateral availability (trade_entry_page) -------------------------------
+
+def collateral_options(holdings_data: list[dict], locked_map: dict, total_open_calls: int):
+    """Covered-call collateral still free per holding.
+
+    `locked_map` is {asset_id: contracts} of linked open calls; open calls with
+    no link are charged to shares first, then LEAPs. Returns (valid_opts,
+    coll_found) where valid_opts maps a label to {"id", "limit"}.
+    """
+    linked_total = sum(int(locked_map.get(str(h.get('id')), 0) or 0) for h in holdings_data)
+    unlinked_calls = max(0, int(total_open_calls) - int(linked_total))
+
+    # Allocate unlinked short calls to shares first, then LEAPs (conservative availability)
+    stock_holdings = [h for h in holdings_data if "STOCK" in str(h.get('type','')).upper()]
+    leap_holdings  = [h for h in holdings_data if ("LONG_" in str(h.get('type','')).upper()) or ("LEAP_" in str(h.get('type','')).upper())]
+    unlinked_used = {}
+
+    remaining = unlinked_calls
+    for h in stock_holdings:
+        hid = str(h.get('id'))
+        qty_h = float(h.get('quantity', 0) or 0)
+        max_contracts = int(qty_h // 100)
+        take = min(remaining, max_contracts)
+        if take > 0:
+            unlinked_used[hid] = unlinked_used.get(hid, 0) + take
+            remaining -= take
+        if remaining <= 0:
+            break
+
+    for h in leap_holdings:
+        if remaining <= 0:
+            break
+        hid = str(h.get('id'))
+        qty_h = int(float(h.get('quantity', 0) or 0))
+        take = min(remaining, qty_h)
+        if take > 0:
+            unlinked_used[hid] = unlinked_used.get(hid, 0) + take
+            remaining -= take
+
+    valid_opts = {"None (Unsecured)": {"id": None, "limit": float('inf')}}
+    coll_found = False
+    for h in holdings_data:
+        h_type = str(h.get('type', '')).upper()
+        h_qty = float(h.get('quantity', 0) or 0)
+        h_id = h.get('id')
+        linked_used = int(locked_map.get(str(h_id), 0) or 0)
+        inferred_used = int(unlinked_used.get(str(h_id), 0) or 0)
+        used_total = linked_used + inferred_used
+        if "STOCK" in h_type:
+            avail_shares = int(max(0, int(h_qty) - (used_total * 100)))
+            poss = int(avail_shares // 100)
+            if poss > 0:
+                coll_found = True
+                valid_opts[f"Shares: {avail_shares} avail"] = {"id": h_id, "limit": poss}
+        elif "LONG_" in h_type or "LEAP_" in h_type:
+            avail = int(max(0, int(h_qty) - used_total))
+            if avail > 0:
+                coll_found = True
+                valid_opts[f"LEAP ${float(h.get('strike_price',0)):.2f}: {avail} avail"] = {"id": h_id, "limit": avail}
+    return valid_opts, coll_found
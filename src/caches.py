@@ -0,0 +1,149 @@
+"""Namespaced st.cache_data caches with targeted invalidation.
+
+    QUOTES     live stock prices (shared by everyone; "Refresh Prices" clears this)
+    CHAINS     Yahoo option chains (shared; refreshed with quotes on LEAP pricing pages)
+    FX         USD/CAD spot
+    PORTFOLIO  per-account reads (positions, cash, snapshots); keyed on the
+               account's data version, so a write to X invalidates only X
+
+Decorate instead of using st.cache_data directly:
+
+    @caches.cached(caches.QUOTES, ttl=60)
+    def get_live_stock_price(symbol): ...
+
+    @caches.cached(caches.PORTFOLIO, account="user_id", ttl=600,
+                   fingerprint=lambda uid: fingerprints.probe(supabase, ("portfolio_history",), uid))
+    def get_portfolio_history(user_id): ...
+
+    @caches.invalidates(account="user_id")
+    def log_transaction(user_id, ...): ...
+
+    caches.invalidate(caches.QUOTES)        # every cached quote
+    caches.invalidate_account(uid)          # just uid's portfolio entries
+
+Every account has a monotonic data version (per process). Account-scoped
+functions get it as an extra cache-key argument, and write helpers bump it
+when they finish (invalidates / invalidate_account). Writes from other
+processes or sessions are caught by `fingerprint`: a callable returning the
+account's table fingerprints (src/fingerprints.py), which is part of the key
+too, so a changed row count / max(updated_at) forces a reload. Reruns triggered by
+widgets reuse the cached reads until a real write happens; the account's old
+entries are never read again and age out by ttl / max_entries, while every
+other account keeps its cache. Symbol metadata is persisted in public.symbol_metadata
+(src/symbols.py) and is never cleared from here.
+"""
+import hashlib
+import inspect
+import threading
+from functools import wraps
+from typing import Callable
+
+import streamlit as st
+
+from . import fingerprints
+
+QUOTES = "quotes"
+CHAINS = "chains"
+FX = "fx"
+PORTFOLIO = "portfolio"
+NAMESPACES = (QUOTES, CHAINS, FX, PORTFOLIO)
+
+_lock = threading.Lock()
+# namespace -> {qualified name: cached function}; app.py re-decorates on every rerun
+_registry: dict[str, dict[str, object]] = {ns: {} for ns in NAMESPACES}
+_generations: dict[tuple[str, str], int] = {}
+
+
+def generation(namespace: str, account) -> int:
+    """The account's current data version in `namespace`."""
+    with _lock:
+        return _generations.get((namespace, str(account)), 0)
+
+
+def _account_arg(fn, account: str):
+    params = list(inspect.signature(fn).parameters)
+    if account not in params:
+        raise TypeError(f"{fn.__qualname__} has no argument {account!r}")
+    pos = params.index(account)
+    return lambda args, kwargs: kwargs[account] if account in kwargs else (args[pos] if pos < len(args) else None)
+
+
+def cached(namespace: str, *, account: str | None = None, fingerprint: Callable | None = None, **cache_kwargs):
+    """st.cache_data(**cache_kwargs) registered under `namespace`.
+
+    account names the argument holding the account id for per-account
+    namespaces; those entries are keyed on the account's generation too, and
+    on fingerprint(account) when given (None from it means "don't trust the
+    cache": the call goes straight to the function).
+    """
+    if namespace not in _registry:
+        raise ValueError(f"unknown cache namespace {namespace!r}")
+
+    def deco(fn):
+        if account is None:
+            wrapper = st.cache_data(**cache_kwargs)(fn)
+        else:
+            get_account = _account_arg(fn, account)
+            # st.cache_data keys on module, qualname and source; the source of
+            # `keyed` is shared, so fold fn's bytecode into the key instead.
+            code = hashlib.sha1(fn.__code__.co_code).hexdigest()[:12]
+
+            def keyed(generation_key, *args, **kwargs):
+                return fn(*args, **kwargs)
+
+            keyed.__module__, keyed.__name__, keyed.__qualname__ = fn.__module__, fn.__name__, fn.__qualname__
+            inner = st.cache_data(**cache_kwargs)(keyed)
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                acct = get_account(args, kwargs)
+                fp = fingerprint(acct) if fingerprint is not None else ()
+                if fp is None:
+                    return fn(*args, **kwargs)
+                return inner((code, generation(namespace, acct), fp), *args, **kwargs)
+
+            wrapper.clear = inner.clear
+        with _lock:
+            _registry[namespace][f"{fn.__module__}.{fn.__qualname__}"] = wrapper
+        return wrapper
+
+    return deco
+
+
+def invalidate(*namespaces: str):
+    """Drop every entry in the given namespaces (all accounts for PORTFOLIO)."""
+    for ns in namespaces:
+        with _lock:
+            funcs = list(_registry[ns].values())
+        for f in funcs:
+            try:
+                f.clear()
+            except Exception:
+                pass
+
+
+def invalidate_account(account, *namespaces: str):
+    """Forget `account`'s entries in the per-account namespaces (default: PORTFOLIO)."""
+    with _lock:
+        for ns in namespaces or (PORTFOLIO,):
+            key = (ns, str(account))
+            _generations[key] = _generations.get(key, 0) + 1
+    fingerprints.forget(account)
+
+
+def invalidates(account: str, *namespaces: str):
+    """Decorator for write helpers: bump the account's version when fn finishes (also on error)."""
+
+    def deco(fn):
+        get_account = _account_arg(fn, account)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                invalidate_account(get_account(args, kwargs), *namespaces)
+
+        return wrapper
+
+    return deco
@@ -14,3 +14,63 @@ def get_secret(key: str, default: str = "") -> str:
 
 SUPABASE_URL = get_secret("SUPABASE_URL", "")
 SUPABASE_KEY = get_secret("SUPABASE_KEY", "")
+
+# Rows per page for paginated reads; keep <= the PostgREST max-rows setting (default 1000).
+SUPABASE_PAGE_SIZE = int(get_secret("SUPABASE_PAGE_SIZE", "1000") or 1000)
+
+# Max concurrent page requests for fetch_parallel (bounded to stay polite with PostgREST).
+SUPABASE_FETCH_WORKERS = int(get_secret("SUPABASE_FETCH_WORKERS", "6") or 6)
+
+# "supabase" (default) or "fake" for the in-process SQLite stand-in in src/fakedb.py.
+SUPABASE_BACKEND = (get_secret("SUPABASE_BACKEND", "supabase") or "supabase").strip().lower()
+FAKE_SUPABASE_DB = get_secret("FAKE_SUPABASE_DB", ":memory:") or ":memory:"
+FAKE_SUPABASE_LATENCY_MS = float(get_secret("FAKE_SUPABASE_LATENCY_MS", "0") or 0)
+
+# Market data (src/marketdata.py): "live" (yfinance), "record" (yfinance + save fixtures) or "replay" (fixtures only).
+MARKETDATA_MODE = (get_secret("MARKETDATA_MODE", "live") or "live").strip().lower()
+MARKETDATA_DIR = get_secret("MARKETDATA_DIR", "fixtures/marketdata") or "fixtures/marketdata"
+MARKETDATA_LATENCY_MS = float(get_secret("MARKETDATA_LATENCY_MS", "0") or 0)
+# Failed symbol lookups are remembered this long (s); after MARKETDATA_BREAKER_FAILURES consecutive
+# upstream errors Yahoo is skipped for MARKETDATA_BREAKER_COOLDOWN seconds and last-known values are served.
+MARKETDATA_NEGATIVE_TTL = float(get_secret("MARKETDATA_NEGATIVE_TTL", "1800") or 1800)
+# Cap on remembered failures and on last-known values kept for breaker fallback (entries each).
+MARKETDATA_STATE_MAX = int(get_secret("MARKETDATA_STATE_MAX", "2048") or 2048)
+MARKETDATA_BREAKER_FAILURES = int(get_secret("MARKETDATA_BREAKER_FAILURES", "5") or 5)
+MARKETDATA_BREAKER_COOLDOWN = float(get_secret("MARKETDATA_BREAKER_COOLDOWN", "120") or 120)
+
+# Yahoo scheduler (src/scheduler.py): token bucket, in-flight cap, retries with jittered exponential backoff.
+YAHOO_RATE_PER_SEC = float(get_secret("YAHOO_RATE_PER_SEC", "2") or 2)
+YAHOO_BURST = float(get_secret("YAHOO_BURST", "10") or 10)
+YAHOO_INTERACTIVE_RESERVE = float(get_secret("YAHOO_INTERACTIVE_RESERVE", "3") or 3)
+YAHOO_MAX_CONCURRENCY = int(get_secret("YAHOO_MAX_CONCURRENCY", "4") or 4)
+YAHOO_MAX_RETRIES = int(get_secret("YAHOO_MAX_RETRIES", "3") or 3)
+YAHOO_BACKOFF_BASE = float(get_secret("YAHOO_BACKOFF_BASE", "0.5") or 0.5)
+YAHOO_BACKOFF_MAX = float(get_secret("YAHOO_BACKOFF_MAX", "8") or 8)
+
+# public.symbol_metadata rows older than this are refreshed in the background (src/symbols.py).
+SYMBOL_METADATA_TTL_DAYS = float(get_secret("SYMBOL_METADATA_TTL_DAYS", "30") or 30)
+# Symbols whose background fill failed are left alone this long before the next try.
+SYMBOL_FILL_RETRY_SECONDS = float(get_secret("SYMBOL_FILL_RETRY_SECONDS", "900") or 900)
+
+# Per-account table fingerprint probes (src/fingerprints.py) are reused for this many seconds.
+FINGERPRINT_TTL = float(get_secret("FINGERPRINT_TTL", "2") or 2)
+
+# Daily FX history (src/fx.py): on-disk cache, how often it's topped up (s), and the first-fill period.
+FX_CACHE_DIR = get_secret("FX_CACHE_DIR", "cache/fx") or "cache/fx"
+FX_REFRESH_SECONDS = float(get_secret("FX_REFRESH_SECONDS", "3600") or 3600)
+FX_HISTORY_PERIOD = get_secret("FX_HISTORY_PERIOD", "10y") or "10y"
+
+# Local Parquet copy of each account's transactions (src/ledger_cache.py); "off" disables.
+# The files hold every account's full ledger unencrypted on the app host, so keep the
+# directory private to the app user.
+LEDGER_CACHE_DIR = get_secret("LEDGER_CACHE_DIR", "cache/ledger") or "cache/ledger"
+
+# Timing spans (src/telemetry.py): opt-in JSONL file, e.g. logs/telemetry.jsonl (empty / "off" = disabled),
+# rotated at TELEMETRY_MAX_MB keeping TELEMETRY_BACKUPS files.
+TELEMETRY_FILE = get_secret("TELEMETRY_FILE", "") or ""
+TELEMETRY_MAX_MB = float(get_secret("TELEMETRY_MAX_MB", "20") or 20)
+TELEMETRY_BACKUPS = int(get_secret("TELEMETRY_BACKUPS", "5") or 5)
+
+# ?profile=1 / the Diagnostics profiling toggle (src/perf.py): cProfile + tracemalloc slow every
+# session on the server while a capture runs, so operators opt in (e.g. "1" on a staging host).
+PERF_PROFILING = (get_secret("PERF_PROFILING", "") or "").strip().lower() in ("1", "true", "on", "yes")
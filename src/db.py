@@ -1,10 +1,15 @@
 import streamlit as st
 from supabase import create_client
 
-from .config import SUPABASE_URL, SUPABASE_KEY
+from .config import (
+    FAKE_SUPABASE_DB, FAKE_SUPABASE_LATENCY_MS, SUPABASE_BACKEND, SUPABASE_KEY, SUPABASE_URL,
+)
 
 @st.cache_resource
 def init_supabase():
+    if SUPABASE_BACKEND == "fake":
+        from .fakedb import create_fake_client
+        return create_fake_client(FAKE_SUPABASE_DB, FAKE_SUPABASE_LATENCY_MS)
     if not SUPABASE_URL or not SUPABASE_KEY:
         st.error("Missing Database Credentials! Please configure .streamlit/secrets.toml")
         st.stop()
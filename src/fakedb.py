@@ -0,0 +1,437 @@
+"""In-process stand-in for the Supabase client, backed by SQLite.
+
+Implements the query-builder subset app.py uses so pages can render (and be
+timed) without a Supabase project. Every execute() sleeps for a configurable
+latency to mimic a network round trip, and is counted per (table, operation).
+
+Select it with SUPABASE_BACKEND=fake; FAKE_SUPABASE_DB points at a SQLite file
+(default: in-memory, shared by every session in the process) and FAKE_SUPABASE_LATENCY_MS sets the delay.
+"""
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import Any
+
+from . import schema
+
+_SQL_TYPES = {int: "INTEGER", float: "REAL", bool: "INTEGER", str: "TEXT", date: "TEXT", datetime: "TEXT"}
+
+# Tables outside src/schema.py that the app touches.
+_EXTRA_TABLES = [
+    schema.Table("user_preferences", {"id": int, "user_id": str, "display_name": str, "share_stats": bool}),
+    schema.Table("user_metrics", {
+        "id": int, "user_id": str, "as_of_date": date, "updated_at": datetime,
+        "wtd_pct": float, "mtd_pct": float, "ytd_pct": float, "w52_pct": float,
+    }),
+    schema.Table("account_access", {
+        "id": int, "owner_user_id": str, "owner_email": str, "delegate_email": str,
+        "delegate_user_id": str, "role": str, "status": str, "created_at": datetime,
+    }),
+]
+TABLES = [schema.TRANSACTIONS, schema.ASSETS, schema.OPTIONS, schema.PORTFOLIO_HISTORY, schema.SYMBOL_METADATA,
+          *_EXTRA_TABLES]
+
+
+class FakeAPIError(Exception):
+    """Raised where PostgREST would answer with a 4xx."""
+
+
+def _q(ident: str) -> str:
+    return '"' + ident.replace('"', '""') + '"'
+
+
+def _value(v):
+    if isinstance(v, bool):
+        return int(v)
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, date):
+        return v.isoformat()
+    return v
+
+
+def _like_to_glob(pattern: str) -> str:
+    """PostgREST like is case-sensitive (and accepts * for %); SQLite GLOB matches that."""
+    return re.sub(r"[%*]", "*", str(pattern)).replace("_", "?")
+
+
+class FakeBackend:
+    """SQLite storage shared by every FakeClient pointing at the same path."""
+
+    def __init__(self, path: str = ":memory:", latency_ms: float = 0.0):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.latency_ms = float(latency_ms or 0.0)
+        self.calls: Counter = Counter()
+        self.timings: list[tuple[str, str, float]] = []
+        self._columns: dict[str, dict[str, str]] = {}
+        for t in TABLES:
+            self.ensure_table(t.name, {c: _SQL_TYPES.get(tp, "") for c, tp in t.columns.items()})
+
+    # ---- schema -------------------------------------------------------------
+    def ensure_table(self, name: str, columns: dict[str, str]):
+        with self.lock:
+            if name not in self._columns:
+                self.conn.execute(f"create table if not exists {_q(name)} (id integer primary key autoincrement)")
+                self._columns[name] = {r["name"]: r["type"] for r in self.conn.execute(f"pragma table_info({_q(name)})")}
+            have = self._columns[name]
+            for col, typ in columns.items():
+                if col not in have:
+                    self.conn.execute(f"alter table {_q(name)} add column {_q(col)} {typ}")
+                    have[col] = typ
+
+    def columns(self, table: str) -> dict[str, str]:
+        if table not in self._columns:
+            raise FakeAPIError(f'relation "public.{table}" does not exist')
+        return self._columns[table]
+
+    # ---- accounting ---------------------------------------------------------
+    def reset_calls(self):
+        with self.lock:
+            self.calls.clear()
+            self.timings.clear()
+
+    def _record(self, table: str, op: str, started: float):
+        with self.lock:
+            self.calls[(table, op)] += 1
+            self.timings.append((table, op, time.perf_counter() - started))
+
+    def run(self, table: str, op: str, fn):
+        started = time.perf_counter()
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        try:
+            with self.lock:
+                out = fn()
+                self.conn.commit()
+                return out
+        finally:
+            self._record(table, op, started)
+
+
+class _Query:
+    _OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+    def __init__(self, backend: FakeBackend, table: str):
+        self.backend = backend
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.count = None
+        self.head = False
+        self.payload: Any = None
+        self.on_conflict = None
+        self.where: list[tuple[str, list]] = []
+        self.orders: list[str] = []
+        self.limit_n = None
+        self.offset_n = None
+        self._negate = False
+
+    # ---- verbs --------------------------------------------------------------
+    def select(self, *columns, count=None, head=None):
+        self.columns = ",".join(columns) if columns else "*"
+        self.count = str(getattr(count, "value", count)) if count else None
+        self.head = bool(head)
+        return self
+
+    def insert(self, payload, **_):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = "", **_):
+        self.op, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        return self
+
+    def update(self, payload, **_):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self, **_):
+        self.op = "delete"
+        return self
+
+    # ---- filters ------------------------------------------------------------
+    def _add(self, sql: str, params: list):
+        if self._negate:
+            sql, self._negate = f"not ({sql})", False
+        self.where.append((sql, params))
+        return self
+
+    def _cmp(self, col, op, value):
+        if op in self._OPS:
+            return f"{_q(col)} {self._OPS[op]} ?", [_value(value)]
+        if op == "like":
+            return f"{_q(col)} glob ?", [_like_to_glob(value)]
+        if op == "ilike":
+            return f"{_q(col)} like ?", [str(value).replace("*", "%")]
+        if op == "is":
+            v = str(value).lower()
+            if v == "null":
+                return f"{_q(col)} is null", []
+            return f"{_q(col)} is ?", [1 if v == "true" else 0]
+        if op == "in":
+            vals = list(value)
+            return f"{_q(col)} in ({','.join('?' * len(vals)) or 'null'})", [_value(v) for v in vals]
+        raise FakeAPIError(f"unsupported operator {op!r}")
+
+    def eq(self, col, value): return self._add(*self._cmp(col, "eq", value))
+    def neq(self, col, value): return self._add(*self._cmp(col, "neq", value))
+    def gt(self, col, value): return self._add(*self._cmp(col, "gt", value))
+    def gte(self, col, value): return self._add(*self._cmp(col, "gte", value))
+    def lt(self, col, value): return self._add(*self._cmp(col, "lt", value))
+    def lte(self, col, value): return self._add(*self._cmp(col, "lte", value))
+    def like(self, col, pattern): return self._add(*self._cmp(col, "like", pattern))
+    def ilike(self, col, pattern): return self._add(*self._cmp(col, "ilike", pattern))
+    def is_(self, col, value): return self._add(*self._cmp(col, "is", value))
+    def in_(self, col, values): return self._add(*self._cmp(col, "in", values))
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def or_(self, filters: str, **_):
+        parts, params = [], []
+        for term in [t for t in re.split(r",(?![^()]*\))", filters) if t.strip()]:
+            col, op, val = term.strip().split(".", 2)
+            if op == "in":
+                val = [v.strip().strip('"') for v in val.strip("()").split(",")]
+            else:
+                val = val.strip('"')
+            sql, p = self._cmp(col, op, val)
+            parts.append(sql)
+            params.extend(p)
+        return self._add("(" + " or ".join(parts) + ")", params)
+
+    # ---- modifiers ----------------------------------------------------------
+    def order(self, col, desc: bool = False, **_):
+        self.orders.append(f"{_q(col)} {'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, n, **_):
+        self.limit_n = int(n)
+        return self
+
+    def range(self, start, end, **_):
+        self.offset_n = int(start)
+        self.limit_n = int(end) - int(start) + 1
+        return self
+
+    # ---- execution ----------------------------------------------------------
+    def _where_sql(self):
+        if not self.where:
+            return "", []
+        params = [p for _, ps in self.where for p in ps]
+        return " where " + " and ".join(sql for sql, _ in self.where), params
+
+    def _select_cols(self):
+        have = self.backend.columns(self.table)
+        if self.columns.strip() == "*":
+            return list(have)
+        cols = [c.strip() for c in self.columns.split(",") if c.strip()]
+        missing = [c for c in cols if c not in have]
+        if missing:
+            raise FakeAPIError(f"column {self.table}.{missing[0]} does not exist")
+        return cols
+
+    def _do_select(self):
+        conn = self.backend.conn
+        cols = self._select_cols()
+        where, params = self._where_sql()
+        count = None
+        if self.count:
+            count = conn.execute(f"select count(*) from {_q(self.table)}{where}", params).fetchone()[0]
+        if self.head:
+            return [], count
+        sql = f"select {', '.join(_q(c) for c in cols)} from {_q(self.table)}{where}"
+        if self.orders:
+            sql += " order by " + ", ".join(self.orders)
+        if self.limit_n is not None or self.offset_n is not None:
+            sql += f" limit {self.limit_n if self.limit_n is not None else -1} offset {self.offset_n or 0}"
+        return [dict(r) for r in conn.execute(sql, params)], count
+
+    def _rows(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        rows = [{k: _value(v) for k, v in (r or {}).items()} for r in rows]
+        if "updated_at" in self.backend.columns(self.table):
+            # what the set_updated_at trigger / column default do in Postgres
+            now = datetime.now().isoformat()
+            for r in rows:
+                r["updated_at"] = now
+        return rows
+
+    def _insert_rows(self, rows):
+        conn = self.backend.conn
+        out = []
+        for r in rows:
+            self.backend.ensure_table(self.table, {k: "" for k in r})
+            if r:
+                cols = list(r)
+                cur = conn.execute(
+                    f"insert into {_q(self.table)} ({', '.join(_q(c) for c in cols)}) values ({', '.join('?' * len(cols))})",
+                    [r[c] for c in cols],
+                )
+            else:
+                cur = conn.execute(f"insert into {_q(self.table)} default values")
+            out.append(dict(conn.execute(f"select * from {_q(self.table)} where id = ?", (cur.lastrowid,)).fetchone()))
+        return out
+
+    def _do_write(self):
+        conn = self.backend.conn
+        self.backend.columns(self.table)
+        where, params = self._where_sql()
+        if self.op == "insert":
+            return self._insert_rows(self._rows()), None
+        if self.op == "upsert":
+            keys = [k.strip() for k in (self.on_conflict or "id").split(",") if k.strip()]
+            out = []
+            for r in self._rows():
+                cond = " and ".join(f"{_q(k)} = ?" for k in keys)
+                hit = conn.execute(f"select id from {_q(self.table)} where {cond}", [r.get(k) for k in keys]).fetchone()
+                if hit is None:
+                    out.extend(self._insert_rows([r]))
+                    continue
+                self.backend.ensure_table(self.table, {k: "" for k in r})
+                sets = ", ".join(f"{_q(k)} = ?" for k in r)
+                conn.execute(f"update {_q(self.table)} set {sets} where id = ?", [*r.values(), hit["id"]])
+                out.append(dict(conn.execute(f"select * from {_q(self.table)} where id = ?", (hit["id"],)).fetchone()))
+            return out, None
+        ids = [r["id"] for r in conn.execute(f"select id from {_q(self.table)}{where}", params)]
+        if not ids:
+            return [], None
+        marks = ",".join("?" * len(ids))
+        if self.op == "update":
+            payload = self._rows()[0]
+            self.backend.ensure_table(self.table, {k: "" for k in payload})
+            if payload:
+                sets = ", ".join(f"{_q(k)} = ?" for k in payload)
+                conn.execute(f"update {_q(self.table)} set {sets} where id in ({marks})", [*payload.values(), *ids])
+            return [dict(r) for r in conn.execute(f"select * from {_q(self.table)} where id in ({marks})", ids)], None
+        rows = [dict(r) for r in conn.execute(f"select * from {_q(self.table)} where id in ({marks})", ids)]
+        conn.execute(f"delete from {_q(self.table)} where id in ({marks})", ids)
+        return rows, None
+
+    def cache_key(self):
+        """Identity of a select for src/fetch single-flight coalescing (None for writes)."""
+        if self.op != "select":
+            return None
+        return (id(self.backend), self.table, self.columns, self.count, self.head,
+                tuple((sql, tuple(ps)) for sql, ps in self.where), tuple(self.orders), self.limit_n, self.offset_n)
+
+    def execute(self):
+        fn = self._do_select if self.op == "select" else self._do_write
+        data, count = self.backend.run(self.table, self.op, fn)
+        return SimpleNamespace(data=data, count=count)
+
+
+def _upsert_symbol_metadata(backend: "FakeBackend", params: dict):
+    now = datetime.now().isoformat()
+    rows = [{**r, "fetched_at": now} for r in params.get("p_rows") or []]
+    q = _Query(backend, "symbol_metadata")
+    q.upsert(rows, on_conflict="symbol")
+    return len(q._do_write()[0])
+
+
+# Postgres functions from supabase/migrations the app calls through rpc(): SQL over
+# the same tables (named parameters bound by name), or a Python stand-in.
+_RPCS = {
+    "ledger_balance_before": (
+        'select coalesce(sum("amount"), 0) from "transactions" '
+        'where "user_id" = :p_user_id and "transaction_date" < :p_before'
+    ),
+    "upsert_symbol_metadata": _upsert_symbol_metadata,
+}
+
+
+class _RPC:
+    def __init__(self, backend: FakeBackend, fn: str, params: dict):
+        self.backend, self.fn, self.params = backend, fn, dict(params or {})
+
+    def execute(self):
+        if self.fn not in _RPCS:
+            raise FakeAPIError(f"Could not find the function public.{self.fn} in the schema cache")
+        impl = _RPCS[self.fn]
+        params = {k: _value(v) for k, v in self.params.items()}
+
+        def call():
+            if callable(impl):
+                return impl(self.backend, params), None
+            return self.backend.conn.execute(impl, params).fetchone()[0], None
+
+        data, _ = self.backend.run(self.fn, "rpc", call)
+        return SimpleNamespace(data=data, count=None)
+
+
+def fake_user_id(email: str) -> str:
+    """Stable user id the fake auth hands out for `email` (any password works)."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"fake-supabase:{email.strip().lower()}"))
+
+
+class _FakeAuth:
+    def __init__(self):
+        self.current = None
+
+    def _session(self, email: str):
+        user = SimpleNamespace(id=fake_user_id(email), email=email)
+        self.current = SimpleNamespace(user=user, session=SimpleNamespace(access_token=f"fake-{user.id}"))
+        return self.current
+
+    def sign_in_with_password(self, credentials: dict):
+        return self._session(str(credentials.get("email") or ""))
+
+    def sign_up(self, credentials: dict):
+        return self._session(str(credentials.get("email") or ""))
+
+    def sign_out(self):
+        self.current = None
+
+    def update_user(self, attributes: dict):
+        return self.current
+
+
+class _FakePostgrest:
+    def auth(self, token):
+        pass
+
+
+class FakeClient:
+    """Drop-in for supabase.Client covering table(), rpc(), auth and postgrest.auth()."""
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+        self.auth = _FakeAuth()
+        self.postgrest = _FakePostgrest()
+
+    def table(self, name: str) -> _Query:
+        return _Query(self.backend, name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: dict | None = None) -> _RPC:
+        return _RPC(self.backend, fn, params)
+
+    @property
+    def calls(self) -> Counter:
+        return self.backend.calls
+
+    def reset_calls(self):
+        self.backend.reset_calls()
+
+
+_backends: dict[str, FakeBackend] = {}
+_backends_lock = threading.Lock()
+
+def create_fake_client(path: str = ":memory:", latency_ms: float = 0.0) -> FakeClient:
+    """Client over a process-wide backend for `path`, so every session sees the same data."""
+    with _backends_lock:
+        backend = _backends.get(path)
+        if backend is None:
+            backend = _backends[path] = FakeBackend(path, latency_ms)
+        backend.latency_ms = float(latency_ms or 0.0)
+    return FakeClient(backend)
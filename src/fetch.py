@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from . import singleflight
+from .config import SUPABASE_FETCH_WORKERS, SUPABASE_PAGE_SIZE
+
+def query_key(q):
+    """Identity of a read request for single-flight coalescing; None for writes / unknown builders.
+
+    PostgREST builders are keyed on URL, params and the auth / Prefer headers,
+    so two sessions only share a result when they'd get the same rows back.
+    """
+    req = getattr(q, "request", None)
+    if req is not None and hasattr(req, "params"):
+        if str(req.http_method).upper() not in ("GET", "HEAD"):
+            return None
+        h = req.headers
+        return (str(getattr(getattr(req, "session", None), "base_url", "")), str(req.path), str(req.params),
+                h.get("authorization"), h.get("prefer"), h.get("accept"))
+    key = getattr(q, "cache_key", None)  # src/fakedb
+    return key() if callable(key) else None
+
+def auth_identity(q):
+    """Short hash of the JWT a PostgREST builder would send; None when there's none (e.g. src/fakedb).
+
+    The sync client is shared by every session and carries whichever token was
+    set last, so results RLS filtered must be keyed on this, not on the client.
+    """
+    req = getattr(q, "request", None)
+    auth = req.headers.get("authorization") if req is not None and hasattr(req, "headers") else None
+    return hashlib.sha256(auth.encode()).hexdigest()[:16] if auth else None
+
+def _result(res):
+    return SimpleNamespace(data=getattr(res, "data", None), count=getattr(res, "count", None))
+
+def execute(q):
+    """q.execute() for a read, sharing one round trip with identical concurrent reads (src/singleflight)."""
+    return singleflight.DB.do(query_key(q), lambda: _result(q.execute()))
+
+def fetch_keyset(make_query: Callable[[], Any], page_size: int | None = None, key: str = "id") -> list[dict]:
+    """Fetch every row of a query with keyset pagination (ORDER BY key, key > last).
+
+    `make_query` must return a fresh, filtered select builder on each call:
+    supabase-py builders mutate in place, so re-using one would stack the
+    paging filters. The selected columns must include `key`.
+
+    Unlike range()/OFFSET paging, each page is an index seek on `key`, so late
+    pages cost the same as the first and concurrent inserts can't shift rows
+    between pages. `page_size` must not exceed the PostgREST max-rows setting,
+    otherwise a capped page is mistaken for the last one.
+    """
+    page_size = int(page_size or SUPABASE_PAGE_SIZE)
+    return _keyset_pages(make_query, page_size, key, [], None)
+
+def _keyset_pages(make_query, page_size: int, key: str, out: list[dict], last) -> list[dict]:
+    while True:
+        q = make_query()
+        if last is not None:
+            q = q.gt(key, last)
+        res = execute(q.order(key).limit(page_size))
+        data = getattr(res, "data", None) or []
+        out.extend(data)
+        if len(data) < page_size:
+            break
+        last = data[-1][key]
+    return out
+
+def fetch_parallel(make_query: Callable[..., Any], page_size: int | None = None,
+                   max_workers: int | None = None, key: str = "id") -> list[dict]:
+    """Fetch every row of a query, pulling pages concurrently once the row count is known.
+
+    `make_query(count=None)` must return a fresh select builder and forward
+    `count` to `.select(..., count=count)`. The first page is requested with
+    count="exact"; the remaining ranges then go out together on a bounded
+    thread pool and are stitched back in id order. If the server returns no
+    count, this degrades to sequential keyset paging from the first page, and
+    if fewer rows come back than were counted (deletes mid-fetch shift the
+    offsets), the whole read is redone with fetch_keyset.
+    """
+    page_size = int(page_size or SUPABASE_PAGE_SIZE)
+    max_workers = max(1, int(max_workers or SUPABASE_FETCH_WORKERS))
+
+    res = execute(make_query(count="exact").order(key).range(0, page_size - 1))
+    first = getattr(res, "data", None) or []
+    total = getattr(res, "count", None)
+    if len(first) < page_size:
+        return list(first)
+    if total is None:
+        return _keyset_pages(make_query, page_size, key, list(first), first[-1][key])
+
+    starts = list(range(page_size, int(total), page_size))
+
+    def _page(start):
+        r = execute(make_query().order(key).range(start, start + page_size - 1))
+        return getattr(r, "data", None) or []
+
+    pages = [first]
+    if starts:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(starts))) as pool:
+            pages.extend(pool.map(_page, starts))
+
+    # A row inserted mid-fetch below a later range pushes that range's rows forward,
+    # so a page can repeat the previous page's last rows; drop repeats by key.
+    out: list[dict] = []
+    seen = set()
+    for page in pages:
+        for row in page:
+            k = row[key]
+            if k not in seen:
+                seen.add(k)
+                out.append(row)
+    # Rows inserted after the count was taken land past the last range; pick them up by key.
+    if out and len(pages[-1]) == page_size:
+        out = _keyset_pages(make_query, page_size, key, out, out[-1][key])
+    # A delete mid-fetch pulls later rows back across a range boundary, and those rows are
+    # silently skipped. Fewer rows than the ranges were planned from means that may have
+    # happened: redo it with keyset paging, which can't skip. (An insert and a delete in
+    # the same window can still cancel out; callers needing a snapshot use fetch_keyset.)
+    if len(out) < int(total):
+        return fetch_keyset(make_query, page_size=page_size, key=key)
+    return out
+
+async def aexecute(q):
+    """Execute a read from either client: await async builders, thread out sync ones.
+
+    Identical concurrent reads share one request, as with execute().
+    """
+    if asyncio.iscoroutinefunction(q.execute):
+        async def _run():
+            return _result(await q.execute())
+        return await singleflight.ASYNC_DB.do(query_key(q), _run)
+    return await asyncio.to_thread(execute, q)
+
+async def afetch_keyset(make_query: Callable[[], Any], page_size: int | None = None, key: str = "id") -> list[dict]:
+    """Async counterpart of fetch_keyset for use inside an event loop."""
+    page_size = int(page_size or SUPABASE_PAGE_SIZE)
+    out: list[dict] = []
+    last = None
+    while True:
+        q = make_query()
+        if last is not None:
+            q = q.gt(key, last)
+        res = await aexecute(q.order(key).limit(page_size))
+        data = getattr(res, "data", None) or []
+        out.extend(data)
+        if len(data) < page_size:
+            break
+        last = data[-1][key]
+    return out
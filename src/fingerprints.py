@@ -0,0 +1,76 @@
+"""Cheap per-account table fingerprints for cache validation.
+
+A fingerprint is (row count, max(updated_at)) of one user's rows in a table,
+fetched with a single `limit 1` + `count=exact` request that only touches the
+(user_id, updated_at) index. Cached snapshots of transactions / assets /
+options / portfolio_history are keyed on it (see caches.cached(fingerprint=)),
+so a rerun costs one tiny probe per table and a full reload happens only
+after someone - this session, another session, a delegate - changed the rows.
+
+Tables without updated_at (the migration hasn't run) fall back to max(id),
+which still catches inserts and deletes. Probes are memoized for
+FINGERPRINT_TTL seconds so the helpers of one rerun share them; the memo is
+per caller (JWT), since RLS decides which rows a probe can count.
+"""
+import logging
+import threading
+import time
+
+from .config import FINGERPRINT_TTL
+from .fetch import auth_identity, execute
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_memo: dict[tuple, tuple[float, tuple]] = {}
+# tables where updated_at isn't there; probed on max(id) instead
+_no_updated_at: set[str] = set()
+
+
+def _probe(client, table: str, user_id) -> tuple:
+    col = "id" if table in _no_updated_at else "updated_at"
+    q = (client.table(table).select(col, count="exact")
+         .eq("user_id", user_id).order(col, desc=True).limit(1))
+    try:
+        res = execute(q)
+    except Exception as e:
+        if col == "id" or "updated_at" not in str(e):
+            raise
+        log.info("%s has no updated_at yet; fingerprinting on max(id)", table)
+        with _lock:
+            _no_updated_at.add(table)
+        return _probe(client, table, user_id)
+    rows = res.data or []
+    return (res.count if res.count is not None else len(rows), rows[0].get(col) if rows else None)
+
+
+def probe(client, tables, user_id) -> tuple:
+    """Fingerprint of `user_id`'s rows in `tables`; None when a probe fails (caller reloads)."""
+    now = time.monotonic()
+    out = []
+    for table in tables:
+        raw = getattr(client, "__wrapped__", client)
+        # Keyed on the caller's JWT too: the shared client sees whatever RLS lets the
+        # current token see, and a delegate's probe mustn't stand in for the owner's.
+        key = (id(raw), table, str(user_id), auth_identity(raw.table(table).select("id")))
+        with _lock:
+            hit = _memo.get(key)
+        if hit is not None and hit[0] > now:
+            out.append(hit[1])
+            continue
+        try:
+            fp = _probe(client, table, user_id)
+        except Exception as e:
+            log.warning("fingerprint probe on %s failed: %s", table, e)
+            return None
+        with _lock:
+            _memo[key] = (now + FINGERPRINT_TTL, fp)
+        out.append(fp)
+    return tuple(out)
+
+
+def forget(user_id=None):
+    """Drop memoized probes (for one user, or all) after a local write."""
+    with _lock:
+        for key in [k for k in _memo if user_id is None or k[2] == str(user_id)]:
+            del _memo[key]
@@ -0,0 +1,173 @@
+"""Daily FX history (USD/CAD) cached on disk, and a vectorized converter.
+
+The history is Yahoo's daily close for `CAD=X` (CAD per 1 USD), kept in
+FX_CACHE_DIR/USDCAD.csv. It's loaded once per process and topped up
+incrementally: at most once every FX_REFRESH_SECONDS the missing days since
+the last stored date are fetched (a short period, not the whole history) and
+appended. Renders therefore never hit the network for FX beyond that refresh.
+
+    fx.convert(tx["amount"], tx["transaction_date"], "USD", "CAD")
+    fx.convert(snap["total_equity"], snap["snapshot_date"], "USD", "CAD")
+
+convert() joins every row to the close on or before its date with
+pd.merge_asof (dates before the first close use the first close, missing
+dates use the latest), so a CAD view of history uses the rate of the day.
+"""
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import marketdata
+from .config import FX_CACHE_DIR, FX_HISTORY_PERIOD, FX_REFRESH_SECONDS
+
+log = logging.getLogger(__name__)
+
+BASE = "USD"
+# quote currency -> Yahoo symbol of its daily close per 1 USD
+PAIRS = {"CAD": "CAD=X"}
+
+_lock = threading.Lock()
+_series: dict[str, pd.Series] = {}
+_checked: dict[str, float] = {}
+
+
+def _path(quote: str) -> Path:
+    return Path(FX_CACHE_DIR) / f"{BASE}{quote}.csv"
+
+
+def _load(quote: str) -> pd.Series:
+    try:
+        df = pd.read_csv(_path(quote), parse_dates=["date"])
+    except (OSError, ValueError):
+        return pd.Series(dtype=float, name=quote)
+    return _clean(pd.Series(df["rate"].to_numpy(), index=df["date"], name=quote))
+
+
+def _save(quote: str, s: pd.Series):
+    path = _path(quote)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Private temp file per writer, as in ledger_cache._write: processes sharing the
+        # directory never replace the cache with each other's half-written file.
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.stem + ".", suffix=".tmp",
+                                         delete=False) as f:
+            tmp = Path(f.name)
+        try:
+            s.rename("rate").rename_axis("date").to_frame().to_csv(tmp, date_format="%Y-%m-%d")
+            tmp.replace(path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+    except OSError as e:
+        log.warning("fx cache not written: %s", e)  # in-memory history still works
+
+
+def _clean(s: pd.Series) -> pd.Series:
+    idx = pd.DatetimeIndex(pd.to_datetime(s.index, errors="coerce"))
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)  # Yahoo stamps FX days at local midnight; keep the wall date
+    idx = idx.normalize().astype("datetime64[ns]")
+    s = pd.Series(pd.to_numeric(s.to_numpy(), errors="coerce"), index=idx, name=s.name)
+    s = s[s.index.notna() & (s > 0)]
+    return s[~s.index.duplicated(keep="last")].sort_index()
+
+
+def _period_for(last: pd.Timestamp | None) -> str:
+    """Shortest Yahoo period that covers the days since `last`."""
+    if last is None:
+        return FX_HISTORY_PERIOD
+    gap = (pd.Timestamp.today().normalize() - last).days
+    for period, days in (("5d", 5), ("1mo", 28), ("3mo", 88), ("1y", 360), ("5y", 1800)):
+        if gap < days:
+            return period
+    return FX_HISTORY_PERIOD
+
+
+def _fetch(quote: str, period: str) -> pd.Series:
+    hist = marketdata.get_provider().history(PAIRS[quote], period)
+    if hist is None or hist.empty or "Close" not in hist.columns:
+        return pd.Series(dtype=float, name=quote)
+    return _clean(hist["Close"].rename(quote))
+
+
+def history(quote: str = "CAD") -> pd.Series:
+    """Daily close of `quote` per 1 USD, indexed by date (oldest first)."""
+    if quote not in PAIRS:
+        raise ValueError(f"no FX history for {quote!r}; known: {sorted(PAIRS)}")
+    with _lock:
+        s = _series.get(quote)
+        if s is None:
+            s = _series[quote] = _load(quote)
+        if time.monotonic() - _checked.get(quote, -FX_REFRESH_SECONDS) < FX_REFRESH_SECONDS:
+            return s
+        # this caller refreshes; everyone else keeps reading the current series meanwhile
+        _checked[quote] = time.monotonic()
+        last = s.index[-1] if len(s) else None
+    try:
+        new = _fetch(quote, _period_for(last))  # outside the lock: may wait on the Yahoo scheduler
+    except Exception as e:
+        # keep serving what we have; the next check is FX_REFRESH_SECONDS away
+        log.warning("fx history refresh for %s failed: %s", quote, e)
+        return s
+    if new.empty:
+        return s
+    with _lock:
+        s = _series[quote] = _clean(pd.concat([_series.get(quote, s), new]))
+        _save(quote, s)
+    return s
+
+
+def _usd_rates(currency, dates: pd.Series) -> np.ndarray:
+    """Units of `currency` per 1 USD on each date (currency: scalar or one code per row).
+
+    NaN for rows in a currency that is neither USD nor in PAIRS.
+    """
+    codes = pd.Series(np.asarray(currency, dtype=object)) if np.ndim(currency) else None
+    is_base = (codes.astype(str).str.upper().eq(BASE).to_numpy() if codes is not None
+               else np.full(len(dates), str(currency).upper() == BASE))
+    out = np.where(is_base, 1.0, np.nan)
+    for quote in PAIRS:
+        mask = np.ones(len(dates), dtype=bool) if codes is None else codes.str.upper().eq(quote).to_numpy()
+        if codes is None and str(currency).upper() != quote:
+            continue
+        if not mask.any():
+            continue
+        s = history(quote)
+        if s.empty:
+            out[mask] = np.nan
+            continue
+        rates = s.rename("rate").rename_axis("date").reset_index()
+        left = pd.DataFrame({"date": dates[mask].fillna(s.index[-1]).to_numpy(), "pos": np.flatnonzero(mask)})
+        joined = pd.merge_asof(left.sort_values("date"), rates, on="date", direction="backward")
+        joined["rate"] = joined["rate"].fillna(float(s.iloc[0]))  # before the first close
+        out[joined["pos"].to_numpy()] = joined["rate"].to_numpy()
+    return out
+
+
+def convert(amounts, dates, from_ccy, to_ccy) -> pd.Series:
+    """`amounts` in `from_ccy` expressed in `to_ccy` at each row's daily close.
+
+    from_ccy / to_ccy are a code ("USD", "CAD") or one code per row. Rows for
+    a currency with no FX history come back NaN. The result keeps `amounts`'
+    index when it's a Series.
+    """
+    index = amounts.index if isinstance(amounts, pd.Series) else None
+    values = pd.to_numeric(pd.Series(np.asarray(amounts, dtype=object)), errors="coerce").to_numpy(dtype=float)
+    when = pd.Series(pd.to_datetime(np.asarray(dates, dtype=object), errors="coerce"))
+    if when.dt.tz is not None:
+        when = when.dt.tz_localize(None)
+    when = when.dt.normalize().astype("datetime64[ns]")
+    if len(values) != len(when):
+        raise ValueError(f"convert: {len(values)} amounts but {len(when)} dates")
+    out = values * _usd_rates(to_ccy, when) / _usd_rates(from_ccy, when)
+    return pd.Series(out, index=index)
+
+
+def rate(on=None, from_ccy: str = BASE, to_ccy: str = "CAD") -> float:
+    """Single daily rate (today's close if `on` is None); NaN without history."""
+    return float(convert([1.0], [on or pd.Timestamp.today()], from_ccy, to_ccy).iloc[0])
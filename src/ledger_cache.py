@@ -0,0 +1,267 @@
+"""Local per-account copy of `transactions`, kept as Parquet and synced by delta.
+
+    df = ledger_cache.transactions(supabase, uid)
+
+Each account's rows live in LEDGER_CACHE_DIR/<account>.parquet together with
+the sync state (max id, max updated_at, and the table fingerprint at sync time)
+in the file's schema metadata. A read:
+
+1. probes the account's transactions fingerprint (src/fingerprints.py); if it
+   matches the stored one, the file is the answer, no rows cross the wire;
+2. otherwise fetches only rows with id > max id or updated_at > max
+   updated_at (inserts and edits), merges them by id;
+3. if the merged row count still differs from the server's, fetches the id
+   list and drops local rows the server no longer has (tombstone check for
+   deletes, including a full account reset).
+
+The file is opened memory-mapped, so an unchanged multi-year ledger costs one
+probe plus a local read. Without pyarrow, or when the cache directory isn't
+writable, transactions() just fetches everything as before.
+
+The files are full, unencrypted copies of each account's ledger on the app
+host's disk; restrict LEDGER_CACHE_DIR to the app's own user (or set it to
+"off") wherever that disk is shared or backed up.
+
+window() is the ledger page's date-range read: the rows dated start..end,
+the rest of every TXG group they belong to (even when those rows fall
+outside the range), and the balance carried in from the rows before it.
+Without the local copy the range and the TXG siblings are filtered in the
+query and the opening balance is a sum() in the database
+(public.ledger_balance_before), so the default one-year view loads about a
+year of rows however old the account is.
+"""
+import json
+import logging
+import tempfile
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from . import analytics, fingerprints
+from .config import LEDGER_CACHE_DIR
+from .fetch import execute, fetch_keyset
+from .schema import LEDGER_ROWS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: fall back to full fetches
+    pa = pq = None
+
+log = logging.getLogger(__name__)
+
+TABLE = "transactions"
+COLUMNS = (*LEDGER_ROWS.columns, "updated_at")
+_META_KEY = b"ledger_cache"
+
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def enabled() -> bool:
+    return pq is not None and bool(LEDGER_CACHE_DIR) and LEDGER_CACHE_DIR.lower() not in ("off", "0", "false", "none")
+
+
+def _lock(account: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(account, threading.Lock())
+
+
+def _path(account: str) -> Path:
+    safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in str(account))
+    return Path(LEDGER_CACHE_DIR) / f"{safe}.parquet"
+
+
+def _frame(rows) -> pd.DataFrame:
+    data = {c: [r.get(c) for r in rows] for c in COLUMNS}
+    df = pd.DataFrame(data, columns=list(COLUMNS))
+    df["id"] = pd.to_numeric(df["id"], errors="coerce").astype("Int64")
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+    for c in COLUMNS:
+        if c not in ("id", "amount"):
+            df[c] = df[c].astype("string")
+    return df
+
+
+def _read(path: Path):
+    """(frame, state) from the local file, or (None, {}) when there isn't a usable one."""
+    if not path.exists():
+        return None, {}
+    try:
+        table = pq.read_table(path, memory_map=True)
+        meta = (table.schema.metadata or {}).get(_META_KEY)
+        state = json.loads(meta) if meta else {}
+        return table.to_pandas(), state
+    except Exception as e:
+        log.warning("ledger cache %s unreadable, rebuilding: %s", path, e)
+        return None, {}
+
+
+def _write(path: Path, df: pd.DataFrame, state: dict):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                          _META_KEY: json.dumps(state).encode()})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A private temp file per writer: app processes sharing the directory never
+    # write into each other's half-finished file before the atomic replace.
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.stem + ".", suffix=".tmp",
+                                     delete=False) as f:
+        tmp = Path(f.name)
+    try:
+        pq.write_table(table, tmp)
+        tmp.replace(path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _fetch(client, user_id, since_id=None, since_updated=None) -> list[dict]:
+    cols = ",".join(COLUMNS)
+
+    def make_query():
+        q = client.table(TABLE).select(cols).eq("user_id", user_id)
+        if since_updated:
+            q = q.or_(f'id.gt.{int(since_id or 0)},updated_at.gt."{since_updated}"')
+        elif since_id is not None:
+            q = q.gt("id", int(since_id))
+        return q
+
+    try:
+        return fetch_keyset(make_query)
+    except Exception as e:
+        if "updated_at" not in str(e):
+            raise
+        # the updated_at migration hasn't run: inserts only
+        cols = ",".join(LEDGER_ROWS.columns)
+        return fetch_keyset(lambda: (client.table(TABLE).select(cols).eq("user_id", user_id)
+                                     .gt("id", int(since_id or 0))))
+
+
+def _server_ids(client, user_id) -> set:
+    rows = fetch_keyset(lambda: client.table(TABLE).select("id").eq("user_id", user_id))
+    return {int(r["id"]) for r in rows}
+
+
+def _state(df: pd.DataFrame, fp) -> dict:
+    upd = df["updated_at"].dropna()
+    return {
+        "max_id": int(df["id"].max()) if len(df) else None,
+        "max_updated_at": str(upd.max()) if len(upd) else None,
+        "fingerprint": [list(x) for x in fp] if fp else None,
+    }
+
+
+def _public(df: pd.DataFrame) -> pd.DataFrame:
+    """Object columns with None for missing values, like schema.View.frame()."""
+    out = df.astype(object)
+    return out.where(out.notna(), None)
+
+
+def transactions(client, user_id) -> pd.DataFrame:
+    """Every transaction of `user_id` (LEDGER_ROWS columns + updated_at), id order."""
+    if not enabled():
+        return _public(_frame(_fetch(client, user_id)))
+    return _public(_synced(client, user_id))
+
+
+def _synced(client, user_id) -> pd.DataFrame:
+    path = _path(user_id)
+    with _lock(str(user_id)):
+        fp = fingerprints.probe(client, (TABLE,), user_id)
+        df, state = _read(path)
+        if df is not None and fp is not None and state.get("fingerprint") == [list(x) for x in fp]:
+            return df
+        if df is None:
+            df = _frame(_fetch(client, user_id))
+        else:
+            delta = _frame(_fetch(client, user_id, state.get("max_id"), state.get("max_updated_at")))
+            if len(delta):
+                df = pd.concat([df[~df["id"].isin(delta["id"])], delta], ignore_index=True)
+            server_count = fp[0][0] if fp else None
+            if server_count is None or len(df) != server_count:
+                df = df[df["id"].isin(_server_ids(client, user_id))]
+        df = df.sort_values("id", kind="stable").reset_index(drop=True)
+        try:
+            _write(path, df, _state(df, fp))
+        except OSError as e:
+            log.warning("ledger cache not written: %s", e)
+        return df
+
+
+# ---- Date-range reads (ledger_page) -----------------------------------------
+
+# TXG tags per sibling query; each becomes one `like` term of an or_() filter
+TXG_CHUNK = 50
+# supabase/migrations/20261019000700_ledger_balance_before.sql
+BALANCE_RPC = "ledger_balance_before"
+
+
+def _dates(values: pd.Series) -> pd.Series:
+    return analytics.ledger_dates(values).dt.date
+
+
+def _window_remote(client, user_id, start, end):
+    cols = ",".join(LEDGER_ROWS.columns)
+    rows = fetch_keyset(lambda: (client.table(TABLE).select(cols).eq("user_id", user_id)
+                                 .gte("transaction_date", start.isoformat())
+                                 .lte("transaction_date", end.isoformat())))
+    df = _frame(rows)
+    tags = sorted(set(analytics.txg_tags(df["description"]).dropna()))
+    extra = []
+    for i in range(0, len(tags), TXG_CHUNK):
+        terms = ",".join(f'description.like."*TXG:{t}*"' for t in tags[i:i + TXG_CHUNK])
+        extra += fetch_keyset(lambda terms=terms: (client.table(TABLE).select(cols)
+                                                   .eq("user_id", user_id).or_(terms)))
+    if extra:
+        sib = _frame(extra)
+        # like() also matches longer tags sharing the prefix; keep exact ones only
+        sib = sib[analytics.txg_tags(sib["description"]).isin(tags).to_numpy() & ~sib["id"].isin(df["id"]).to_numpy()]
+        df = pd.concat([df, sib], ignore_index=True)
+    # pre-start TXG siblings are in df; they're in the server's sum too
+    pre = (_dates(df["transaction_date"]) < start).fillna(False).to_numpy(dtype=bool)
+    in_df = float(pd.to_numeric(df["amount"], errors="coerce")[pre].fillna(0).sum())
+    return df, _balance_before(client, user_id, start) - in_df
+
+
+def _balance_before(client, user_id, start) -> float:
+    """sum(amount) of user_id's rows dated before `start`, aggregated by the database."""
+    try:
+        res = execute(client.rpc(BALANCE_RPC, {"p_user_id": str(user_id), "p_before": start.isoformat()}))
+    except Exception as e:
+        if BALANCE_RPC not in str(e):
+            raise
+        # the ledger_balance_before migration hasn't run: sum the earlier rows here
+        log.info("%s() missing; summing earlier transactions client-side", BALANCE_RPC)
+        rows = fetch_keyset(lambda: (client.table(TABLE).select("id,amount").eq("user_id", user_id)
+                                     .lt("transaction_date", start.isoformat())))
+        return float(sum(float(r.get("amount") or 0.0) for r in rows))
+    data = res.data
+    if isinstance(data, list):  # some PostgREST versions wrap scalars
+        data = data[0] if data else 0
+        if isinstance(data, dict):
+            data = next(iter(data.values()), 0)
+    return float(data or 0.0)
+
+
+def _window_local(df: pd.DataFrame, start, end):
+    d = _dates(df["transaction_date"])
+    in_range = (d >= start) & (d <= end)
+    txg = analytics.txg_tags(df["description"])
+    take = (in_range | txg.isin(set(txg[in_range].dropna()))).fillna(False).to_numpy(dtype=bool)
+    before = (d < start).fillna(False).to_numpy(dtype=bool) & ~take
+    opening = float(pd.to_numeric(df["amount"], errors="coerce")[before].fillna(0).sum())
+    return df[take], opening
+
+
+def window(client, user_id, start, end) -> tuple[pd.DataFrame, float]:
+    """(rows of the TXG groups touching start..end, balance of every other row dated before start).
+
+    Rows are LEDGER_ROWS columns in id order, like transactions().
+    """
+    if enabled():
+        df, opening = _window_local(_synced(client, user_id), start, end)
+    else:
+        df, opening = _window_remote(client, user_id, start, end)
+    df = df.sort_values("id", kind="stable").reset_index(drop=True)
+    return _public(df[list(LEDGER_ROWS.columns)]), opening
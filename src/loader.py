@@ -0,0 +1,221 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+
+from . import schema
+from .config import SUPABASE_KEY, SUPABASE_URL
+from .fetch import aexecute, afetch_keyset
+
+from supabase import Client
+
+try:
+    from supabase import acreate_client
+except ImportError:  # older supabase-py without the async client
+    acreate_client = None
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = get_script_run_ctx = None
+try:
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+except ImportError:  # attribute add_script_run_ctx sets on the thread; stable across releases
+    SCRIPT_RUN_CONTEXT_ATTR_NAME = "streamlit_script_run_ctx"
+
+FLOW_TYPES = ["DEPOSIT", "WITHDRAWAL"]
+_MAX_CLIENTS = 32
+_QUOTE_CONCURRENCY = 8
+
+_loop = None
+_loop_lock = threading.Lock()
+# signed-in user id -> (AsyncClient, access token), least recently used first;
+# only touched from the loader loop thread.
+_clients: dict[str, tuple[object, str]] = {}
+
+
+def _background_loop():
+    """One long-lived event loop so async clients (and their pools) outlive a rerun."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="page-data-loader", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def run(coro, timeout: float | None = 60):
+    """Run a coroutine on the loader loop from synchronous (Streamlit script) code."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result(timeout)
+
+
+async def _client(sync_client, user_id: str, token: str):
+    """Async client for the signed-in user, or the sync client (e.g. the fake backend) otherwise.
+
+    One client per user: a refreshed JWT replaces the token on the existing
+    client instead of leaving the old one cached under a stale key.
+    """
+    # Unwrap the perf inspector's traced client so the real async path is still taken.
+    if acreate_client is None or not SUPABASE_URL or not SUPABASE_KEY or \
+            not isinstance(getattr(sync_client, "__wrapped__", sync_client), Client):
+        return sync_client
+    token = token or ""
+    # Without a user id the token is the only safe key: never share a client across users.
+    key = str(user_id or token)
+    # Popped and re-inserted so the dict stays in least-recently-used order.
+    entry = _clients.pop(key, None)
+    if entry is None:
+        sb, current = await acreate_client(SUPABASE_URL, SUPABASE_KEY), ""
+    else:
+        sb, current = entry
+    if token != current:
+        if token:
+            sb.postgrest.auth(token)
+        else:
+            # Signed out under the same key: drop back to an anonymous client.
+            sb = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+    while len(_clients) >= _MAX_CLIENTS:
+        _clients.pop(next(iter(_clients)))
+    _clients[key] = (sb, token)
+    return sb
+
+
+async def _in_thread(ctx, fn, *args):
+    """Run a blocking helper (e.g. a cached yfinance call) off-loop, inside the caller's script context."""
+    def _call():
+        if ctx is None or add_script_run_ctx is None:
+            return fn(*args)
+        # to_thread runs on asyncio's shared pool: hand the thread back without this
+        # session's context, or the next job (another session's) would run under it.
+        thread = threading.current_thread()
+        previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+        add_script_run_ctx(thread, ctx)
+        try:
+            return fn(*args)
+        finally:
+            if previous is None:
+                thread.__dict__.pop(SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+            else:
+                setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+    return await asyncio.to_thread(_call)
+
+
+async def _safe(coro, default, errors: dict, name: str):
+    try:
+        return await coro
+    except Exception as e:
+        errors[name] = e
+        return default
+
+
+async def _cash_usd(sb, uid):
+    rows = await afetch_keyset(lambda: sb.table("transactions").select("id, amount")
+                               .eq("user_id", uid).eq("currency", "USD"))
+    return float(sum(float(r.get("amount") or 0.0) for r in rows))
+
+
+async def _rows(q):
+    res = await aexecute(q)
+    return getattr(res, "data", None) or []
+
+
+async def _flows(sb, uid):
+    return await afetch_keyset(lambda: sb.table("transactions").select("id, transaction_date, amount, type, currency")
+                               .eq("user_id", uid).in_("type", FLOW_TYPES))
+
+
+async def _delegation_readable(sb, uid):
+    ph, tx = await asyncio.gather(
+        _rows(sb.table("portfolio_history").select("id").eq("user_id", uid).limit(1)),
+        _rows(sb.table("transactions").select("id").eq("user_id", uid).limit(1)),
+    )
+    return bool(ph) or bool(tx)
+
+
+def _position_symbols(assets: list[dict], options: list[dict]) -> set[str]:
+    syms = set()
+    for r in assets:
+        if str(r.get("type") or "").upper().strip() == "STOCK":
+            syms.add(str(r.get("symbol") or r.get("ticker") or "").strip().upper())
+    for r in options:
+        syms.add(str(r.get("symbol") or r.get("ticker") or "").strip().upper())
+    syms.discard("")
+    return syms
+
+
+async def _dashboard(sync_client, uid, viewer_id, token, known_symbols, quote_fn, check_delegation, ctx):
+    sb = await _client(sync_client, viewer_id, token)
+    errors: dict[str, Exception] = {}
+    sem = asyncio.Semaphore(_QUOTE_CONCURRENCY)
+    quote_tasks: dict[str, asyncio.Task] = {}
+
+    async def _quote(sym):
+        async with sem:
+            return await _in_thread(ctx, quote_fn, sym)
+
+    def _start_quotes(symbols):
+        if quote_fn is None:
+            return
+        for s in symbols:
+            if s and s not in quote_tasks:
+                quote_tasks[s] = asyncio.create_task(_safe(_quote(s), 0.0, errors, f"quote:{s}"))
+
+    # Quotes for symbols seen on the previous render go out together with the DB reads.
+    _start_quotes(known_symbols)
+
+    jobs = {
+        "cash_usd": _safe(_cash_usd(sb, uid), 0.0, errors, "cash_usd"),
+        "assets": _safe(_rows(sb.table("assets").select(schema.ASSET_POSITIONS.select)
+                              .eq("user_id", uid).neq("quantity", 0)), [], errors, "assets"),
+        "options": _safe(_rows(sb.table("options").select(schema.OPEN_OPTIONS.select)
+                               .eq("user_id", uid).eq("status", "open")), [], errors, "options"),
+        "history": _safe(_rows(sb.table("portfolio_history").select(schema.SNAPSHOTS.select)
+                               .eq("user_id", uid).order("snapshot_date", desc=False)), [], errors, "history"),
+        "flows": _safe(_flows(sb, uid), [], errors, "flows"),
+        "prefs": _safe(_rows(sb.table("user_preferences").select("share_stats").eq("user_id", uid).limit(1)),
+                       [], errors, "prefs"),
+    }
+    if check_delegation:
+        jobs["readable"] = _safe(_delegation_readable(sb, uid), True, errors, "readable")
+
+    values = dict(zip(jobs, await asyncio.gather(*jobs.values())))
+
+    # Positions opened since the last render still get their quotes in this pass.
+    symbols = _position_symbols(values["assets"], values["options"])
+    _start_quotes(symbols)
+    quotes = {}
+    if quote_tasks:
+        done = await asyncio.gather(*quote_tasks.values())
+        quotes = dict(zip(quote_tasks, done))
+
+    flows = pd.DataFrame(values["flows"], columns=["id", "transaction_date", "amount", "type", "currency"])
+    return SimpleNamespace(
+        cash_usd=float(values["cash_usd"] or 0.0),
+        assets=schema.ASSET_POSITIONS.frame(values["assets"]),
+        options=schema.OPEN_OPTIONS.frame(values["options"]),
+        history=schema.SNAPSHOTS.frame(values["history"]),
+        flows=flows,
+        share_stats=bool(values["prefs"][0].get("share_stats")) if values["prefs"] else False,
+        readable=values.get("readable", True),
+        symbols=sorted(symbols),
+        quotes=quotes,
+        errors=errors,
+    )
+
+
+def load_dashboard_data(sync_client, uid, token: str = "", known_symbols=(), quote_fn=None,
+                        check_delegation: bool = False, viewer_id: str = ""):
+    """Fetch everything the Dashboard/Holdings views need in one concurrent pass.
+
+    Cash, positions, snapshots, deposit/withdrawal flows, preferences and the
+    delegated-access probe are issued together with asyncio.gather on the
+    async Supabase client (sync client in worker threads as a fallback).
+    Quotes for `known_symbols` start at the same time via `quote_fn`, so a
+    cached quote function is warm by the time the page walks its positions.
+    `viewer_id` is the signed-in user whose `token` this is; it differs from
+    `uid` when viewing a delegated account.
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    return run(_dashboard(sync_client, uid, viewer_id, token, tuple(known_symbols or ()), quote_fn, check_delegation, ctx))
@@ -0,0 +1,541 @@
+"""Market-data provider: live yfinance, record-to-disk, or replay-from-disk.
+
+All Yahoo access in the app goes through get_provider(). MARKETDATA_MODE picks
+the implementation:
+
+    live    (default) call yfinance directly
+    record  call yfinance and save every response under MARKETDATA_DIR
+    replay  serve saved responses only, sleeping MARKETDATA_LATENCY_MS per call
+
+Replay makes pricing / valuation timings deterministic and offline; a call with
+no recorded fixture raises FixtureMissing, which callers treat like any other
+Yahoo failure.
+
+Every mode is wrapped in CoalescingProvider, so concurrent identical requests
+from different sessions go upstream once (src/singleflight.py), and in
+ResilientProvider: lookups that fail or come back empty (delisted / garbage
+symbols) are remembered for MARKETDATA_NEGATIVE_TTL, and after
+MARKETDATA_BREAKER_FAILURES consecutive upstream errors the circuit opens for
+MARKETDATA_BREAKER_COOLDOWN seconds, during which last-known values are served
+and status() reports the degraded state for the UI. Both stores are bounded
+by MARKETDATA_STATE_MAX: expired failures are swept out, and the least
+recently used last-known values go first.
+
+scoped_provider() overrides the provider for the current context only (one
+session's rerun and the workers that copy its context); src/perf.py uses it
+to trace just the session that has the inspector on.
+"""
+import contextvars
+import json
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+import yfinance as yf
+
+from . import singleflight
+from .config import (
+    MARKETDATA_BREAKER_COOLDOWN,
+    MARKETDATA_BREAKER_FAILURES,
+    MARKETDATA_DIR,
+    MARKETDATA_LATENCY_MS,
+    MARKETDATA_MODE,
+    MARKETDATA_NEGATIVE_TTL,
+    MARKETDATA_STATE_MAX,
+)
+from .scheduler import YAHOO
+
+
+class FixtureMissing(LookupError):
+    """Replay mode has no recorded response for this call."""
+
+
+class MarketDataProvider(ABC):
+    """The handful of Yahoo primitives the app needs; subclasses must implement all of them."""
+
+    @abstractmethod
+    def last_price(self, symbol: str) -> float:
+        raise NotImplementedError
+
+    @abstractmethod
+    def last_closes(self, symbols: list[str]) -> dict[str, float]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def history(self, symbol: str, period: str = "1d") -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abstractmethod
+    def option_chain(self, symbol: str, expiry: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def info(self, symbol: str) -> dict:
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """yfinance; each network round trip is admitted by the Yahoo scheduler (src/scheduler.py)."""
+
+    def last_price(self, symbol: str) -> float:
+        ticker = yf.Ticker(symbol)
+
+        # STRATEGY 1: Check fast_info (Real-time)
+        try:
+            price = YAHOO.run(lambda: ticker.fast_info.last_price)
+            if price and not pd.isna(price) and price > 0:
+                return float(price)
+        except Exception:
+            pass
+
+        # STRATEGY 2: Check History (Back 5 days for weekends)
+        hist = YAHOO.run(ticker.history, "5d")
+        if not hist.empty:
+            return float(hist["Close"].iloc[-1])
+
+        # STRATEGY 3: Last Resort (Previous Close)
+        try:
+            return float(YAHOO.run(lambda: ticker.info).get("previousClose", 0.0))
+        except Exception:
+            return 0.0
+
+    def last_closes(self, symbols: list[str]) -> dict[str, float]:
+        syms = list(symbols)
+        if not syms:
+            return {}
+        # One download fans out to a request per symbol, so it costs that many tokens.
+        data = YAHOO.run(lambda: yf.download(syms, period="1d", interval="1m", progress=False,
+                                             group_by="ticker", threads=True), cost=len(syms))
+        out = {}
+        # yfinance output varies for 1 vs many symbols; handle both
+        for s in syms:
+            try:
+                frame = data if len(syms) == 1 else data[s]
+                out[s] = float(frame["Close"].dropna().iloc[-1])
+            except Exception:
+                pass
+        return out
+
+    def history(self, symbol: str, period: str = "1d") -> pd.DataFrame:
+        return YAHOO.run(lambda: yf.Ticker(symbol).history(period=period))
+
+    def option_chain(self, symbol: str, expiry: str):
+        # option_chain() first lists the expirations, then fetches the chain
+        chain = YAHOO.run(lambda: yf.Ticker(symbol).option_chain(expiry), cost=2)
+        return chain.calls, chain.puts
+
+    def info(self, symbol: str) -> dict:
+        return dict(YAHOO.run(lambda: getattr(yf.Ticker(symbol), "info", None)) or {})
+
+
+# ---- fixtures ---------------------------------------------------------------
+
+def _encode(obj):
+    if isinstance(obj, pd.DataFrame):
+        return {"__frame__": obj.to_json(orient="split", date_format="iso")}
+    if isinstance(obj, tuple):
+        return {"__tuple__": [_encode(o) for o in obj]}
+    return obj
+
+
+def _decode(obj):
+    if isinstance(obj, dict) and "__frame__" in obj:
+        return pd.read_json(StringIO(obj["__frame__"]), orient="split", dtype=False)
+    if isinstance(obj, dict) and "__tuple__" in obj:
+        return tuple(_decode(o) for o in obj["__tuple__"])
+    return obj
+
+
+def _fixture_path(root: Path, method: str, *args) -> Path:
+    parts = []
+    for a in args:
+        a = ",".join(a) if isinstance(a, (list, tuple)) else str(a)
+        parts.append(re.sub(r"[^A-Za-z0-9_.,=-]", "_", a))
+    return root / method / ("__".join(parts) + ".json")
+
+
+def save_fixture(root: Path, method: str, args: tuple, value) -> Path:
+    """Write one replayable response, e.g. save_fixture(root, "last_price", ("AAPL",), 187.2)."""
+    path = _fixture_path(Path(root), method, *args)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"args": [list(a) if isinstance(a, (list, tuple)) else a for a in args],
+                                "value": _encode(value)}, default=str))
+    return path
+
+
+class RecordingProvider(MarketDataProvider):
+    """Delegates to `inner` and writes each successful response to disk."""
+
+    def __init__(self, inner: MarketDataProvider, root: Path):
+        self.inner = inner
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, *args):
+        value = getattr(self.inner, method)(*args)
+        with self._lock:
+            save_fixture(self.root, method, args, value)
+        return value
+
+    def last_price(self, symbol):
+        return self._call("last_price", symbol)
+
+    def last_closes(self, symbols):
+        return self._call("last_closes", list(symbols))
+
+    def history(self, symbol, period="1d"):
+        return self._call("history", symbol, period)
+
+    def option_chain(self, symbol, expiry):
+        return self._call("option_chain", symbol, expiry)
+
+    def info(self, symbol):
+        return self._call("info", symbol)
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serves fixtures written by RecordingProvider; never touches the network."""
+
+    def __init__(self, root: Path, latency_ms: float = 0.0):
+        self.root = Path(root)
+        self.latency_ms = float(latency_ms or 0.0)
+        self.calls = 0
+
+    def _call(self, method: str, *args):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        path = _fixture_path(self.root, method, *args)
+        if not path.exists():
+            raise FixtureMissing(f"no recorded {method}{args} under {self.root}")
+        return _decode(json.loads(path.read_text())["value"])
+
+    def last_price(self, symbol):
+        return self._call("last_price", symbol)
+
+    def last_closes(self, symbols):
+        return self._call("last_closes", list(symbols))
+
+    def history(self, symbol, period="1d"):
+        return self._call("history", symbol, period)
+
+    def option_chain(self, symbol, expiry):
+        return self._call("option_chain", symbol, expiry)
+
+    def info(self, symbol):
+        return self._call("info", symbol)
+
+
+# ---- negative cache / circuit breaker ----------------------------------------
+
+class SymbolUnavailable(LookupError):
+    """This lookup failed recently and is still in the negative cache."""
+
+
+class CircuitOpen(RuntimeError):
+    """Yahoo is being skipped after repeated failures and there's no last-known value."""
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive upstream errors -> half-open after `cooldown`.
+
+    Half-open lets a single trial call through; success closes the circuit,
+    another error re-opens it for a full cooldown.
+    """
+
+    def __init__(self, threshold: int = MARKETDATA_BREAKER_FAILURES, cooldown: float = MARKETDATA_BREAKER_COOLDOWN):
+        self.threshold = max(1, int(threshold))
+        self.cooldown = float(cooldown)
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.opened_wall: datetime | None = None
+        self.trial = False
+        self.last_error = ""
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial and time.monotonic() - self.opened_at >= self.cooldown:
+                self.trial = True
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = self.opened_wall = None
+            self.trial = False
+
+    def failure(self, err: BaseException):
+        with self.lock:
+            self.failures += 1
+            self.last_error = f"{type(err).__name__}: {err}"[:200]
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self.opened_wall = datetime.now()
+                self.trial = False
+
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self.trial or time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+
+BREAKER = CircuitBreaker()
+_state_lock = threading.Lock()
+# Both dicts are guarded by _state_lock and kept oldest-first so the front is what gets dropped.
+_negative: dict[tuple, tuple[float, object]] = {}  # key -> (expires, empty value or None to raise)
+_last_good: dict[tuple, object] = {}  # key -> last non-empty value (prices: ("price", symbol))
+_SWEEP_EVERY = 60.0
+_next_sweep = 0.0
+
+
+def _put_negative(key, expires: float, value=None):
+    """Remember a failure; drops expired entries (at most every _SWEEP_EVERY s) and the oldest past the cap."""
+    global _next_sweep
+    now = time.monotonic()
+    if now >= _next_sweep or len(_negative) >= MARKETDATA_STATE_MAX:
+        for k in [k for k, (exp, _) in _negative.items() if exp <= now]:
+            del _negative[k]
+        _next_sweep = now + _SWEEP_EVERY
+    _negative.pop(key, None)
+    while len(_negative) >= MARKETDATA_STATE_MAX:
+        _negative.pop(next(iter(_negative)))
+    _negative[key] = (expires, value)
+
+
+def _put_last_good(key, value):
+    _last_good.pop(key, None)
+    while len(_last_good) >= MARKETDATA_STATE_MAX:
+        _last_good.pop(next(iter(_last_good)))
+    _last_good[key] = value
+
+
+def _get_last_good(key):
+    """Last-known value for `key` (moved to the back as most recently used), or None."""
+    value = _last_good.pop(key, None)
+    if value is not None:
+        _last_good[key] = value
+    return value
+
+
+def _is_empty(method: str, value) -> bool:
+    if method == "last_price":
+        return not value or float(value) <= 0
+    if method == "history":
+        return value is None or value.empty
+    if method == "option_chain":
+        return value is None or all(df is None or df.empty for df in value)
+    if method == "info":
+        return not value or not any(value.get(k) for k in ("quoteType", "shortName", "longName", "sector"))
+    return not value
+
+
+class ResilientProvider(MarketDataProvider):
+    """Negative-caches not-found/empty lookups and trips BREAKER on repeated upstream errors.
+
+    Last-known values are served ahead of both: a negative-cached key or an
+    upstream error only raises when nothing good was ever seen for it.
+    """
+
+    def __init__(self, inner: MarketDataProvider, negative_ttl: float = MARKETDATA_NEGATIVE_TTL,
+                 breaker: CircuitBreaker | None = None):
+        self.inner = inner
+        self.negative_ttl = float(negative_ttl)
+        self.breaker = breaker or BREAKER
+
+    def _remember_failure(self, key, empty_value=None):
+        with _state_lock:
+            _put_negative(key, time.monotonic() + self.negative_ttl, empty_value)
+
+    @staticmethod
+    def _last_key(key):
+        return ("price", key[1]) if key[0] == "last_price" else key
+
+    def _stale(self, key, err: BaseException):
+        with _state_lock:
+            value = _get_last_good(self._last_key(key))
+        if value is not None:
+            return value
+        raise err
+
+    def _call(self, method: str, *args):
+        key = (method, *args)
+        with _state_lock:
+            hit = _negative.get(key)
+            if hit is not None and hit[0] <= time.monotonic():
+                del _negative[key]
+                hit = None
+        if hit is not None:
+            if hit[1] is None:
+                return self._stale(key, SymbolUnavailable(
+                    f"{method}{args} failed recently; retrying after the negative TTL"))
+            return hit[1]
+        if not self.breaker.allow():
+            return self._stale(key, CircuitOpen(f"Yahoo circuit open ({self.breaker.last_error})"))
+        try:
+            value = getattr(self.inner, method)(*args)
+        except LookupError as e:
+            # Yahoo (or the fixture store) answered, just not for this key
+            self.breaker.success()
+            self._remember_failure(key)
+            return self._stale(key, e)
+        except Exception as e:
+            # Transport trouble (timeouts, 429s) says nothing about the symbol: the breaker
+            # counts it, and the next call tries again.
+            self.breaker.failure(e)
+            return self._stale(key, e)
+        self.breaker.success()
+        if _is_empty(method, value):
+            self._remember_failure(key, value)
+        else:
+            with _state_lock:
+                _put_last_good(self._last_key(key), value)
+        return value
+
+    def last_price(self, symbol):
+        return self._call("last_price", symbol)
+
+    def last_closes(self, symbols):
+        syms, out, now = list(symbols), {}, time.monotonic()
+        with _state_lock:
+            todo = [s for s in syms if _negative.get(("last_closes", s), (0, None))[0] <= now]
+            stale = {s: v for s in syms if (v := _get_last_good(("price", s))) is not None}
+        if not todo:
+            return {s: stale[s] for s in syms if s in stale}
+        if not self.breaker.allow():
+            return stale
+        try:
+            out = self.inner.last_closes(todo) or {}
+        except Exception as e:
+            self.breaker.failure(e)
+            return stale
+        if len(todo) > 1 and not any(out.get(s) for s in todo):
+            # yf.download swallows per-symbol errors, so a batch with no price at all is an
+            # upstream failure, not a batch of dead symbols; leave it to the breaker.
+            self.breaker.failure(RuntimeError(f"no closes for {len(todo)} symbol(s)"))
+            return stale
+        self.breaker.success()
+        with _state_lock:
+            for s in todo:
+                if out.get(s):
+                    _put_last_good(("price", s), out[s])
+                else:
+                    _put_negative(("last_closes", s), now + self.negative_ttl)
+        return {**{s: stale[s] for s in syms if s in stale and s not in out}, **out}
+
+    def history(self, symbol, period="1d"):
+        return self._call("history", symbol, period)
+
+    def option_chain(self, symbol, expiry):
+        return self._call("option_chain", symbol, expiry)
+
+    def info(self, symbol):
+        return self._call("info", symbol)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def status() -> dict:
+    """Breaker state for the UI: state, failures, last_error, retry_at, negative (cached failures)."""
+    b = BREAKER
+    state = b.state()
+    with _state_lock:
+        now = time.monotonic()
+        negative = sum(1 for exp, _ in _negative.values() if exp > now)
+    retry_at = b.opened_wall + timedelta(seconds=b.cooldown) if b.opened_wall else None
+    return {"state": state, "failures": b.failures, "last_error": b.last_error,
+            "retry_at": retry_at, "negative": negative}
+
+
+class CoalescingProvider(MarketDataProvider):
+    """Concurrent identical calls (e.g. many sessions missing the same quote) share one upstream request."""
+
+    def __init__(self, inner: MarketDataProvider):
+        self.inner = inner
+
+    def _call(self, method: str, *args):
+        key = (method, *(tuple(a) if isinstance(a, list) else a for a in args))
+        return singleflight.MARKET.do(key, lambda: getattr(self.inner, method)(*args))
+
+    def last_price(self, symbol):
+        return self._call("last_price", symbol)
+
+    def last_closes(self, symbols):
+        return self._call("last_closes", list(symbols))
+
+    def history(self, symbol, period="1d"):
+        return self._call("history", symbol, period)
+
+    def option_chain(self, symbol, expiry):
+        return self._call("option_chain", symbol, expiry)
+
+    def info(self, symbol):
+        return self._call("info", symbol)
+
+    def __getattr__(self, name):  # e.g. ReplayProvider.calls
+        return getattr(self.inner, name)
+
+
+_provider: MarketDataProvider | None = None
+_provider_lock = threading.Lock()
+
+
+def make_provider(mode: str = MARKETDATA_MODE, root: str = MARKETDATA_DIR,
+                  latency_ms: float = MARKETDATA_LATENCY_MS) -> MarketDataProvider:
+    mode = (mode or "live").strip().lower()
+    if mode == "replay":
+        inner = ReplayProvider(Path(root), latency_ms)
+    elif mode == "record":
+        inner = RecordingProvider(YFinanceProvider(), Path(root))
+    elif mode == "live":
+        inner = YFinanceProvider()
+    else:
+        raise ValueError(f"MARKETDATA_MODE must be live, record or replay (got {mode!r})")
+    return CoalescingProvider(ResilientProvider(inner))
+
+
+# per-context override (see scoped_provider); None means the process-wide provider
+_scoped: contextvars.ContextVar[MarketDataProvider | None] = contextvars.ContextVar("marketdata_provider",
+                                                                                   default=None)
+
+
+def get_provider() -> MarketDataProvider:
+    scoped = _scoped.get()
+    if scoped is not None:
+        return scoped
+    return _shared_provider()
+
+
+def _shared_provider() -> MarketDataProvider:
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = make_provider()
+        return _provider
+
+
+def set_provider(provider: MarketDataProvider | None):
+    """Swap the process-wide provider (benchmarks); None rebuilds it from config."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+def scoped_provider(wrap=None):
+    """Serve get_provider() in this context as wrap(process-wide provider); None clears it.
+
+    Streamlit runs each session's reruns on that session's own script thread,
+    so the override never reaches other sessions; asyncio.to_thread workers
+    copy the context and see it too.
+    """
+    _scoped.set(wrap(_shared_provider()) if wrap is not None else None)
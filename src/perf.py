@@ -0,0 +1,482 @@
+"""Opt-in performance inspector: where did this rerun spend its time?
+
+Turn it on with ?perf=1 in the URL or the Settings > Diagnostics toggle. While
+on, app.py routes the rerun's Supabase client, market-data calls, analytics
+functions and data helpers through a Recorder, and render_panel() shows total
+render time, per-table query counts/durations, Yahoo calls with cache hit/miss
+and the slowest helpers in the sidebar.
+
+Separately, ?profile=1 (or the Diagnostics profiling toggle) runs the page
+function under cProfile and tracemalloc via profile_call(). Both are
+process-wide costs, so this is off unless the operator sets PERF_PROFILING.
+render_profile() lists the top cumulative-time functions and allocation sites
+and offers the .pstats file for download (snakeviz / pstats).
+
+The same instrumentation feeds src/telemetry.py: with TELEMETRY_FILE set,
+every rerun is recorded (panel or not) and each query, provider call, helper
+and page render is also written out as a JSONL span.
+
+With both off, start() returns None and app.py keeps the plain client, module
+and functions, so nothing is wrapped and there is no per-call cost.
+"""
+import cProfile
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import update_wrapper
+
+import pandas as pd
+import streamlit as st
+
+from . import marketdata, telemetry
+from .config import PERF_PROFILING
+from .scheduler import YAHOO
+
+QUERY_PARAM = "perf"
+PREF_KEY = "perf_inspector"
+PROFILE_PARAM = "profile"
+PROFILE_KEY = "perf_profile"
+
+_WRITE_OPS = ("insert", "upsert", "update", "delete")
+
+
+def _flag(param: str, key: str) -> bool:
+    """?<param>=1 (or 0) in the URL wins; otherwise the session preference."""
+    try:
+        flag = st.query_params.get(param)
+    except Exception:
+        flag = None
+    if flag is not None:
+        return str(flag).strip().lower() in ("1", "true", "on", "yes")
+    return bool(st.session_state.get(key, False))
+
+
+def enabled() -> bool:
+    return _flag(QUERY_PARAM, PREF_KEY)
+
+
+def profiling() -> bool:
+    """?profile=1 / the session toggle, honoured only when the operator set PERF_PROFILING."""
+    return PERF_PROFILING and _flag(PROFILE_PARAM, PROFILE_KEY)
+
+
+class Recorder:
+    """Timings for one script run; safe to feed from the loader's worker threads.
+
+    show keeps the in-memory tables for render_panel(); spans forwards every
+    measurement to telemetry.emit tagged with the rerun's account and page.
+    """
+
+    def __init__(self, show: bool = True, spans: bool = False, account=None):
+        self.show = show
+        self.spans = spans
+        self.account = account
+        self.page = None
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.queries: list[tuple[str, str, float, int]] = []  # table, op, seconds, rows
+        self.yahoo: list[tuple[str, str, str, float, bool]] = []  # method, symbol, helper, seconds, ok
+        self.helpers: dict[str, list] = defaultdict(lambda: [0, 0.0, 0.0])  # calls, total, max
+        self.cache: dict[str, list] = defaultdict(lambda: [0, 0])  # helper -> hits, misses
+        self._stack = threading.local()
+
+    # ---- recording ------------------------------------------------------------
+    def query(self, table: str, op: str, seconds: float, rows: int):
+        if self.show:
+            with self.lock:
+                self.queries.append((table, op, seconds, rows))
+        if self.spans:
+            telemetry.emit("db", f"{table}.{op}", seconds, self.account, self.page, rows=rows)
+
+    def yahoo_call(self, method: str, symbol: str, seconds: float, ok: bool):
+        frames = getattr(self._stack, "frames", None)
+        helper = frames[-1][0] if frames else "-"
+        if frames:
+            frames[-1][1] = True
+        if self.show:
+            with self.lock:
+                self.yahoo.append((method, symbol, helper, seconds, ok))
+        if self.spans:
+            telemetry.emit("yahoo", method, seconds, self.account, self.page, cache="miss",
+                           symbol=symbol, helper=helper, ok=ok)
+
+    def helper_done(self, label: str, seconds: float, cached: bool, missed: bool):
+        if self.show:
+            with self.lock:
+                h = self.helpers[label]
+                h[0] += 1
+                h[1] += seconds
+                h[2] = max(h[2], seconds)
+                if cached:
+                    self.cache[label][1 if missed else 0] += 1
+        if self.spans:
+            telemetry.emit("helper", label, seconds, self.account, self.page,
+                           cache=("miss" if missed else "hit") if cached else None)
+
+    def page_done(self, seconds: float, error: str | None = None):
+        if self.spans:
+            telemetry.emit("page", self.page or "-", seconds, self.account, self.page,
+                           **({"error": error} if error else {}))
+
+    def timed(self, fn=None, *, name: str | None = None, cached: bool = False):
+        """Decorator timing a helper; cached=True also counts st.cache_data hits vs misses.
+
+        Meant for the cached Yahoo helpers: a call that reaches the market-data
+        provider is a miss, anything else was served from the cache.
+        """
+        if fn is None:
+            return lambda f: self.timed(f, name=name, cached=cached)
+        label = name or getattr(fn, "__name__", repr(fn))
+        return _Timed(fn, self, label, cached)
+
+    def client(self, client):
+        return _TracedClient(client, self) if client is not None else None
+
+    def module(self, mod):
+        return _TracedModule(mod, self)
+
+    # ---- summaries ------------------------------------------------------------
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def query_table(self) -> pd.DataFrame:
+        with self.lock:
+            rows = list(self.queries)
+        df = pd.DataFrame(rows, columns=["table", "op", "seconds", "rows"])
+        if df.empty:
+            return df
+        out = df.groupby(["table", "op"], as_index=False).agg(
+            calls=("seconds", "size"), total_ms=("seconds", "sum"), max_ms=("seconds", "max"), rows=("rows", "sum"))
+        out[["total_ms", "max_ms"]] *= 1000.0
+        return out.sort_values("total_ms", ascending=False).reset_index(drop=True)
+
+    def yahoo_table(self) -> pd.DataFrame:
+        with self.lock:
+            calls = list(self.yahoo)
+            cache = {k: list(v) for k, v in self.cache.items()}
+        df = pd.DataFrame(calls, columns=["method", "symbol", "helper", "seconds", "ok"])
+        per_helper = {}
+        for helper, g in df.groupby("helper"):
+            per_helper[helper] = (len(g), g["seconds"].sum() * 1000.0, int((~g["ok"]).sum()))
+        rows = []
+        for helper in sorted(set(per_helper) | set(cache)):
+            n, ms, failed = per_helper.get(helper, (0, 0.0, 0))
+            hits, misses = cache.get(helper, (None, None))
+            rows.append({"helper": helper, "yahoo_calls": n, "yahoo_ms": ms, "failed": failed,
+                         "cache_hits": hits, "cache_misses": misses})
+        return pd.DataFrame(rows, columns=["helper", "yahoo_calls", "yahoo_ms", "failed", "cache_hits", "cache_misses"])
+
+    def helper_table(self, top: int = 15) -> pd.DataFrame:
+        with self.lock:
+            rows = [{"helper": k, "calls": v[0], "total_ms": v[1] * 1000.0, "max_ms": v[2] * 1000.0}
+                    for k, v in self.helpers.items()]
+        df = pd.DataFrame(rows, columns=["helper", "calls", "total_ms", "max_ms"])
+        return df.sort_values("total_ms", ascending=False).head(top).reset_index(drop=True)
+
+
+class _Timed:
+    """Callable wrapper that keeps the wrapped object's attributes (e.g. CachedFunc.clear)."""
+
+    def __init__(self, fn, rec: Recorder, label: str, cached: bool):
+        try:
+            update_wrapper(self, fn)
+        except AttributeError:
+            pass
+        self._fn, self._rec, self._label, self._cached = fn, rec, label, cached
+
+    def __call__(self, *args, **kwargs):
+        rec = self._rec
+        frames = getattr(rec._stack, "frames", None)
+        if frames is None:
+            frames = rec._stack.frames = []
+        frame = [self._label, False]
+        frames.append(frame)
+        t0 = time.perf_counter()
+        try:
+            return self._fn(*args, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            frames.pop()
+            if frames and frame[1]:
+                frames[-1][1] = True
+            rec.helper_done(self._label, dt, self._cached, frame[1])
+
+    def __getattr__(self, name):
+        return getattr(self._fn, name)
+
+
+def untimed(fn=None, *, name: str | None = None, cached: bool = False):
+    """Recorder.timed's no-op twin for when the inspector is off."""
+    if fn is None:
+        return lambda f: f
+    return fn
+
+
+# ---- Supabase -------------------------------------------------------------------
+
+class _TracedClient:
+    def __init__(self, client, rec: Recorder):
+        self.__wrapped__ = client
+        self._rec = rec
+
+    def table(self, name):
+        return _TracedQuery(self.__wrapped__.table(name), self._rec, name, "select")
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, fn, *args, **kwargs):
+        return _TracedQuery(self.__wrapped__.rpc(fn, *args, **kwargs), self._rec, f"rpc:{fn}", "call")
+
+    def __getattr__(self, name):
+        return getattr(self.__wrapped__, name)
+
+
+class _TracedQuery:
+    """Wraps a (mutating) query builder; every execute() is timed against its table."""
+
+    def __init__(self, builder, rec: Recorder, table: str, op: str):
+        self._b, self._rec, self._table, self._op = builder, rec, table, op
+
+    def execute(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            res = self._b.execute(*args, **kwargs)
+        except Exception:
+            self._rec.query(self._table, self._op + " (error)", time.perf_counter() - t0, 0)
+            raise
+        data = getattr(res, "data", None)
+        self._rec.query(self._table, self._op, time.perf_counter() - t0, len(data) if isinstance(data, list) else 0)
+        return res
+
+    def _wrap(self, out, op):
+        if out is self._b or hasattr(out, "execute"):
+            return _TracedQuery(out, self._rec, self._table, op)
+        return out
+
+    def __getattr__(self, name):
+        attr = getattr(self._b, name)
+        op = name if name in _WRITE_OPS else self._op
+        if not callable(attr):
+            return self._wrap(attr, op)  # e.g. the `not_` property
+
+        def call(*args, **kwargs):
+            return self._wrap(attr(*args, **kwargs), op)
+        return call
+
+
+class _TracedModule:
+    """Module proxy whose functions are timed as `<module>.<name>`."""
+
+    def __init__(self, mod, rec: Recorder):
+        self.__wrapped__ = mod
+        self._rec = rec
+        self._prefix = mod.__name__.rsplit(".", 1)[-1]
+
+    def __getattr__(self, name):
+        attr = getattr(self.__wrapped__, name)
+        if callable(attr) and not isinstance(attr, type):
+            return self._rec.timed(attr, name=f"{self._prefix}.{name}")
+        return attr
+
+
+# ---- market data ------------------------------------------------------------------
+
+class _TracedProvider(marketdata.MarketDataProvider):
+    """Provider shim recording into one rerun's Recorder (installed with marketdata.scoped_provider)."""
+
+    def __init__(self, inner: marketdata.MarketDataProvider, rec: Recorder):
+        self.inner = inner
+        self._rec = rec
+
+    def _call(self, method: str, *args):
+        rec = self._rec
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            out = getattr(self.inner, method)(*args)
+            ok = True
+            return out
+        finally:
+            sym = args[0] if args else ""
+            sym = ",".join(sym) if isinstance(sym, (list, tuple)) else str(sym)
+            rec.yahoo_call(method, sym, time.perf_counter() - t0, ok)
+
+    def last_price(self, symbol):
+        return self._call("last_price", symbol)
+
+    def last_closes(self, symbols):
+        return self._call("last_closes", list(symbols))
+
+    def history(self, symbol, period="1d"):
+        return self._call("history", symbol, period)
+
+    def option_chain(self, symbol, expiry):
+        return self._call("option_chain", symbol, expiry)
+
+    def info(self, symbol):
+        return self._call("info", symbol)
+
+    def __getattr__(self, name):  # e.g. ReplayProvider.calls
+        return getattr(self.inner, name)
+
+
+def start() -> Recorder | None:
+    """Begin recording this rerun if the inspector or telemetry is on; None (and no wrapping) otherwise."""
+    show, spans = enabled(), telemetry.enabled()
+    if not (show or spans):
+        marketdata.scoped_provider(None)  # drop a previous rerun's tracing on this thread
+        return None
+    user = st.session_state.get("user")
+    rec = Recorder(show=show, spans=spans,
+                   account=st.session_state.get("active_user_id") or getattr(user, "id", None))
+    # Only this session's rerun sees the traced provider; the Recorder goes away with the rerun.
+    marketdata.scoped_provider(lambda provider: _TracedProvider(provider, rec))
+    return rec
+
+
+def render_panel(rec: Recorder | None):
+    """Sidebar summary of the rerun; call last so it covers the whole page."""
+    if rec is None or not rec.show:
+        return
+    total = rec.elapsed()
+    queries = rec.query_table()
+    yahoo = rec.yahoo_table()
+    helpers = rec.helper_table()
+    with st.sidebar.expander("⏱ Performance inspector", expanded=True):
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Render", f"{total:.2f}s")
+        c2.metric("Queries", int(queries["calls"].sum()) if not queries.empty else 0,
+                  f"{queries['total_ms'].sum():.0f} ms" if not queries.empty else None, delta_color="off")
+        c3.metric("Yahoo", int(yahoo["yahoo_calls"].sum()) if not yahoo.empty else 0,
+                  f"{yahoo['yahoo_ms'].sum():.0f} ms" if not yahoo.empty else None, delta_color="off")
+        st.caption("Supabase by table")
+        if queries.empty:
+            st.write("No queries.")
+        else:
+            st.dataframe(queries, hide_index=True, width="stretch",
+                         column_config={"total_ms": st.column_config.NumberColumn(format="%.1f"),
+                                        "max_ms": st.column_config.NumberColumn(format="%.1f")})
+        st.caption("Yahoo calls and cache hits")
+        if yahoo.empty:
+            st.write("No Yahoo lookups.")
+        else:
+            st.dataframe(yahoo, hide_index=True, width="stretch",
+                         column_config={"yahoo_ms": st.column_config.NumberColumn(format="%.1f")})
+        sched = YAHOO.snapshot()
+        st.caption(f"Yahoo scheduler: {sched['tokens']:.1f} tokens, {sched['active']} in flight, "
+                   f"{sched['waiting']} queued · {sched['retries']} retries, {sched['wait_s']:.1f}s queued since start")
+        st.caption("Slowest helpers (inclusive)")
+        st.dataframe(helpers, hide_index=True, width="stretch",
+                     column_config={"total_ms": st.column_config.NumberColumn(format="%.1f"),
+                                    "max_ms": st.column_config.NumberColumn(format="%.1f")})
+        st.caption("Dashboard reads on the async Supabase client show up under load_dashboard_data, not per table.")
+
+
+# ---- cProfile / tracemalloc capture ------------------------------------------------
+
+# tracemalloc is process-wide, so only one session captures allocations at a time.
+_tracemalloc_lock = threading.Lock()
+
+
+@dataclass
+class Capture:
+    label: str
+    seconds: float = 0.0
+    stats: pstats.Stats | None = None
+    allocations: list[tracemalloc.Statistic] = field(default_factory=list)
+    peak_bytes: int = 0
+    tracemalloc_busy: bool = False
+
+    def pstats_bytes(self) -> bytes:
+        """Same bytes Stats.dump_stats writes, so `python -m pstats` / snakeviz can open it."""
+        return marshal.dumps(self.stats.stats) if self.stats is not None else b""
+
+    def top_functions(self, n: int = 30) -> pd.DataFrame:
+        rows = []
+        if self.stats is not None:
+            for (filename, line, func), (cc, nc, tt, ct, _callers) in self.stats.stats.items():
+                rows.append({"function": func, "where": f"{_short_path(filename)}:{line}",
+                             "calls": nc, "tottime_ms": tt * 1000.0, "cumtime_ms": ct * 1000.0})
+        df = pd.DataFrame(rows, columns=["function", "where", "calls", "tottime_ms", "cumtime_ms"])
+        return df.sort_values("cumtime_ms", ascending=False).head(n).reset_index(drop=True)
+
+    def top_allocations(self, n: int = 20) -> pd.DataFrame:
+        rows = [{"where": f"{_short_path(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+                 "size_kib": s.size / 1024.0, "blocks": s.count} for s in self.allocations[:n]]
+        return pd.DataFrame(rows, columns=["where", "size_kib", "blocks"])
+
+
+def _short_path(filename: str) -> str:
+    if "site-packages" in filename:
+        return filename.split("site-packages" + os.sep, 1)[-1]
+    try:
+        return os.path.relpath(filename)
+    except ValueError:
+        return filename
+
+
+def profile_call(label: str, fn, *args, **kwargs) -> Capture:
+    """Run fn under cProfile (+ tracemalloc when free); exceptions, incl. st.stop(), still propagate.
+
+    The capture is stored on the session and shown by render_profile(); only
+    the calling thread is profiled, so the loader's worker threads show up as
+    time spent waiting in load_dashboard_data.
+    """
+    cap = Capture(label)
+    st.session_state["_perf_capture"] = cap
+    traced = _tracemalloc_lock.acquire(blocking=False)
+    cap.tracemalloc_busy = not traced
+    prof = cProfile.Profile()
+    if traced:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        prof.enable()
+        try:
+            fn(*args, **kwargs)
+        finally:
+            prof.disable()
+    finally:
+        cap.seconds = time.perf_counter() - t0
+        if traced:
+            try:
+                cap.peak_bytes = tracemalloc.get_traced_memory()[1]
+                cap.allocations = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, cProfile.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                ]).statistics("lineno")
+            finally:
+                tracemalloc.stop()
+                _tracemalloc_lock.release()
+        cap.stats = pstats.Stats(prof)
+    return cap
+
+
+def render_profile(cap: Capture | None = None):
+    """Expander with the last capture's hot functions, allocation sites and .pstats download."""
+    cap = cap or st.session_state.get("_perf_capture")
+    if cap is None:
+        return
+    with st.expander(f"🔬 Profile: {cap.label} ({cap.seconds:.2f}s)", expanded=False):
+        st.caption("Top functions by cumulative time")
+        st.dataframe(cap.top_functions(), hide_index=True, width="stretch",
+                     column_config={"tottime_ms": st.column_config.NumberColumn(format="%.1f"),
+                                    "cumtime_ms": st.column_config.NumberColumn(format="%.1f")})
+        if cap.tracemalloc_busy:
+            st.caption("Allocation tracking skipped: another session was capturing at the same time.")
+        else:
+            st.caption(f"Top allocation sites still held at the end of the render (peak {cap.peak_bytes / 2**20:.1f} MiB)")
+            st.dataframe(cap.top_allocations(), hide_index=True, width="stretch",
+                         column_config={"size_kib": st.column_config.NumberColumn(format="%.1f")})
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        slug = "".join(c if c.isalnum() else "-" for c in cap.label.lower()).strip("-")
+        st.download_button("Download .pstats", cap.pstats_bytes(), file_name=f"{slug}-{stamp}.pstats",
+                           mime="application/octet-stream", key="_perf_pstats_download")
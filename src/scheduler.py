@@ -0,0 +1,153 @@
+"""Central scheduler for Yahoo Finance traffic.
+
+Every yfinance network call in src/marketdata.YFinanceProvider goes through
+YAHOO.run(), which enforces:
+
+- a token bucket (YAHOO_RATE_PER_SEC sustained, YAHOO_BURST burst) shared by
+  every session in the process;
+- priority classes: INTERACTIVE (a page waiting on the answer) is always
+  served before BACKGROUND (prefetch / bulk refresh), and background work
+  can't spend the last YAHOO_INTERACTIVE_RESERVE tokens;
+- at most YAHOO_MAX_CONCURRENCY requests in flight;
+- up to YAHOO_MAX_RETRIES retries of rate-limit / transport errors with
+  jittered exponential backoff (YAHOO_BACKOFF_BASE .. YAHOO_BACKOFF_MAX s).
+
+Callers pick the class with the background() context manager; the default is
+INTERACTIVE. The class follows contextvars, so asyncio.to_thread workers (the
+dashboard loader) inherit it.
+"""
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import (
+    YAHOO_BACKOFF_BASE,
+    YAHOO_BACKOFF_MAX,
+    YAHOO_BURST,
+    YAHOO_INTERACTIVE_RESERVE,
+    YAHOO_MAX_CONCURRENCY,
+    YAHOO_MAX_RETRIES,
+    YAHOO_RATE_PER_SEC,
+)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("marketdata_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background():
+    """Schedule Yahoo calls made inside the block as BACKGROUND work."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_retryable(err: BaseException) -> bool:
+    """Rate limiting and transport hiccups; "no data for this symbol" is not worth a retry."""
+    if isinstance(err, LookupError):
+        return False
+    if isinstance(err, (ConnectionError, TimeoutError)):
+        return True
+    text = f"{type(err).__name__} {err}".lower()
+    return any(s in text for s in ("ratelimit", "rate limit", "too many requests", "429", "timed out",
+                                   "timeout", "connection", "temporarily unavailable", "502", "503", "504"))
+
+
+class Scheduler:
+    def __init__(self, name: str, rate: float, burst: float, max_concurrency: int, retries: int,
+                 backoff_base: float, backoff_max: float, reserve: float = 0.0):
+        self.name = name
+        self.rate = max(float(rate), 1e-6)
+        self.burst = max(float(burst), 1.0)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.retries = max(0, int(retries))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.reserve = min(float(reserve), self.burst - 1.0)
+        self._cond = threading.Condition()
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._active = 0
+        self._waiting: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "wait_s": 0.0}
+
+    # ---- admission --------------------------------------------------------------
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def _acquire(self, priority: int, cost: float):
+        floor = self.reserve if priority == BACKGROUND else 0.0
+        # The bucket never holds more than `burst`, so a bigger cost could never be admitted
+        # (background work must also leave `floor` behind): charge at most what can exist.
+        cost = min(max(float(cost), 1.0), self.burst - floor)
+        ticket = (priority, next(self._seq))
+        t0 = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                self._refill()
+                head = self._waiting[0] == ticket
+                if head and self._active < self.max_concurrency and self._tokens - cost >= floor:
+                    heapq.heappop(self._waiting)
+                    self._tokens -= cost
+                    self._active += 1
+                    self.stats["calls"] += 1
+                    self.stats["wait_s"] += time.monotonic() - t0
+                    self._cond.notify_all()
+                    return
+                timeout = None
+                if head and self._active < self.max_concurrency:
+                    timeout = max(0.005, (cost + floor - self._tokens) / self.rate)
+                self._cond.wait(timeout)
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+    # ---- public -----------------------------------------------------------------
+    def run(self, fn, *args, cost: float = 1.0, priority: int | None = None):
+        """fn(*args) once admitted; retryable errors are retried with jittered backoff."""
+        priority = _priority.get() if priority is None else priority
+        attempt = 0
+        while True:
+            self._acquire(priority, cost)
+            try:
+                return fn(*args)
+            except Exception as e:
+                if attempt >= self.retries or not is_retryable(e):
+                    self._count("failures")
+                    raise
+            finally:
+                self._release()
+            self._count("retries")
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _count(self, stat: str):
+        with self._cond:
+            self.stats[stat] += 1
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            self._refill()
+            return {"tokens": round(self._tokens, 2), "active": self._active,
+                    "waiting": len(self._waiting), **self.stats}
+
+
+YAHOO = Scheduler("yahoo", YAHOO_RATE_PER_SEC, YAHOO_BURST, YAHOO_MAX_CONCURRENCY, YAHOO_MAX_RETRIES,
+                  YAHOO_BACKOFF_BASE, YAHOO_BACKOFF_MAX, reserve=YAHOO_INTERACTIVE_RESERVE)
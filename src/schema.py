@@ -0,0 +1,162 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any
+
+import pandas as pd
+
+@dataclass(frozen=True)
+class Table:
+    """Columns of a Supabase table and the Python type PostgREST returns for each."""
+    name: str
+    columns: dict[str, type]
+
+@dataclass(frozen=True)
+class View:
+    """The columns one call site reads from a table.
+
+    `aliases` are frame columns filled with the first non-null source, left to
+    right (ticker/symbol, strike_price/strike, expiration_date/expiration,
+    contracts/quantity). They are resolved while the columnar lists are built,
+    so frames from a View don't need normalize_columns().
+    """
+    table: Table
+    columns: tuple[str, ...]
+    aliases: tuple[tuple[str, tuple[str, ...]], ...] = ()
+    defaults: tuple[tuple[str, Any], ...] = ()
+
+    def __post_init__(self):
+        unknown = [c for c in self.columns if c not in self.table.columns]
+        if unknown:
+            raise ValueError(f"{self.table.name}: unknown column(s) {unknown}")
+
+    @property
+    def select(self) -> str:
+        return ",".join(self.columns)
+
+    def frame(self, rows: list[dict] | None) -> pd.DataFrame:
+        rows = rows or []
+        data = {c: [r.get(c) for r in rows] for c in self.columns}
+        for name, sources in self.aliases:
+            cols = [data[s] for s in sources]
+            data[name] = [next((v for v in vals if v is not None), None) for vals in zip(*cols)]
+        for name, default in self.defaults:
+            data[name] = [default if v is None else v for v in data[name]]
+        return pd.DataFrame(data)
+
+
+TRANSACTIONS = Table("transactions", {
+    "id": int,
+    "user_id": str,
+    "transaction_date": date,
+    "type": str,
+    "amount": float,
+    "currency": str,
+    "related_symbol": str,
+    "description": str,
+    "updated_at": datetime,
+})
+
+ASSETS = Table("assets", {
+    "id": int,
+    "user_id": str,
+    "ticker": str,
+    "symbol": str,
+    "type": str,
+    "quantity": float,
+    "cost_basis": float,
+    "last_price": float,
+    "strike_price": float,
+    "expiration_date": date,
+    "expiration": date,
+    "date_acquired": date,
+    "updated_at": datetime,
+})
+
+OPTIONS = Table("options", {
+    "id": int,
+    "user_id": str,
+    "ticker": str,
+    "symbol": str,
+    "type": str,
+    "strike_price": float,
+    "expiration_date": date,
+    "expiration": date,
+    "contracts": int,
+    "quantity": int,
+    "premium_received": float,
+    "cost_basis": float,
+    "status": str,
+    "open_date": date,
+    "closing_price": float,
+    "closed_date": datetime,
+    "linked_asset_id": int,
+    "updated_at": datetime,
+})
+
+PORTFOLIO_HISTORY = Table("portfolio_history", {
+    "id": int,
+    "user_id": str,
+    "snapshot_date": date,
+    "total_equity": float,
+    "exchange_rate": float,
+    "currency": str,
+    "cash_balance": float,
+    "stock_value": float,
+    "long_option_value": float,
+    "short_liability_estimate": float,
+    "updated_at": datetime,
+})
+
+SYMBOL_METADATA = Table("symbol_metadata", {
+    "id": int,
+    "symbol": str,
+    "sector": str,
+    "industry": str,
+    "name": str,
+    "exchange": str,
+    "currency": str,
+    "quote_type": str,
+    "fetched_at": datetime,
+})
+
+_SYMBOL = ("symbol", ("symbol", "ticker"))
+_STRIKE = ("strike", ("strike_price",))
+# expiration_date wins when both are set (older rows may carry a wrong `expiration`)
+_EXPIRY = ("expiration", ("expiration_date", "expiration"))
+
+# Dashboard / Option Details / pricing: open stock + LEAP positions.
+ASSET_POSITIONS = View(
+    ASSETS,
+    ("id", "ticker", "symbol", "type", "quantity", "cost_basis", "last_price", "strike_price", "expiration_date",
+     "expiration", "date_acquired"),
+    aliases=(_SYMBOL, _STRIKE, _EXPIRY),
+    defaults=(("quantity", 0),),
+)
+
+# Dashboard / Option Details / trade entry: open short options.
+OPEN_OPTIONS = View(
+    OPTIONS,
+    ("id", "ticker", "symbol", "type", "strike_price", "expiration_date", "expiration", "contracts", "quantity",
+     "premium_received", "cost_basis", "open_date", "status", "linked_asset_id"),
+    aliases=(_SYMBOL, _STRIKE, _EXPIRY, ("quantity", ("quantity", "contracts"))),
+    defaults=(("quantity", 0),),
+)
+
+# Position lookups before a write (trade entry, reversal helpers).
+ASSET_LOTS = View(ASSETS, ("id", "ticker", "symbol", "type", "quantity", "cost_basis", "strike_price",
+                           "expiration_date", "expiration"), aliases=(_EXPIRY,))
+OPTION_LOTS = View(OPTIONS, ("id", "strike_price", "contracts", "quantity"))
+ASSET_LABELS = View(ASSETS, ("id", "ticker", "quantity"))
+
+SNAPSHOTS = View(PORTFOLIO_HISTORY, ("id", "snapshot_date", "total_equity", "exchange_rate", "currency"))
+
+LEDGER_ROWS = View(
+    TRANSACTIONS,
+    ("id", "user_id", "transaction_date", "type", "amount", "currency", "related_symbol", "description"),
+)
+
+# Sector view / symbol metadata fill.
+SYMBOL_INFO = View(
+    SYMBOL_METADATA,
+    ("symbol", "sector", "industry", "name", "exchange", "currency", "quote_type", "fetched_at"),
+)
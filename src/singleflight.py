@@ -0,0 +1,127 @@
+"""Coalesce concurrent identical calls onto one in-flight call.
+
+When several sessions miss st.cache_data for the same quote, chain or page of
+rows at the same moment (e.g. everyone opening the dashboard at the open),
+only the first caller ("leader") runs the fetch; the others block until it
+finishes and get the same result (or exception). Nothing is cached past the
+call itself, so freshness is exactly what it was without coalescing.
+
+Followers receive a copy of mutable results (row dicts, DataFrames) so no two
+sessions ever share an object.
+
+    rows = singleflight.DB.do(("transactions", uid, page), lambda: q.execute().data)
+    res = await singleflight.ASYNC_DB.do(key, lambda: q.execute())
+"""
+import asyncio
+import copy
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+
+
+def share(value):
+    """Copy of `value` that's safe to hand to another session."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: share(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [share(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(share(v) for v in value)
+    if isinstance(value, SimpleNamespace):
+        return SimpleNamespace(**{k: share(v) for k, v in vars(value).items()})
+    if isinstance(value, (str, bytes, int, float, bool, type(None))):
+        return value
+    return copy.copy(value)
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: BaseException | None = None
+
+
+class Group:
+    """Thread-level single flight (Streamlit script threads, worker pools)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn):
+        """Run fn() once per concurrent `key`; a None key means "don't coalesce"."""
+        if key is None:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return share(call.value)
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class AsyncGroup:
+    """Single flight for coroutines on one event loop (the dashboard loader's)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, coro_fn):
+        if key is None:
+            return await coro_fn()
+        fut = self._calls.get(key)
+        if fut is not None and fut.get_loop() is asyncio.get_running_loop():
+            self.followers += 1
+            return share(await asyncio.shield(fut))
+        fut = asyncio.get_running_loop().create_future()
+        # Followers may all have gone away; don't log "exception was never retrieved".
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = fut
+        self.leaders += 1
+        try:
+            value = await coro_fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(value)
+            return value
+        finally:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+
+
+MARKET = Group("market")
+DB = Group("db")
+ASYNC_DB = AsyncGroup("db-async")
@@ -0,0 +1,121 @@
+"""Persisted symbol metadata: sector, industry, name, exchange, currency, quote type.
+
+lookup() answers from public.symbol_metadata with a single `symbol in (...)`
+query. Symbols that are missing, or older than SYMBOL_METADATA_TTL_DAYS, are
+handed to one background fill per batch, which calls Ticker.info through the
+Yahoo scheduler at BACKGROUND priority and writes all rows at once through
+public.upsert_symbol_metadata() (the table is read-only to users under row
+level security). Until a symbol has been filled it simply has no row, so a
+page never waits on .info. A fill that fails keeps its symbols out of new
+fills for SYMBOL_FILL_RETRY_SECONDS, so a broken write path doesn't turn
+every lookup into another Yahoo batch.
+
+    meta = symbols.lookup(supabase, ["AAPL", "SHOP.TO"])
+    meta.loc["AAPL", "sector"]
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from . import marketdata, scheduler
+from .config import SYMBOL_FILL_RETRY_SECONDS, SYMBOL_METADATA_TTL_DAYS
+from .fetch import execute
+from .schema import SYMBOL_INFO
+
+log = logging.getLogger(__name__)
+
+UNKNOWN = "Unknown"
+# supabase/migrations/20261019000800_symbol_metadata_rls.sql
+UPSERT_RPC = "upsert_symbol_metadata"
+UPSERT_BATCH = 200
+
+# Symbols a background fill is already working on (shared by every session),
+# and symbols whose last fill failed -> monotonic time they may be tried again.
+_pending: set[str] = set()
+_failed: dict[str, float] = {}
+_pending_lock = threading.Lock()
+
+
+def from_info(symbol: str, info: dict | None) -> dict:
+    """symbol_metadata row from a yfinance Ticker.info dict (empty info -> all-null row)."""
+    info = info or {}
+    return {
+        "symbol": symbol,
+        "sector": info.get("sector") or None,
+        "industry": info.get("industry") or None,
+        "name": info.get("longName") or info.get("shortName") or None,
+        "exchange": info.get("fullExchangeName") or info.get("exchange") or None,
+        "currency": info.get("currency") or None,
+        "quote_type": info.get("quoteType") or None,
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def lookup(client, symbols) -> pd.DataFrame:
+    """Stored metadata for `symbols` (index = symbol); schedules a fill for missing / stale ones."""
+    syms = sorted({str(s) for s in symbols if s})
+    rows = []
+    if syms:
+        try:
+            rows = execute(client.table(SYMBOL_INFO.table.name).select(SYMBOL_INFO.select).in_("symbol", syms)).data or []
+        except Exception as e:
+            log.warning("symbol_metadata lookup failed: %s", e)
+    df = SYMBOL_INFO.frame(rows).drop_duplicates("symbol", keep="last")
+    fetched = pd.to_datetime(df["fetched_at"], utc=True, errors="coerce")
+    cutoff = pd.Timestamp.now(tz="UTC") - timedelta(days=SYMBOL_METADATA_TTL_DAYS)
+    fresh = set(df.loc[fetched >= cutoff, "symbol"])
+    todo = [s for s in syms if s not in fresh]
+    if todo:
+        fill_async(client, todo)
+    return df.set_index("symbol")
+
+
+def fill(client, symbols) -> int:
+    """Fetch .info for `symbols` as BACKGROUND Yahoo work and upsert them in one batch."""
+    provider = marketdata.get_provider()
+    rows = []
+    with scheduler.background():
+        for sym in symbols:
+            try:
+                rows.append(from_info(sym, provider.info(sym)))
+            except marketdata.CircuitOpen:
+                break  # Yahoo is down; the next lookup schedules these again
+            except Exception as e:
+                # negative-cached by the provider; retried on a later lookup
+                log.info("symbol_metadata: no info for %s (%s)", sym, e)
+    for i in range(0, len(rows), UPSERT_BATCH):
+        batch = [{k: v for k, v in r.items() if k != "fetched_at"} for r in rows[i:i + UPSERT_BATCH]]
+        client.rpc(UPSERT_RPC, {"p_rows": batch}).execute()
+    return len(rows)
+
+
+def fill_async(client, symbols) -> threading.Thread | None:
+    """Run fill() on a daemon thread for the symbols no other fill is already handling."""
+    now = time.monotonic()
+    with _pending_lock:
+        for s in [s for s, until in _failed.items() if until <= now]:
+            del _failed[s]
+        todo = [s for s in dict.fromkeys(symbols) if s not in _pending and s not in _failed]
+        _pending.update(todo)
+    if not todo:
+        return None
+    # the perf inspector's traced client records into a page render; this outlives it
+    client = getattr(client, "__wrapped__", client)
+
+    def _run():
+        try:
+            fill(client, todo)
+        except Exception as e:
+            log.warning("symbol_metadata fill failed (retrying in %ss): %s", SYMBOL_FILL_RETRY_SECONDS, e)
+            with _pending_lock:
+                _failed.update(dict.fromkeys(todo, time.monotonic() + SYMBOL_FILL_RETRY_SECONDS))
+        finally:
+            with _pending_lock:
+                _pending.difference_update(todo)
+
+    t = threading.Thread(target=_run, name="symbol-metadata-fill", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,413 @@
+"""Synthetic portfolios for scale testing.
+
+generate() simulates an account week by week and returns rows shaped exactly
+like the ones app.py writes (log_transaction / update_asset_position /
+update_short_option_position / capture_snapshot), so every page can render
+them:
+
+  * monthly USD deposits with a CAD-basis twin, the odd withdrawal
+  * wheel lots per symbol: cash-secured put -> expire / buy-to-close /
+    assignment (OPTION_EXPIRE + TRADE_STOCK under one TXG) -> covered calls
+    -> called away
+  * quarterly dividends on held shares
+  * LEAP calls bought ~18 months out and rolled (Sell + Buy, one TXG) once
+    they are inside ~6 months
+  * a weekly portfolio_history row valued from the same simulated prices
+
+Cash is tracked as the sum of USD rows and a put is only sold when it is
+cash-secured, so the ledger balances. write_client() / write_postgres() load
+the result into a Supabase-style client (e.g. src/fakedb) or a local Postgres.
+"""
+import math
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+
+@dataclass(frozen=True)
+class Profile:
+    years: int
+    symbols: int
+    lots_per_symbol: int     # wheel lots running side by side on each symbol
+    lot_budget: float        # USD a lot may tie up securing puts
+    leap_slots: int          # LEAP positions kept open (and rolled) at once
+    monthly_deposit: float
+
+
+SIZES = {
+    "small": Profile(years=2, symbols=4, lots_per_symbol=1, lot_budget=15_000, leap_slots=2, monthly_deposit=2_000),
+    "medium": Profile(years=6, symbols=20, lots_per_symbol=2, lot_budget=20_000, leap_slots=12, monthly_deposit=6_000),
+    "huge": Profile(years=15, symbols=48, lots_per_symbol=4, lot_budget=25_000, leap_slots=40, monthly_deposit=25_000),
+    "xl": Profile(years=30, symbols=48, lots_per_symbol=4, lot_budget=25_000, leap_slots=40, monthly_deposit=25_000),
+}
+
+UNIVERSE = [
+    "AAPL", "MSFT", "NVDA", "AMD", "TSLA", "SOFI", "PLTR", "SPY", "QQQ", "IWM", "AMZN", "GOOGL", "META", "NFLX",
+    "INTC", "F", "GM", "BAC", "JPM", "C", "WFC", "T", "VZ", "KO", "PEP", "DIS", "NKE", "SBUX", "MU", "QCOM",
+    "CSCO", "ORCL", "CRM", "ADBE", "PYPL", "SQ", "UBER", "SHOP", "COIN", "HOOD", "RIVN", "LCID", "XOM", "CVX",
+    "OXY", "PFE", "MRK", "ABBV", "WMT", "TGT", "COST", "HD", "LOW", "BA", "CAT", "DE", "MMM", "GE", "X", "CLF",
+]
+
+FEE_PER_CONTRACT = 0.65
+_WEEKLY_VOL = 0.045
+
+
+@dataclass
+class Portfolio:
+    """Rows per table. Options / transactions may carry `_asset` / `_options`
+    (local indexes into assets / options) that the writers turn into ids."""
+    user_id: str
+    transactions: list[dict] = field(default_factory=list)
+    assets: list[dict] = field(default_factory=list)
+    options: list[dict] = field(default_factory=list)
+    portfolio_history: list[dict] = field(default_factory=list)
+
+    def counts(self) -> dict[str, int]:
+        return {
+            "transactions": len(self.transactions),
+            "assets": len(self.assets),
+            "leaps": sum(1 for a in self.assets if a["type"].startswith("LEAP")),
+            "options": len(self.options),
+            "portfolio_history": len(self.portfolio_history),
+        }
+
+
+def _fmt_exp(d: date) -> str:
+    # Same rendering as format_date_custom()
+    return d.strftime("%Y-%b-%d")
+
+
+def _friday_on_or_before(d: date) -> date:
+    return d - timedelta(days=(d.weekday() - 4) % 7)
+
+
+def _strike(x: float) -> float:
+    step = 0.5 if x < 25 else 1.0 if x < 200 else 5.0
+    return round(round(x / step) * step, 2)
+
+
+def _option_price(spot: float, strike: float, days: int, right: str) -> float:
+    """Rough premium: intrinsic plus a time value that decays with sqrt(T)."""
+    intrinsic = max(0.0, spot - strike) if right == "CALL" else max(0.0, strike - spot)
+    vol = _WEEKLY_VOL * math.sqrt(52)
+    time_value = 0.4 * spot * vol * math.sqrt(max(days, 0) / 365.0) * math.exp(-abs(spot - strike) / (spot * vol + 1e-9))
+    return round(max(0.01, intrinsic + time_value), 2)
+
+
+class _Sim:
+    def __init__(self, uid: str, profile: Profile, rng: random.Random, start: date, end: date):
+        self.p = Portfolio(uid)
+        self.uid = uid
+        self.profile = profile
+        self.rng = rng
+        self.start, self.end = start, end
+        self.cash = 0.0
+        self.fx = 1.30
+        self.syms = rng.sample(UNIVERSE, min(profile.symbols, len(UNIVERSE)))
+        self.px = {s: rng.uniform(15, 350) for s in self.syms}
+        self.shares = {s: 0 for s in self.syms}
+        self.basis = {s: 0.0 for s in self.syms}
+        self.stock_asset: dict[str, int] = {}
+        # lot -> {"shares": int, "short": option index or None}
+        self.lots = [{"sym": s, "shares": 0, "short": None} for s in self.syms for _ in range(profile.lots_per_symbol)]
+        self.leaps: list[int | None] = [None] * profile.leap_slots  # asset index per slot
+
+    # ---- rows ---------------------------------------------------------------
+    def tx(self, d: date, ttype: str, amount: float, sym: str, desc: str, currency="USD", txg=None, options=None):
+        if txg:
+            desc = f"{desc} | TXG:{txg}"
+        row = {"user_id": self.uid, "transaction_date": d.isoformat(), "type": ttype, "amount": round(amount, 2),
+               "currency": currency, "related_symbol": sym.upper(), "description": desc}
+        if options:
+            row["_options"] = list(options)
+        self.p.transactions.append(row)
+        if currency == "USD":
+            self.cash += round(amount, 2)
+
+    def deposit(self, d: date, usd: float, kind: str = "Deposit"):
+        sign = -1 if kind == "Withdrawal" else 1
+        ttype = kind.upper()
+        self.tx(d, ttype, sign * usd, "USD", f"{kind} (USD)")
+        self.tx(d, ttype, sign * round(usd * self.fx, 2), "USD", f"{kind} (CAD Basis)", currency="CAD")
+
+    def stock_trade(self, d: date, sym: str, qty: int, price: float, action: str, txg=None):
+        gross = qty * price
+        self.tx(d, "TRADE_STOCK", -gross if action == "Buy" else gross, sym, f"{action} {qty} {sym} @ ${price:,.2f}", txg=txg)
+        if action == "Buy":
+            held = self.shares[sym]
+            self.basis[sym] = (held * self.basis[sym] + gross) / (held + qty)
+            self.shares[sym] = held + qty
+        else:
+            self.shares[sym] -= qty
+        if sym not in self.stock_asset:
+            self.stock_asset[sym] = len(self.p.assets)
+            self.p.assets.append({"user_id": self.uid, "ticker": sym, "symbol": sym, "type": "STOCK", "quantity": 0,
+                                  "cost_basis": price, "last_price": price, "date_acquired": d.isoformat()})
+
+    # ---- wheel --------------------------------------------------------------
+    def open_short(self, d: date, lot: dict, right: str):
+        sym, spot = lot["sym"], self.px[lot["sym"]]
+        weeks = self.rng.choice([1, 2, 3, 4, 5])
+        exp = d + timedelta(weeks=weeks)
+        if right == "PUT":
+            strike = _strike(spot * self.rng.uniform(0.88, 0.98))
+            contracts = max(1, int(self.profile.lot_budget // (strike * 100)))
+            if self.cash - self.reserved() < strike * 100 * contracts:
+                return
+        else:
+            strike = _strike(max(self.basis[sym], spot) * self.rng.uniform(1.02, 1.10))
+            contracts = lot["shares"] // 100
+            if contracts <= 0:
+                return
+        price = _option_price(spot, strike, weeks * 7, right)
+        fees = round(FEE_PER_CONTRACT * contracts, 2)
+        desc = f"Sell {contracts} {sym} {_fmt_exp(exp)} ${strike} {right} (Fees: ${fees:.2f})"
+        self.tx(d, "OPTION_PREMIUM", contracts * price * 100 - fees, sym, desc)
+        lot["short"] = len(self.p.options)
+        self.p.options.append({
+            "user_id": self.uid, "ticker": sym, "symbol": sym, "type": right, "strike_price": strike,
+            "expiration_date": exp.isoformat(), "expiration": exp.isoformat(), "contracts": contracts,
+            "quantity": contracts, "premium_received": price, "status": "open", "open_date": d.isoformat(),
+            "_asset": self.stock_asset.get(sym) if right == "CALL" else None,
+        })
+
+    def reserved(self) -> float:
+        """Cash securing open puts."""
+        total = 0.0
+        for lot in self.lots:
+            if lot["short"] is not None:
+                o = self.p.options[lot["short"]]
+                if o["type"] == "PUT":
+                    total += o["strike_price"] * 100 * o["contracts"]
+        return total
+
+    def settle_short(self, d: date, lot: dict):
+        o = self.p.options[lot["short"]]
+        sym, spot, strike, n = o["symbol"], self.px[o["symbol"]], o["strike_price"], o["contracts"]
+        exp = date.fromisoformat(o["expiration_date"])
+        if d < exp:
+            # Take profits early now and then with a buy-to-close.
+            value = _option_price(spot, strike, (exp - d).days, o["type"])
+            if value <= 0.3 * o["premium_received"] and self.rng.random() < 0.5:
+                fees = round(FEE_PER_CONTRACT * n, 2)
+                desc = f"Buy {n} {sym} {_fmt_exp(exp)} ${strike} {o['type']} (Fees: ${fees:.2f})"
+                self.tx(d, "OPTION_PREMIUM", -(n * value * 100 + fees), sym, desc, txg=uuid.uuid4().hex[:12])
+                o.update(status="closed", closing_price=value, closed_date=f"{d.isoformat()}T16:00:00")
+                lot["short"] = None
+            return
+        itm = spot < strike if o["type"] == "PUT" else spot > strike
+        if not itm:
+            o.update(status="expired", closing_price=0.0, closed_date=f"{exp.isoformat()}T16:00:00")
+            lot["short"] = None
+            return
+        txg = uuid.uuid4().hex[:12]
+        o.update(status="assigned")
+        self.tx(exp, "OPTION_EXPIRE", 0.0, sym,
+                f"Expire {o['type']} {sym} {_fmt_exp(exp)} ${float(strike)} (Assigned)", txg=txg, options=[lot["short"]])
+        if o["type"] == "PUT":
+            self.stock_trade(exp, sym, n * 100, strike, "Buy", txg=txg)
+            lot["shares"] += n * 100
+        else:
+            self.stock_trade(exp, sym, n * 100, strike, "Sell", txg=txg)
+            lot["shares"] -= n * 100
+        lot["short"] = None
+
+    # ---- LEAPs --------------------------------------------------------------
+    def buy_leap(self, d: date, slot: int, sym: str, txg=None) -> bool:
+        spot = self.px[sym]
+        exp = _friday_on_or_before(d + timedelta(weeks=self.rng.randint(70, 100)))
+        strike = _strike(spot * self.rng.uniform(0.7, 0.9))
+        price = _option_price(spot, strike, (exp - d).days, "CALL")
+        n = self.rng.randint(1, 3)
+        cost = n * price * 100
+        if txg is None and self.cash - self.reserved() < cost * 1.5:
+            return False
+        desc = f"Buy {n} {sym} {exp.isoformat()} ${strike} @ ${price:,.2f}"
+        self.tx(d, "TRADE_LEAP_CALL", -cost, sym, desc, txg=txg)
+        self.leaps[slot] = len(self.p.assets)
+        self.p.assets.append({
+            "user_id": self.uid, "ticker": sym, "symbol": sym, "type": "LEAP_CALL", "quantity": n,
+            "cost_basis": price, "last_price": price, "strike_price": strike, "expiration": exp.isoformat(),
+            "date_acquired": d.isoformat(),
+        })
+        return True
+
+    def roll_leap(self, d: date, slot: int):
+        a = self.p.assets[self.leaps[slot]]
+        sym, n, strike = a["ticker"], a["quantity"], a["strike_price"]
+        exp = date.fromisoformat(a["expiration"])
+        price = _option_price(self.px[sym], strike, (exp - d).days, "CALL")
+        txg = uuid.uuid4().hex[:12]
+        self.tx(d, "TRADE_LEAP_CALL", n * price * 100, sym, f"Sell {n} {sym} {exp.isoformat()} ${strike} @ ${price:,.2f}", txg=txg)
+        a.update(quantity=0, last_price=price)
+        self.buy_leap(d, slot, sym, txg=txg)
+
+    def leap_value(self, d: date) -> float:
+        total = 0.0
+        for idx in self.leaps:
+            if idx is not None:
+                a = self.p.assets[idx]
+                days = (date.fromisoformat(a["expiration"]) - d).days
+                price = _option_price(self.px[a["ticker"]], a["strike_price"], days, "CALL")
+                a["last_price"] = price
+                total += a["quantity"] * price * 100
+        return total
+
+    # ---- main loop ----------------------------------------------------------
+    def run(self) -> Portfolio:
+        d = self.start
+        self.deposit(d, self.profile.monthly_deposit * 24)
+        month = d.month
+        while d <= self.end:
+            for s in self.syms:
+                self.px[s] = max(1.0, self.px[s] * math.exp(self.rng.gauss(0.0015, _WEEKLY_VOL)))
+            self.fx = min(1.46, max(1.20, self.fx + self.rng.gauss(0, 0.006)))
+
+            if d.month != month:
+                month = d.month
+                if self.rng.random() < 0.04 and self.cash - self.reserved() > self.profile.monthly_deposit * 3:
+                    self.deposit(d, self.profile.monthly_deposit * 2, "Withdrawal")
+                else:
+                    self.deposit(d, self.profile.monthly_deposit)
+                if month in (3, 6, 9, 12):
+                    for s in self.syms:
+                        if self.shares[s] > 0:
+                            amt = self.shares[s] * self.px[s] * self.rng.uniform(0.002, 0.006)
+                            self.tx(d, "DIVIDEND", amt, s, "Dividend (USD)")
+
+            for lot in self.lots:
+                if lot["short"] is not None:
+                    self.settle_short(d, lot)
+                if lot["short"] is None and self.rng.random() < 0.85:
+                    self.open_short(d, lot, "CALL" if lot["shares"] >= 100 else "PUT")
+
+            for slot, idx in enumerate(self.leaps):
+                if idx is None:
+                    self.buy_leap(d, slot, self.syms[slot % len(self.syms)])
+                elif (date.fromisoformat(self.p.assets[idx]["expiration"]) - d).days < 182:
+                    self.roll_leap(d, slot)
+
+            self.snapshot(d)
+            d += timedelta(weeks=1)
+        return self.finish()
+
+    def snapshot(self, d: date):
+        stock = sum(q * self.px[s] for s, q in self.shares.items())
+        longs = self.leap_value(d)
+        short = 0.0
+        for lot in self.lots:
+            if lot["short"] is not None:
+                o = self.p.options[lot["short"]]
+                days = (date.fromisoformat(o["expiration_date"]) - d).days
+                short += _option_price(self.px[o["symbol"]], o["strike_price"], days, o["type"]) * 100 * o["contracts"]
+        self.p.portfolio_history.append({
+            "user_id": self.uid, "snapshot_date": d.isoformat(),
+            "total_equity": round(self.cash + stock + longs - short, 2), "exchange_rate": round(self.fx, 4),
+            "cash_balance": round(self.cash, 2), "stock_value": round(stock, 2), "long_option_value": round(longs, 2),
+            "short_liability_estimate": round(short, 2), "currency": "USD",
+        })
+
+    def finish(self) -> Portfolio:
+        for s, idx in self.stock_asset.items():
+            a = self.p.assets[idx]
+            a.update(quantity=self.shares[s], cost_basis=round(self.basis[s], 4) if self.shares[s] else a["cost_basis"],
+                     last_price=round(self.px[s], 2))
+        return self.p
+
+
+def generate(user_id: str | None = None, size: str | Profile = "medium", seed: int = 0,
+             end: date | None = None) -> Portfolio:
+    """Simulate one account. `size` is a SIZES key or a custom Profile."""
+    profile = SIZES[size] if isinstance(size, str) else size
+    rng = random.Random(seed)
+    uid = user_id or str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    end = _friday_on_or_before(end or date.today())
+    start = end - timedelta(weeks=52 * profile.years)
+    return _Sim(uid, profile, rng, start, end).run()
+
+
+# ---- writers ----------------------------------------------------------------
+
+def _clean(row: dict) -> dict:
+    return {k: v for k, v in row.items() if not k.startswith("_")}
+
+
+def _link(p: Portfolio, asset_ids: list, option_ids: list | None = None):
+    options = []
+    for o in p.options:
+        row = _clean(o)
+        row["linked_asset_id"] = asset_ids[o["_asset"]] if o.get("_asset") is not None else None
+        options.append(row)
+    if option_ids is None:
+        return options, None
+    txs = []
+    for t in p.transactions:
+        row = _clean(t)
+        if t.get("_options"):
+            oid = "OID:" + ",".join(str(option_ids[i]) for i in t["_options"])
+            # log_transaction() appends the TXG tag last
+            head, sep, tail = row["description"].partition(" | TXG:")
+            row["description"] = f"{head} {oid}{sep}{tail}"
+        txs.append(row)
+    return options, txs
+
+
+def _chunks(rows: list, n: int):
+    for i in range(0, len(rows), n):
+        yield rows[i:i + n]
+
+
+def clear_user(client, user_id: str):
+    for table in ("transactions", "options", "assets", "portfolio_history"):
+        client.table(table).delete().eq("user_id", user_id).execute()
+
+
+def write_client(p: Portfolio, client, chunk: int = 500):
+    """Insert through a Supabase-style client (src/fakedb.FakeClient or supabase.Client)."""
+    asset_ids = []
+    for rows in _chunks([_clean(a) for a in p.assets], chunk):
+        asset_ids.extend(r["id"] for r in client.table("assets").insert(rows).execute().data)
+    options, _ = _link(p, asset_ids)
+    option_ids = []
+    for rows in _chunks(options, chunk):
+        option_ids.extend(r["id"] for r in client.table("options").insert(rows).execute().data)
+    _, txs = _link(p, asset_ids, option_ids)
+    for table, rows in (("transactions", txs), ("portfolio_history", p.portfolio_history)):
+        for part in _chunks([_clean(r) for r in rows], chunk):
+            client.table(table).insert(part).execute()
+
+
+def _copy(cur, table: str, rows: list[dict]):
+    if not rows:
+        return
+    cols = list(rows[0])
+    with cur.copy(f"copy public.{table} ({', '.join(cols)}) from stdin") as cp:
+        for r in rows:
+            cp.write_row([r.get(c) for c in cols])
+
+
+def write_postgres(p: Portfolio, conn):
+    """Load into a local Postgres with supabase/migrations applied (psycopg connection)."""
+    with conn.cursor() as cur:
+        asset_ids = []
+        for a in p.assets:
+            row = _clean(a)
+            cols = list(row)
+            cur.execute(
+                f"insert into public.assets ({', '.join(cols)}) values ({', '.join(['%s'] * len(cols))}) returning id",
+                [row[c] for c in cols],
+            )
+            asset_ids.append(cur.fetchone()[0])
+        options, _ = _link(p, asset_ids)
+        option_ids = []
+        for row in options:
+            cols = list(row)
+            cur.execute(
+                f"insert into public.options ({', '.join(cols)}) values ({', '.join(['%s'] * len(cols))}) returning id",
+                [row[c] for c in cols],
+            )
+            option_ids.append(cur.fetchone()[0])
+        _, txs = _link(p, asset_ids, option_ids)
+        _copy(cur, "transactions", txs)
+        _copy(cur, "portfolio_history", [_clean(r) for r in p.portfolio_history])
@@ -0,0 +1,128 @@
+"""Timing spans written to a rotating local JSONL file, plus readers for the report CLI.
+
+One JSON object per line:
+
+    {"ts": "2026-10-19T14:31:02.118Z", "kind": "db", "name": "transactions.select",
+     "ms": 41.7, "account": "…", "page": "Dashboard", "rows": 1000, "cache": null}
+
+kind is page (one full page render), db (one Supabase execute), yahoo (one
+market-data provider call, i.e. an st.cache_data miss) or helper (an app data
+helper; cached Yahoo helpers carry cache=hit/miss). src/perf.py produces the
+spans; scripts/telemetry_report.py turns them into p50/p95/p99 tables.
+
+Telemetry is opt-in: set TELEMETRY_FILE (e.g. logs/telemetry.jsonl) to turn
+it on; unset, empty or "off" leaves it disabled. The file rotates at
+TELEMETRY_MAX_MB keeping TELEMETRY_BACKUPS old files.
+"""
+import json
+import logging
+import logging.handlers
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from .config import TELEMETRY_BACKUPS, TELEMETRY_FILE, TELEMETRY_MAX_MB
+
+KINDS = ("page", "db", "yahoo", "helper")
+
+_logger: logging.Logger | None = None
+_logger_lock = threading.Lock()
+_broken = False
+
+
+def enabled() -> bool:
+    return bool(TELEMETRY_FILE) and TELEMETRY_FILE.lower() not in ("off", "0", "false", "none") and not _broken
+
+
+def _get_logger() -> logging.Logger | None:
+    global _logger, _broken
+    if _logger is not None or not enabled():
+        return _logger
+    with _logger_lock:
+        if _logger is None:
+            try:
+                path = Path(TELEMETRY_FILE)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    path, maxBytes=int(TELEMETRY_MAX_MB * 1024 * 1024), backupCount=TELEMETRY_BACKUPS,
+                    encoding="utf-8", delay=True)
+            except OSError as e:
+                # e.g. a read-only deploy; telemetry must never take a page down
+                logging.getLogger(__name__).warning("telemetry disabled: %s", e)
+                _broken = True
+                return None
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            log = logging.getLogger("options.telemetry")
+            log.setLevel(logging.INFO)
+            log.propagate = False
+            log.addHandler(handler)
+            _logger = log
+    return _logger
+
+
+def emit(kind: str, name: str, seconds: float, account=None, page=None, rows=None, cache=None, **extra):
+    """Append one span; failures are swallowed (logging's handler reports them on stderr)."""
+    log = _get_logger()
+    if log is None:
+        return
+    span = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+        "kind": kind,
+        "name": name,
+        "ms": round(seconds * 1000.0, 3),
+        "account": account,
+        "page": page,
+        "rows": rows,
+        "cache": cache,
+    }
+    if extra:
+        span.update(extra)
+    log.info(json.dumps(span, default=str, separators=(",", ":")))
+
+
+# ---- reading / summarizing ------------------------------------------------------
+
+def span_files(path: str | Path = TELEMETRY_FILE) -> list[Path]:
+    """The live file and its rotated backups (file.1 … file.N), oldest first."""
+    path = Path(path)
+    backups = sorted(path.parent.glob(path.name + ".*"),
+                     key=lambda p: int(p.suffix[1:]) if p.suffix[1:].isdigit() else 0, reverse=True)
+    return [p for p in backups if p.suffix[1:].isdigit()] + ([path] if path.exists() else [])
+
+
+def read_spans(paths, since: datetime | None = None) -> pd.DataFrame:
+    rows = []
+    for p in paths:
+        with open(p, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash / rotation
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    df["ts"] = pd.to_datetime(df["ts"], utc=True, errors="coerce")
+    if since is not None:
+        since = pd.Timestamp(since)
+        since = since.tz_localize("UTC") if since.tzinfo is None else since.tz_convert("UTC")
+        df = df[df["ts"] >= since]
+    return df
+
+
+def summarize(df: pd.DataFrame, by: list[str]) -> pd.DataFrame:
+    """count / p50 / p95 / p99 / max latency (ms) per group, slowest p95 first."""
+    cols = [*by, "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    if df.empty:
+        return pd.DataFrame(columns=cols)
+    g = df.groupby(by, dropna=False)["ms"]
+    out = pd.DataFrame({
+        "count": g.size(),
+        "p50_ms": g.quantile(0.50),
+        "p95_ms": g.quantile(0.95),
+        "p99_ms": g.quantile(0.99),
+        "max_ms": g.max(),
+    }).reset_index()
+    return out.sort_values("p95_ms", ascending=False).reset_index(drop=True)[cols]
@@ -0,0 +1,55 @@
+-- Core ledger / position tables used by app.py.
+--
+-- Mirrors the columns the app reads and writes today. Legacy alias columns
+-- (ticker/symbol, strike/strike_price, expiration/expiration_date,
+-- contracts/quantity) are kept because older rows populate only one side
+-- and normalize_columns() reconciles them at read time.
+
+create table if not exists public.transactions (
+    id               bigint generated by default as identity primary key,
+    user_id          uuid        not null,
+    transaction_date date        not null,
+    type             text        not null,
+    amount           numeric     not null default 0,
+    currency         text        not null default 'USD',
+    related_symbol   text,
+    description      text,
+    created_at       timestamptz not null default now()
+);
+
+create table if not exists public.assets (
+    id              bigint generated by default as identity primary key,
+    user_id         uuid        not null,
+    ticker          text        not null,
+    symbol          text,
+    type            text        not null default 'STOCK',
+    quantity        numeric     not null default 0,
+    cost_basis      numeric     not null default 0,
+    last_price      numeric,
+    strike_price    numeric,
+    expiration      date,
+    expiration_date date,
+    date_acquired   date,
+    created_at      timestamptz not null default now()
+);
+
+create table if not exists public.options (
+    id               bigint generated by default as identity primary key,
+    user_id          uuid        not null,
+    ticker           text,
+    symbol           text        not null,
+    type             text        not null,
+    strike_price     numeric     not null,
+    expiration_date  date        not null,
+    expiration       date,
+    contracts        integer     not null default 0,
+    quantity         integer,
+    premium_received numeric,
+    cost_basis       numeric,
+    status           text        not null default 'open',
+    open_date        date,
+    closing_price    numeric,
+    closed_date      timestamptz,
+    linked_asset_id  bigint references public.assets (id) on delete set null,
+    created_at       timestamptz not null default now()
+);
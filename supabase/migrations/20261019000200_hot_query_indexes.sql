@@ -0,0 +1,29 @@
+-- Composite indexes for the filters app.py issues on every page load.
+--
+-- Each index matches one query shape exactly (equality columns first), so
+-- PostgREST requests resolve to index scans instead of per-user seq scans.
+
+-- get_cash_balance / get_net_invested_cad: user_id = ? and currency = ?
+-- amount is carried in the leaf so the cash sum is an index-only scan.
+create index if not exists transactions_user_currency_idx
+    on public.transactions (user_id, currency)
+    include (amount);
+
+-- Flow-normalized returns: user_id = ? and type in ('DEPOSIT', 'WITHDRAWAL')
+create index if not exists transactions_user_type_idx
+    on public.transactions (user_id, type)
+    include (transaction_date, amount, currency);
+
+-- Ledger / P&L replay: user_id = ? order by transaction_date
+create index if not exists transactions_user_date_idx
+    on public.transactions (user_id, transaction_date);
+
+-- update_short_option_position (close) and the ledger reversal helpers:
+-- user_id, status, symbol, strike_price, expiration_date, type all equality.
+-- The (user_id, status) prefix also serves get_portfolio_data's open-options read.
+create index if not exists options_user_status_contract_idx
+    on public.options (user_id, status, symbol, strike_price, expiration_date, type);
+
+-- update_asset_position / reversal helpers: user_id = ? and ticker = ? and type = ?
+create index if not exists assets_user_ticker_type_idx
+    on public.assets (user_id, ticker, type);
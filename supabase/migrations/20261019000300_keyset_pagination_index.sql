@@ -0,0 +1,4 @@
+-- Keyset pagination in src/fetch.fetch_keyset: user_id = ? and id > ? order by id limit n
+-- Each page becomes a short range scan from the last seen id.
+create index if not exists transactions_user_id_keyset_idx
+    on public.transactions (user_id, id);
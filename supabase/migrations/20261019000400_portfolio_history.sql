@@ -0,0 +1,19 @@
+-- Weekly equity snapshots written by capture_snapshot() and read by the
+-- dashboard / snapshot pages (always filtered by user_id, ordered by date).
+
+create table if not exists public.portfolio_history (
+    id                       bigint generated by default as identity primary key,
+    user_id                  uuid        not null,
+    snapshot_date            date        not null,
+    total_equity             numeric     not null default 0,
+    exchange_rate            numeric,
+    currency                 text        not null default 'USD',
+    cash_balance             numeric,
+    stock_value              numeric,
+    long_option_value        numeric,
+    short_liability_estimate numeric,
+    created_at               timestamptz not null default now()
+);
+
+create index if not exists portfolio_history_user_date_idx
+    on public.portfolio_history (user_id, snapshot_date);
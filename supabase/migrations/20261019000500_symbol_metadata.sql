@@ -0,0 +1,16 @@
+-- Per-symbol reference data from Yahoo (yfinance Ticker.info), shared by all
+-- users. Filled in bulk in the background by src/symbols.py and read with a
+-- single `symbol in (...)` lookup by the "Total Holdings (by Sector)" view.
+-- Rows older than SYMBOL_METADATA_TTL_DAYS are refreshed in the background.
+
+create table if not exists public.symbol_metadata (
+    id          bigint generated by default as identity primary key,
+    symbol      text        not null unique,
+    sector      text,
+    industry    text,
+    name        text,
+    exchange    text,
+    currency    text,
+    quote_type  text,
+    fetched_at  timestamptz not null default now()
+);
@@ -0,0 +1,32 @@
+-- updated_at on the per-account tables, so src/fingerprints.py can tell
+-- whether an account's rows changed with one tiny probe per table:
+--
+--   select updated_at from <table> where user_id = ? order by updated_at desc limit 1
+--   (+ Prefer: count=exact)
+--
+-- Row count catches deletes, max(updated_at) catches inserts and updates.
+
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['transactions', 'assets', 'options', 'portfolio_history'] loop
+        execute format('alter table public.%I add column if not exists updated_at timestamptz not null default now()', t);
+        execute format('drop trigger if exists %I on public.%I', t || '_set_updated_at', t);
+        execute format('create trigger %I before update on public.%I for each row execute function public.set_updated_at()',
+                       t || '_set_updated_at', t);
+        -- the probe is an index-only scan: newest updated_at for one user
+        execute format('create index if not exists %I on public.%I (user_id, updated_at desc)', t || '_user_updated_idx', t);
+    end loop;
+end;
+$$;
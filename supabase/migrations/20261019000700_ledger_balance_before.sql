@@ -0,0 +1,25 @@
+-- Opening balance for the ledger's date-range reads (src/ledger_cache.window):
+-- the sum of an account's transaction amounts dated before a day, computed
+-- in the database so a one-year view doesn't page the earlier history over
+-- the wire.
+--
+--   select public.ledger_balance_before(:user_id, :start_date)
+--
+-- security invoker: the caller's row level security applies, so a user only
+-- ever sums their own (or their delegated) rows. Served by
+-- transactions_user_date_idx (user_id, transaction_date).
+
+create or replace function public.ledger_balance_before(p_user_id uuid, p_before date)
+returns numeric
+language sql
+stable
+security invoker
+set search_path = public
+as $$
+    select coalesce(sum(amount), 0)
+    from public.transactions
+    where user_id = p_user_id
+      and transaction_date < p_before;
+$$;
+
+grant execute on function public.ledger_balance_before(uuid, date) to authenticated;
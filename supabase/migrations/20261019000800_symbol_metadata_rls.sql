@@ -0,0 +1,53 @@
+-- Row level security for public.symbol_metadata (20261019000500).
+--
+-- The table is reference data shared by every user: signed-in users may read
+-- it, nobody writes it directly. src/symbols.fill() goes through
+-- public.upsert_symbol_metadata(), a security-definer function that only
+-- accepts well-formed symbols, caps the batch and stamps fetched_at itself,
+-- so one user can't rewrite the table wholesale or backdate rows.
+
+alter table public.symbol_metadata enable row level security;
+
+drop policy if exists symbol_metadata_read on public.symbol_metadata;
+create policy symbol_metadata_read on public.symbol_metadata
+    for select to authenticated using (true);
+
+revoke all on public.symbol_metadata from anon, authenticated;
+grant select on public.symbol_metadata to authenticated;
+
+create or replace function public.upsert_symbol_metadata(p_rows jsonb)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    n integer;
+begin
+    if jsonb_typeof(p_rows) <> 'array' or jsonb_array_length(p_rows) > 200 then
+        raise exception 'upsert_symbol_metadata: expected an array of at most 200 rows';
+    end if;
+
+    insert into public.symbol_metadata as m
+        (symbol, sector, industry, name, exchange, currency, quote_type, fetched_at)
+    select r.symbol, left(r.sector, 100), left(r.industry, 200), left(r.name, 200),
+           left(r.exchange, 50), left(r.currency, 10), left(r.quote_type, 30), now()
+    from jsonb_to_recordset(p_rows) as r(symbol text, sector text, industry text, name text,
+                                         exchange text, currency text, quote_type text)
+    where r.symbol ~ '^[A-Za-z0-9.^=-]{1,20}$'
+    on conflict (symbol) do update set
+        sector = excluded.sector,
+        industry = excluded.industry,
+        name = excluded.name,
+        exchange = excluded.exchange,
+        currency = excluded.currency,
+        quote_type = excluded.quote_type,
+        fetched_at = excluded.fetched_at;
+
+    get diagnostics n = row_count;
+    return n;
+end;
+$$;
+
+revoke execute on function public.upsert_symbol_metadata(jsonb) from public, anon;
+grant execute on function public.upsert_symbol_metadata(jsonb) to authenticated;
@@ -0,0 +1,53 @@
+"""ledger_cache.window(): the date-range read must balance like a full-history load."""
+from datetime import date, timedelta
+
+import pytest
+
+from src import analytics, ledger_cache, schema, synthetic
+from src.fakedb import create_fake_client
+
+START = date(2025, 10, 17)
+END = date(2026, 10, 16)
+
+
+@pytest.fixture
+def account(tmp_path):
+    client = create_fake_client(str(tmp_path / "fake.sqlite"))
+    p = synthetic.generate("u1", "small", seed=3, end=END)
+    synthetic.write_client(p, client)
+    # a TXG group straddling the start of the range
+    for day, amount in ((START - timedelta(days=3), -500.0), (START + timedelta(days=2), 520.0)):
+        client.table("transactions").insert({
+            "user_id": "u1", "transaction_date": day.isoformat(), "type": "OPTION_PREMIUM",
+            "amount": amount, "currency": "USD", "related_symbol": "KO",
+            "description": "Buy 1 KO 2026-Jan-16 $60.0 CALL | TXG:straddle01",
+        }).execute()
+    return client
+
+
+def _shown(groups):
+    return [(g["gkey"], g["date"], g["action"], round(g["amount"], 6), round(g["running"], 4))
+            for g in groups if g["date"] is not None and START <= g["date"] <= END]
+
+
+def _full_history(client):
+    rows = client.table("transactions").select(schema.LEDGER_ROWS.select).eq("user_id", "u1").execute().data
+    return _shown(analytics.ledger_groups(schema.LEDGER_ROWS.frame(rows)))
+
+
+@pytest.mark.parametrize("cache_dir", ["off", "local"])
+def test_window_running_balance_matches_full_history(account, tmp_path, monkeypatch, cache_dir):
+    monkeypatch.setattr(ledger_cache, "LEDGER_CACHE_DIR", str(tmp_path / "ledger") if cache_dir == "local" else "off")
+    df, opening = ledger_cache.window(account, "u1", START, END)
+    got = _shown(analytics.ledger_groups(df, opening=opening))
+    assert got and got == _full_history(account)
+    assert "straddle01" not in {g[0] for g in got}  # its group date is before START
+
+
+def test_remote_window_sums_history_in_the_database(account, monkeypatch):
+    monkeypatch.setattr(ledger_cache, "LEDGER_CACHE_DIR", "off")
+    account.reset_calls()
+    df, _ = ledger_cache.window(account, "u1", START, END)
+    assert account.calls[("ledger_balance_before", "rpc")] == 1
+    before = df[[d < START.isoformat() for d in df["transaction_date"]]]
+    assert set(before["description"].str.extract(r"TXG:(\w+)", expand=False)) == {"straddle01"}
@@ -0,0 +1,33 @@
+"""Scheduler admission: every call must eventually be admitted, whatever its cost."""
+import threading
+
+from src.scheduler import BACKGROUND, INTERACTIVE, Scheduler
+
+
+def _scheduler():
+    return Scheduler("test", rate=1000.0, burst=10, max_concurrency=4, retries=0,
+                     backoff_base=0.0, backoff_max=0.0, reserve=3)
+
+
+def _run_with_timeout(sched, cost, priority, timeout=5.0):
+    out = []
+    t = threading.Thread(target=lambda: out.append(sched.run(lambda: "ok", cost=cost, priority=priority)),
+                         daemon=True)
+    t.start()
+    t.join(timeout)
+    return out
+
+
+def test_oversized_background_call_is_admitted():
+    # cost above burst - reserve (e.g. last_closes of 12 symbols) used to wait forever
+    assert _run_with_timeout(_scheduler(), cost=12, priority=BACKGROUND) == ["ok"]
+
+
+def test_oversized_interactive_call_is_admitted():
+    assert _run_with_timeout(_scheduler(), cost=50, priority=INTERACTIVE) == ["ok"]
+
+
+def test_background_leaves_the_interactive_reserve():
+    sched = _scheduler()
+    assert _run_with_timeout(sched, cost=12, priority=BACKGROUND) == ["ok"]
+    assert sched.snapshot()["tokens"] >= sched.reserve